@@ -0,0 +1,164 @@
+import json
+import math
+import os
+import threading
+from typing import Dict, Any, List, Optional
+
+class P2Quantile:
+    """
+    Streaming quantile estimate using the P² algorithm (Jain & Chlamtac, 1985).
+    Constant memory (five markers) regardless of how many durations are observed.
+    """
+
+    def __init__(self, p: float = 0.95):
+        self.p = p
+        self.count = 0
+        self.q: List[float] = []
+        self.n = [0, 1, 2, 3, 4]
+        self.np = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+        self.dn = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        if self.count <= 5:
+            self.q.append(x)
+            self.q.sort()
+            return
+
+        q, n = self.q, self.n
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if q[i] <= x < q[i + 1])
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.np[i] += self.dn[i]
+
+        for i in range(1, 4):
+            d = self.np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = self._parabolic(i, step)
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+                q[i] = candidate
+                n[i] += step
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q, n = self.q, self.n
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> Optional[float]:
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            # Nearest-rank on the raw samples until the markers are initialised
+            rank = max(0, math.ceil(self.p * len(self.q)) - 1)
+            return self.q[rank]
+        return self.q[2]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"p": self.p, "count": self.count, "q": self.q, "n": self.n, "np": self.np}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "P2Quantile":
+        est = cls(data["p"])
+        est.count, est.q, est.n, est.np = data["count"], data["q"], data["n"], data["np"]
+        return est
+
+
+class AdaptiveTimeoutPolicy:
+    """
+    Derives sandbox deadlines from historical durations instead of fixed constants.
+    Keeps a P² p95 estimate per (phase, stack, project size bucket) and sets the
+    deadline to `multiplier * p95`, clamped to per-phase floor/ceiling.
+    Falls back to the stack-wide estimate, then to the caller's default,
+    until enough samples exist.
+    """
+
+    # Context size buckets (bytes) used to separate small CRUD apps from heavy ones
+    SIZE_BUCKETS = [
+        (10 * 1024 ** 2, "xs"),
+        (50 * 1024 ** 2, "s"),
+        (200 * 1024 ** 2, "m"),
+    ]
+
+    PHASE_LIMITS = {
+        "build": {"floor_sec": 60, "ceiling_sec": 900},
+        "run": {"floor_sec": 15, "ceiling_sec": 300},
+        "run_sharded": {"floor_sec": 15, "ceiling_sec": 300},
+    }
+
+    def __init__(self, multiplier: float = 2.0, quantile: float = 0.95, min_samples: int = 5,
+                 phase_limits: Optional[Dict[str, Dict[str, float]]] = None, state_path: Optional[str] = None):
+        self.multiplier = multiplier
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.phase_limits = {**self.PHASE_LIMITS, **(phase_limits or {})}
+        self.state_path = state_path
+        self._estimators: Dict[str, P2Quantile] = {}
+        self._lock = threading.Lock()
+        if state_path and os.path.isfile(state_path):
+            self.load(state_path)
+
+    @classmethod
+    def size_bucket(cls, size_bytes: int) -> str:
+        for limit, label in cls.SIZE_BUCKETS:
+            if size_bytes < limit:
+                return label
+        return "l"
+
+    @staticmethod
+    def _key(phase: str, stack: str, bucket: str) -> str:
+        return f"{phase}|{stack}|{bucket}"
+
+    def deadline(self, phase: str, stack: str, size_bytes: int, default_sec: float) -> float:
+        """Timeout (seconds) for the next `phase` run of a project of this stack and size."""
+        limits = self.phase_limits.get(phase, {"floor_sec": 0, "ceiling_sec": default_sec})
+        with self._lock:
+            for bucket in (self.size_bucket(size_bytes), "*"):
+                est = self._estimators.get(self._key(phase, stack, bucket))
+                if est and est.count >= self.min_samples:
+                    target = self.multiplier * est.value()
+                    return round(min(max(target, limits["floor_sec"]), limits["ceiling_sec"]), 1)
+        return default_sec
+
+    def record(self, phase: str, stack: str, size_bytes: int, duration_sec: float) -> None:
+        """
+        Feeds one observed duration. Timed-out runs should be recorded with the
+        deadline they hit, which nudges p95 upward for genuinely heavy stacks.
+        """
+        with self._lock:
+            for bucket in (self.size_bucket(size_bytes), "*"):
+                key = self._key(phase, stack, bucket)
+                self._estimators.setdefault(key, P2Quantile(self.quantile)).add(duration_sec)
+        if self.state_path:
+            self.save(self.state_path)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {key: {"samples": est.count, f"p{int(self.quantile * 100)}_sec": est.value()}
+                    for key, est in self._estimators.items()}
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            state = {key: est.to_dict() for key, est in self._estimators.items()}
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> None:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        with self._lock:
+            self._estimators = {key: P2Quantile.from_dict(data) for key, data in state.items()}
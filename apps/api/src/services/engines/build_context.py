@@ -0,0 +1,204 @@
+import fnmatch
+import hashlib
+import os
+import stat
+import tarfile
+import time
+from typing import Dict, Any, List, Optional, Iterator
+
+class BuildContextBuilder:
+    """
+    Produces a minimal Docker build context for a generated project.
+    Walks the tree with os.scandir, drops dependency/build leftovers
+    (node_modules, target/, .angular/cache, ...) and streams the tar
+    on the fly, so nothing is staged on disk before the daemon sees it.
+    """
+
+    # .dockerignore-style rules (root-relative, "**/" for any depth) applied to every project
+    DEFAULT_IGNORES = [
+        "**/.git",
+        "**/__pycache__",
+        "**/.DS_Store",
+        "**/*.log",
+    ]
+
+    # Build output skipped at the project root, or next to the manifest that produces it
+    # (generated apps nest frontend/backend). A source package named "target" stays in.
+    COMPONENT_IGNORES = {
+        "node_modules": ("package.json",),
+        "dist/.cache": ("package.json",),
+        ".angular/cache": ("angular.json",),
+        "target": ("pom.xml",),
+    }
+
+    # Docker always needs these, whatever the ignore rules say
+    ALWAYS_INCLUDE = {"Dockerfile", ".dockerignore"}
+
+    CHUNK_SIZE = 64 * 1024
+    BLOCK_SIZE = tarfile.BLOCKSIZE
+
+    def __init__(self, root: str, extra_ignores: Optional[List[str]] = None,
+                 overrides: Optional[Dict[str, bytes]] = None):
+        self.root = os.path.abspath(root)
+        self.ignore_patterns = list(self.DEFAULT_IGNORES) + [p.strip("/") for p in extra_ignores or []]
+        # rel_path -> replacement content (e.g. a rewritten Dockerfile), substituted while streaming
+        self.overrides = dict(overrides or {})
+        self.dockerignore_rules = self._load_dockerignore()
+        self.stats: Dict[str, Any] = {}
+
+    def _load_dockerignore(self) -> List[tuple]:
+        """Parses the project's .dockerignore into (pattern, negated) rules."""
+        path = os.path.join(self.root, ".dockerignore")
+        rules = []
+        if not os.path.isfile(path):
+            return rules
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                negated = line.startswith("!")
+                pattern = line[1:] if negated else line
+                rules.append((pattern.strip("/"), negated))
+        return rules
+
+    @staticmethod
+    def _matches(rel_path: str, pattern: str) -> bool:
+        """A rule matches the path itself or any of its parent directories."""
+        parts = rel_path.split("/")
+        for depth in range(len(parts), 0, -1):
+            path = "/".join(parts[:depth])
+            if fnmatch.fnmatch(path, pattern) or (pattern.startswith("**/") and fnmatch.fnmatch(path, pattern[3:])):
+                return True
+        return False
+
+    def _is_build_output(self, rel_path: str) -> bool:
+        for pattern, manifests in self.COMPONENT_IGNORES.items():
+            if rel_path == pattern:
+                return True
+            if rel_path.endswith("/" + pattern):
+                component_dir = os.path.join(self.root, rel_path[:-len(pattern) - 1])
+                if any(os.path.isfile(os.path.join(component_dir, m)) for m in manifests):
+                    return True
+        return False
+
+    def is_ignored(self, rel_path: str) -> bool:
+        """True if `rel_path` (posix, relative to root) is excluded from the context."""
+        if rel_path in self.ALWAYS_INCLUDE:
+            return False
+        if self._is_build_output(rel_path):
+            return True
+        if any(self._matches(rel_path, pattern) for pattern in self.ignore_patterns):
+            return True
+
+        # .dockerignore semantics: root-relative, last matching rule wins
+        ignored = False
+        for pattern, negated in self.dockerignore_rules:
+            if self._matches(rel_path, pattern):
+                ignored = not negated
+        return ignored
+
+    def _reopened(self, rel_dir: str) -> bool:
+        return any(negated and pattern.startswith(rel_dir + "/") for pattern, negated in self.dockerignore_rules)
+
+    def _walk(self, rel_dir: str = "", counters: Optional[Dict[str, Any]] = None) -> Iterator[tuple]:
+        """Yields (rel_path, os.DirEntry) in sorted order so the tree digest is stable."""
+        abs_dir = os.path.join(self.root, rel_dir) if rel_dir else self.root
+        with os.scandir(abs_dir) as it:
+            entries = sorted(it, key=lambda e: e.name)
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if self.is_ignored(rel_path):
+                if counters is not None:
+                    counters["skipped_entries"] += 1
+                # Like Docker, keep descending into an excluded directory that a "!" rule reopens
+                if entry.is_dir(follow_symlinks=False) and self._reopened(rel_path):
+                    yield from self._walk(rel_path, counters)
+                continue
+            yield rel_path, entry
+            if entry.is_dir(follow_symlinks=False):
+                yield from self._walk(rel_path, counters)
+
+    def entries(self) -> Iterator[tuple]:
+        """Public walk over what the context will contain: (rel_path, os.DirEntry), sorted, ignore rules applied."""
+        return self._walk()
+
+    def estimate(self) -> Dict[str, int]:
+        """Cheap pre-pass (stat only, no reads) returning the context's size and file count."""
+        total_bytes = 0
+        file_count = 0
+        for _, entry in self._walk():
+            if entry.is_file(follow_symlinks=False):
+                total_bytes += entry.stat(follow_symlinks=False).st_size
+                file_count += 1
+        return {"bytes": total_bytes, "file_count": file_count}
+
+    def _tar_info(self, rel_path: str, entry: os.DirEntry) -> tarfile.TarInfo:
+        st = entry.stat(follow_symlinks=False)
+        info = tarfile.TarInfo(rel_path)
+        info.mode = stat.S_IMODE(st.st_mode)
+        info.mtime = int(st.st_mtime)
+        if entry.is_symlink():
+            info.type = tarfile.SYMTYPE
+            info.linkname = os.readlink(entry.path)
+        elif entry.is_dir(follow_symlinks=False):
+            info.type = tarfile.DIRTYPE
+        else:
+            info.size = st.st_size
+        return info
+
+    def stream(self) -> Iterator[bytes]:
+        """
+        Yields the tar archive in chunks as files are read.
+        `self.stats` holds context size, file count, time spent reading files
+        (`read_sec`) and the tree digest once exhausted.
+        """
+        digest = hashlib.sha256()
+        self.stats = {"context_bytes": 0, "file_count": 0, "skipped_entries": 0, "read_sec": 0.0, "tree_digest": None}
+
+        def emit(data: bytes) -> bytes:
+            self.stats["context_bytes"] += len(data)
+            return data
+
+        for rel_path, entry in self._walk(counters=self.stats):
+            if not (entry.is_file(follow_symlinks=False) or entry.is_dir(follow_symlinks=False) or entry.is_symlink()):
+                continue # sockets, fifos, devices never belong in a build context
+            info = self._tar_info(rel_path, entry)
+            override = self.overrides.get(rel_path) if info.isreg() else None
+            if override is not None:
+                info.size = len(override)
+            yield emit(info.tobuf(format=tarfile.PAX_FORMAT))
+            digest.update(f"{rel_path}\0{info.type.decode()}\0{info.mode:o}\0{info.linkname}\0".encode("utf-8"))
+            if not info.isreg():
+                continue
+
+            self.stats["file_count"] += 1
+            if override is not None:
+                digest.update(override)
+                yield emit(override)
+                padding = (-info.size) % self.BLOCK_SIZE
+                if padding:
+                    yield emit(b"\0" * padding)
+                continue
+
+            remaining = info.size
+            open_start = time.perf_counter()
+            with open(entry.path, "rb") as f:
+                self.stats["read_sec"] += time.perf_counter() - open_start
+                while remaining > 0:
+                    read_start = time.perf_counter()
+                    chunk = f.read(min(self.CHUNK_SIZE, remaining))
+                    self.stats["read_sec"] += time.perf_counter() - read_start
+                    if not chunk:
+                        raise OSError(f"{rel_path} shrank while streaming the build context.")
+                    remaining -= len(chunk)
+                    digest.update(chunk)
+                    yield emit(chunk)
+            padding = (-info.size) % self.BLOCK_SIZE
+            if padding:
+                yield emit(b"\0" * padding)
+
+        # End-of-archive marker: two zero blocks
+        yield emit(b"\0" * (self.BLOCK_SIZE * 2))
+        self.stats["read_sec"] = round(self.stats["read_sec"], 4)
+        self.stats["tree_digest"] = digest.hexdigest()
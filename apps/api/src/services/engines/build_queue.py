@@ -0,0 +1,529 @@
+import argparse
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, Any, List, Optional, Callable, Iterator
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from docker_sandbox import DockerSandbox
+
+class SandboxJobQueue:
+    """
+    Durable work queue for sandbox builds, backed by SQLite.
+
+    Workers claim jobs under a time-bound lease and extend it with heartbeats.
+    A job whose lease expires (worker crashed, host lost, build wedged) is put
+    back on the queue until `max_attempts` is exhausted, then marked dead.
+
+    Single host only: any number of worker processes on the machine can share
+    the database, but it runs in WAL mode, whose shared-memory index does not
+    work over network filesystems (NFS/SMB). Do not put it on shared storage;
+    workers on several hosts share a PostgresJobQueue instead (same interface).
+    """
+
+    DEFAULT_DB_PATH = "/var/lib/sandbox-queue/jobs.db"
+    # Driver errors a log flush may hit without failing the build
+    DB_ERRORS = (sqlite3.Error,)
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            project_path TEXT NOT NULL,
+            project_id TEXT,
+            options TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            worker_id TEXT,
+            lease_expires_at REAL,
+            heartbeat_at REAL,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            result TEXT
+        );
+        CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+        CREATE TABLE IF NOT EXISTS job_logs (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT NOT NULL,
+            worker_id TEXT,
+            text TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS job_logs_job ON job_logs (job_id, seq);
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, lease_sec: float = 60.0):
+        self.db_path = db_path
+        self.lease_sec = lease_sec
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Autocommit mode; multi-statement updates open BEGIN IMMEDIATE explicitly
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        try:
+            yield conn
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["options"] = json.loads(job["options"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def enqueue(self, project_path: str, project_id: Optional[str] = None,
+                options: Optional[Dict[str, Any]] = None, max_attempts: int = 3) -> str:
+        """Adds a build job; `options` are JSON-serialisable DockerSandbox kwargs."""
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, project_path, project_id, options, status, max_attempts, created_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, project_path, project_id, json.dumps(options or {}), max_attempts, time.time()),
+            )
+        return job_id
+
+    def requeue_expired(self) -> int:
+        """Returns jobs of workers that stopped heartbeating to the queue (or marks them dead)."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            dead = conn.execute(
+                "UPDATE jobs SET status = 'dead', finished_at = ?, worker_id = NULL "
+                "WHERE status = 'running' AND lease_expires_at < ? AND attempts >= max_attempts",
+                (now, now),
+            ).rowcount
+            requeued = conn.execute(
+                "UPDATE jobs SET status = 'queued', worker_id = NULL, lease_expires_at = NULL "
+                "WHERE status = 'running' AND lease_expires_at < ?",
+                (now,),
+            ).rowcount
+            conn.execute("COMMIT")
+        if requeued or dead:
+            print(f"⚠️ Lease expiry: {requeued} job(s) requeued, {dead} marked dead.")
+        return requeued
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Atomically takes the oldest queued job and leases it to `worker_id`."""
+        self.requeue_expired()
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker_id = ?, attempts = attempts + 1, "
+                "lease_expires_at = ?, heartbeat_at = ?, started_at = ? WHERE id = ?",
+                (worker_id, now + self.lease_sec, now, now, row["id"]),
+            )
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            conn.execute("COMMIT")
+        return self._row(job)
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Extends the lease. False means the job was taken away (lease expired and requeued)."""
+        now = time.time()
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ?, heartbeat_at = ? "
+                "WHERE id = ? AND worker_id = ? AND status = 'running'",
+                (now + self.lease_sec, now, job_id, worker_id),
+            ).rowcount
+        return updated == 1
+
+    def append_log(self, job_id: str, worker_id: str, text: str) -> None:
+        self.append_logs(job_id, worker_id, [text])
+
+    def append_logs(self, job_id: str, worker_id: str, lines: List[str]) -> None:
+        """Appends several log lines in one transaction (used to batch streamed output)."""
+        if not lines:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO job_logs (job_id, worker_id, text, created_at) VALUES (?, ?, ?, ?)",
+                [(job_id, worker_id, text, now) for text in lines],
+            )
+            conn.execute("COMMIT")
+
+    def complete(self, job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+        """Stores the result if this worker still holds the lease."""
+        status = "succeeded" if result.get("success") else "failed"
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, finished_at = ?, lease_expires_at = NULL "
+                "WHERE id = ? AND worker_id = ? AND status = 'running'",
+                (status, json.dumps(result, default=str), time.time(), job_id, worker_id),
+            ).rowcount
+        return updated == 1
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            return self._row(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def logs(self, job_id: str, after_seq: int = 0) -> List[Dict[str, Any]]:
+        """Log lines appended after `after_seq`, for incremental tailing."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT seq, worker_id, text, created_at FROM job_logs WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after_seq),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def wait(self, job_id: str, timeout_sec: float = 900, poll_sec: float = 1.0,
+             on_log: Optional[Callable[[Dict[str, Any]], None]] = None) -> Optional[Dict[str, Any]]:
+        """Blocks until the job finishes (or `timeout_sec`), streaming its logs to `on_log`."""
+        deadline = time.time() + timeout_sec
+        last_seq = 0
+        while True:
+            if on_log:
+                for line in self.logs(job_id, last_seq):
+                    last_seq = line["seq"]
+                    on_log(line)
+            job = self.get(job_id)
+            if job is None or job["status"] in ("succeeded", "failed", "dead") or time.time() >= deadline:
+                if on_log and job is not None:
+                    for line in self.logs(job_id, last_seq):
+                        on_log(line)
+                return job
+            time.sleep(poll_sec)
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {r["status"]: r["n"] for r in rows}
+
+
+class _PostgresConnection:
+    """sqlite3-style execute()/executemany() over a psycopg connection: qmark placeholders, dict rows."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, sql: str, params: Optional[tuple] = None):
+        # Without params psycopg sends a simple query, which may hold several statements (SCHEMA)
+        if params is None:
+            return self._conn.execute(sql)
+        return self._conn.execute(sql.replace("?", "%s"), params)
+
+    def executemany(self, sql: str, seq_of_params: List[tuple]) -> None:
+        with self._conn.cursor() as cur:
+            cur.executemany(sql.replace("?", "%s"), seq_of_params)
+
+    def transaction(self):
+        return self._conn.transaction()
+
+
+class PostgresJobQueue(SandboxJobQueue):
+    """
+    SandboxJobQueue on PostgreSQL, for workers spread over several hosts.
+
+    Claims use `SELECT ... FOR UPDATE SKIP LOCKED`, so concurrent workers never
+    take the same job nor block on each other's rows. Lease deadlines are set
+    and compared with the database clock, so host clock skew cannot expire a
+    healthy worker's lease. Requires the optional `psycopg` (v3) package.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            project_path TEXT NOT NULL,
+            project_id TEXT,
+            options TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            worker_id TEXT,
+            lease_expires_at DOUBLE PRECISION,
+            heartbeat_at DOUBLE PRECISION,
+            created_at DOUBLE PRECISION NOT NULL,
+            started_at DOUBLE PRECISION,
+            finished_at DOUBLE PRECISION,
+            result TEXT
+        );
+        CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+        CREATE TABLE IF NOT EXISTS job_logs (
+            seq BIGSERIAL PRIMARY KEY,
+            job_id TEXT NOT NULL,
+            worker_id TEXT,
+            text TEXT NOT NULL,
+            created_at DOUBLE PRECISION NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS job_logs_job ON job_logs (job_id, seq);
+    """
+
+    DB_NOW = "EXTRACT(EPOCH FROM clock_timestamp())"
+
+    def __init__(self, dsn: str, lease_sec: float = 60.0):
+        try:
+            import psycopg
+            from psycopg.rows import dict_row
+        except ImportError:
+            raise RuntimeError("PostgresJobQueue needs the psycopg package (pip install 'psycopg[binary]').")
+        self._psycopg, self._dict_row = psycopg, dict_row
+        self.DB_ERRORS = (psycopg.Error,)
+        self.dsn = dsn
+        self.db_path = dsn
+        self.lease_sec = lease_sec
+        with self._connect() as conn:
+            conn.execute(self.SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[_PostgresConnection]:
+        # Autocommit like the SQLite queue; multi-statement updates use conn.transaction()
+        conn = self._psycopg.connect(self.dsn, autocommit=True, row_factory=self._dict_row)
+        try:
+            yield _PostgresConnection(conn)
+        finally:
+            conn.close()
+
+    def requeue_expired(self) -> int:
+        with self._connect() as conn:
+            with conn.transaction():
+                dead = conn.execute(
+                    f"UPDATE jobs SET status = 'dead', finished_at = {self.DB_NOW}, worker_id = NULL "
+                    f"WHERE status = 'running' AND lease_expires_at < {self.DB_NOW} AND attempts >= max_attempts"
+                ).rowcount
+                requeued = conn.execute(
+                    "UPDATE jobs SET status = 'queued', worker_id = NULL, lease_expires_at = NULL "
+                    f"WHERE status = 'running' AND lease_expires_at < {self.DB_NOW}"
+                ).rowcount
+        if requeued or dead:
+            print(f"⚠️ Lease expiry: {requeued} job(s) requeued, {dead} marked dead.")
+        return requeued
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Takes the oldest queued job no other worker is claiming right now (SKIP LOCKED)."""
+        self.requeue_expired()
+        with self._connect() as conn:
+            job = conn.execute(
+                f"UPDATE jobs SET status = 'running', worker_id = ?, attempts = attempts + 1, "
+                f"lease_expires_at = {self.DB_NOW} + ?, heartbeat_at = {self.DB_NOW}, started_at = {self.DB_NOW} "
+                "WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at "
+                "LIMIT 1 FOR UPDATE SKIP LOCKED) RETURNING *",
+                (worker_id, self.lease_sec),
+            ).fetchone()
+        return self._row(job)
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        with self._connect() as conn:
+            updated = conn.execute(
+                f"UPDATE jobs SET lease_expires_at = {self.DB_NOW} + ?, heartbeat_at = {self.DB_NOW} "
+                "WHERE id = ? AND worker_id = ? AND status = 'running'",
+                (self.lease_sec, job_id, worker_id),
+            ).rowcount
+        return updated == 1
+
+    def append_logs(self, job_id: str, worker_id: str, lines: List[str]) -> None:
+        if not lines:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            with conn.transaction():
+                conn.executemany(
+                    "INSERT INTO job_logs (job_id, worker_id, text, created_at) VALUES (?, ?, ?, ?)",
+                    [(job_id, worker_id, text, now) for text in lines],
+                )
+
+
+def open_job_queue(target: str, lease_sec: float = 60.0) -> SandboxJobQueue:
+    """PostgresJobQueue for a postgres:// or postgresql:// DSN, otherwise the single-host SQLite queue at that path."""
+    if target.startswith(("postgres://", "postgresql://")):
+        return PostgresJobQueue(target, lease_sec=lease_sec)
+    return SandboxJobQueue(target, lease_sec=lease_sec)
+
+
+class JobLogStream:
+    """
+    Buffers output lines of a running job and appends them to the queue every
+    `flush_sec` from a background thread, so `wait()`/`logs()` can tail a build
+    while it runs without one SQLite write per line.
+    """
+
+    def __init__(self, queue: SandboxJobQueue, job_id: str, worker_id: str, flush_sec: float = 0.5):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.flush_sec = flush_sec
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+
+    def write(self, line: str) -> None:
+        with self._lock:
+            self._pending.append(line)
+
+    def flush(self) -> None:
+        with self._lock:
+            lines, self._pending = self._pending, []
+        try:
+            self.queue.append_logs(self.job_id, self.worker_id, lines)
+        except self.queue.DB_ERRORS as e:
+            # Losing a few log lines must not fail the build itself
+            print(f"⚠️ Could not append {len(lines)} log line(s) for job {self.job_id}: {e}")
+
+    def _flush_loop(self) -> None:
+        while not self._closed.wait(self.flush_sec):
+            self.flush()
+
+    def close(self) -> None:
+        self._closed.set()
+        self._thread.join()
+        self.flush()
+
+
+class SandboxBuildWorker:
+    """
+    Claims jobs from a SandboxJobQueue and runs them through DockerSandbox on
+    this host's Docker daemon. Build and test output is streamed into the job
+    log while each phase runs. A background thread heartbeats the lease; if the
+    lease is lost the result is discarded, since the job was handed to another worker.
+    """
+
+    def __init__(self, queue: SandboxJobQueue, worker_id: Optional[str] = None,
+                 sandbox_factory: Optional[Callable[..., DockerSandbox]] = None,
+                 poll_interval_sec: float = 1.0, log_flush_sec: float = 0.5):
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.sandbox_factory = sandbox_factory or DockerSandbox
+        self.poll_interval_sec = poll_interval_sec
+        self.log_flush_sec = log_flush_sec
+        self.heartbeat_interval_sec = max(1.0, queue.lease_sec / 3)
+
+    def _heartbeat_loop(self, job_id: str, done: threading.Event, lost: threading.Event) -> None:
+        while not done.wait(self.heartbeat_interval_sec):
+            if not self.queue.heartbeat(job_id, self.worker_id):
+                lost.set()
+                print(f"⚠️ Worker {self.worker_id} lost the lease on job {job_id}.")
+                return
+
+    def process(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Runs build + runtime validation, streaming their output to the job log as it is produced."""
+        job_id = job["id"]
+        done, lost = threading.Event(), threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, args=(job_id, done, lost), daemon=True)
+        heartbeat.start()
+        stream = JobLogStream(self.queue, job_id, self.worker_id, flush_sec=self.log_flush_sec)
+        start_time = time.time()
+        try:
+            log = stream.write
+            log(f"Worker {self.worker_id} picked up job (attempt {job['attempts']}/{job['max_attempts']}).")
+            sandbox = self.sandbox_factory(job["project_path"], project_id=job["project_id"], on_output=log, **job["options"])
+
+            log("=== BUILD ===")
+            build_res = sandbox.build_container()
+            log(f"Build {'succeeded' if build_res['success'] else 'failed'}.")
+            if not build_res["success"] or lost.is_set():
+                result = build_res
+            else:
+                log("=== RUNTIME VALIDATION ===")
+                run_res = sandbox.validate_runtime()
+                log(f"Runtime validation {'succeeded' if run_res['success'] else 'failed'}.")
+                result = {
+                    "success": run_res["success"],
+                    "log": f"BUILD LOG:\n{build_res['log']}\n\nRUNTIME LOG:\n{run_res['log']}",
+                    "telemetry": {"build_metrics": build_res["telemetry"], "run_metrics": run_res["telemetry"]},
+                }
+        except Exception as e:
+            stream.write(f"ERROR: {e}")
+            result = {"success": False, "log": str(e), "telemetry": {"exit_code": 1}}
+        finally:
+            done.set()
+            heartbeat.join()
+            stream.close()
+
+        result.setdefault("telemetry", {})["executor"] = {
+            "worker_id": self.worker_id,
+            "attempt": job["attempts"],
+            "queue_wait_sec": round(job["started_at"] - job["created_at"], 2),
+            "execution_sec": round(time.time() - start_time, 2),
+        }
+        if lost.is_set() or not self.queue.complete(job_id, self.worker_id, result):
+            print(f"⚠️ Discarding result of job {job_id}: lease no longer held by {self.worker_id}.")
+        return result
+
+    def run_once(self) -> bool:
+        """Processes at most one job; False when the queue was empty."""
+        job = self.queue.claim(self.worker_id)
+        if job is None:
+            return False
+        print(f"Worker {self.worker_id} running job {job['id']} for {job['project_path']}...")
+        self.process(job)
+        return True
+
+    def run_forever(self, stop_event: Optional[threading.Event] = None) -> None:
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            if not self.run_once():
+                stop_event.wait(self.poll_interval_sec)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Distributed sandbox build queue.")
+    parser.add_argument("--db", default=os.environ.get("SANDBOX_QUEUE_DB", SandboxJobQueue.DEFAULT_DB_PATH),
+                        help="SQLite path (single host) or postgresql:// DSN (multi-host)")
+    parser.add_argument("--lease-sec", type=float, default=60.0)
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="Claim and run jobs on this host")
+    worker.add_argument("--concurrency", type=int, default=1)
+    enqueue = sub.add_parser("enqueue", help="Queue a sandbox build")
+    enqueue.add_argument("project_path")
+    enqueue.add_argument("--project-id")
+    enqueue.add_argument("--options", default="{}", help="DockerSandbox kwargs as JSON")
+    enqueue.add_argument("--wait", action="store_true", help="Tail logs until the job finishes")
+    sub.add_parser("status", help="Job counts per status")
+    args = parser.parse_args(argv)
+
+    queue = open_job_queue(args.db, lease_sec=args.lease_sec)
+    if args.command == "worker":
+        threads = [threading.Thread(target=SandboxBuildWorker(queue).run_forever, daemon=True)
+                   for _ in range(args.concurrency)]
+        for t in threads:
+            t.start()
+        try:
+            for t in threads:
+                t.join()
+        except KeyboardInterrupt:
+            pass
+        return 0
+    if args.command == "enqueue":
+        job_id = queue.enqueue(os.path.abspath(args.project_path), args.project_id, json.loads(args.options))
+        print(job_id)
+        if not args.wait:
+            return 0
+        job = queue.wait(job_id, on_log=lambda line: print(line["text"]))
+        print(json.dumps({"status": job["status"], "telemetry": (job["result"] or {}).get("telemetry")}, indent=2))
+        return 0 if job["status"] == "succeeded" else 1
+    print(json.dumps(queue.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
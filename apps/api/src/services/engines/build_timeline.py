@@ -0,0 +1,201 @@
+import base64
+import json
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable
+
+class BuildTimelineParser:
+    """
+    Turns machine-readable build progress into a per-step timeline.
+    Understands BuildKit `--progress=rawjson` SolveStatus records (CLI backend)
+    and the classic Engine API JSON stream ("Step N/M : ..."), and rebuilds a
+    human-readable log so the ErrorClassifier patterns keep matching.
+    Each log line is also handed to `on_line` as soon as it is decoded.
+    """
+
+    def __init__(self, on_line: Optional[Callable[[str], None]] = None):
+        self.on_line = on_line
+        self._vertices: Dict[str, Dict[str, Any]] = {}
+        self._order: List[str] = []
+        self._vertex_bytes: Dict[str, Dict[str, int]] = {}
+        self._log_lines: List[str] = []
+        self._classic_step: Optional[str] = None
+        self._clock_origin = time.time()
+
+    @staticmethod
+    def _parse_ts(value: Optional[str]) -> Optional[float]:
+        """Parses BuildKit RFC3339 timestamps (nanosecond precision) to epoch seconds."""
+        if not value:
+            return None
+        match = re.match(r"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(\.\d+)?(Z|[+-]\d{2}:\d{2})?", value)
+        if not match:
+            return None
+        fraction = (match.group(2) or ".0")[:7]
+        zone = match.group(3) or "Z"
+        zone = "+00:00" if zone == "Z" else zone
+        return datetime.fromisoformat(f"{match.group(1)}{fraction}{zone}").timestamp()
+
+    def _vertex(self, key: str, name: str) -> Dict[str, Any]:
+        if key not in self._vertices:
+            self._vertices[key] = {"step": name, "started": None, "ended": None, "cached": False, "error": None}
+            self._order.append(key)
+        return self._vertices[key]
+
+    def _log(self, line: str) -> None:
+        self._log_lines.append(line)
+        if self.on_line is not None:
+            self.on_line(line)
+
+    def feed_line(self, line: str) -> None:
+        """Feeds one raw output line; non-JSON lines are kept verbatim in the log."""
+        stripped = line.strip()
+        if not stripped:
+            return
+        if stripped.startswith("{"):
+            try:
+                self.feed(json.loads(stripped))
+                return
+            except json.JSONDecodeError:
+                pass
+        self._log(line.rstrip("\n"))
+
+    def feed(self, event: Dict[str, Any]) -> None:
+        """Feeds one decoded progress event (rawjson SolveStatus or classic stream event)."""
+        if "vertexes" in event or "statuses" in event or "logs" in event:
+            self._feed_solve_status(event)
+        else:
+            self._feed_classic(event)
+
+    def _feed_solve_status(self, event: Dict[str, Any]) -> None:
+        for v in event.get("vertexes") or []:
+            if v["digest"] not in self._vertices:
+                self._log(f"=> {v.get('name', v['digest'])}")
+            vertex = self._vertex(v["digest"], v.get("name", v["digest"]))
+            vertex["started"] = self._parse_ts(v.get("started")) or vertex["started"]
+            vertex["ended"] = self._parse_ts(v.get("completed")) or vertex["ended"]
+            vertex["cached"] = vertex["cached"] or bool(v.get("cached"))
+            if v.get("error"):
+                vertex["error"] = v["error"]
+                self._log(f"ERROR: {vertex['step']}: {v['error']}")
+        for status in event.get("statuses") or []:
+            per_id = self._vertex_bytes.setdefault(status.get("vertex", ""), {})
+            per_id[status.get("id", "")] = max(per_id.get(status.get("id", ""), 0), status.get("current") or 0)
+        for entry in event.get("logs") or []:
+            vertex = self._vertices.get(entry.get("vertex"))
+            text = base64.b64decode(entry.get("data") or b"").decode("utf-8", "replace")
+            prefix = f"{vertex['step']} | " if vertex else ""
+            for line in text.splitlines():
+                self._log(prefix + line)
+
+    def _feed_classic(self, event: Dict[str, Any]) -> None:
+        now = time.time()
+        if "error" in event:
+            message = event.get("error") or event.get("errorDetail", {}).get("message", "")
+            self._log(message)
+            if self._classic_step:
+                self._vertices[self._classic_step]["error"] = message
+            return
+        detail = event.get("progressDetail") or {}
+        if detail.get("current") and self._classic_step:
+            per_id = self._vertex_bytes.setdefault(self._classic_step, {})
+            per_id[event.get("id", "")] = max(per_id.get(event.get("id", ""), 0), detail["current"])
+        text = event.get("stream")
+        if not text:
+            return
+        self._log(text.rstrip("\n"))
+        if text.startswith("Step "):
+            if self._classic_step:
+                self._vertices[self._classic_step]["ended"] = now
+            self._classic_step = f"classic-{len(self._order)}"
+            vertex = self._vertex(self._classic_step, text.split(" : ", 1)[-1].strip())
+            vertex["started"] = now
+        elif "Using cache" in text and self._classic_step:
+            self._vertices[self._classic_step]["cached"] = True
+
+    def finish(self) -> None:
+        """Closes the last open classic step once the stream has ended."""
+        if self._classic_step and self._vertices[self._classic_step]["ended"] is None:
+            self._vertices[self._classic_step]["ended"] = time.time()
+
+    def timeline(self) -> List[Dict[str, Any]]:
+        """Returns the steps ordered by start, with times relative to the first step."""
+        started = [v["started"] for v in self._vertices.values() if v["started"] is not None]
+        origin = min(started) if started else self._clock_origin
+        steps = []
+        for key in self._order:
+            v = self._vertices[key]
+            start = v["started"] if v["started"] is not None else origin
+            end = v["ended"] if v["ended"] is not None else start
+            steps.append({
+                "step": v["step"],
+                "started": round(start - origin, 3),
+                "ended": round(end - origin, 3),
+                "duration_sec": round(max(end - start, 0.0), 3),
+                "cached": v["cached"],
+                "bytes": sum(self._vertex_bytes.get(key, {}).values()),
+                "error": v["error"],
+            })
+        return sorted(steps, key=lambda s: s["started"])
+
+    def log_text(self) -> str:
+        return "\n".join(self._log_lines)
+
+
+class BuildTimelineAggregator:
+    """
+    Fleet-wide roll-up of build timelines.
+    Answers "which Dockerfile steps dominate our build time?" across every sandbox build.
+    """
+
+    STAGE_PREFIX = re.compile(r"^\[[^\]]*\d+/\d+\]\s*")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._steps: Dict[str, Dict[str, Any]] = {}
+        self.total_builds = 0
+        self.total_step_sec = 0.0
+
+    @classmethod
+    def normalize_step(cls, name: str) -> str:
+        """'[build 3/7] RUN npm ci' and 'RUN  npm ci' both become 'RUN npm ci'."""
+        name = cls.STAGE_PREFIX.sub("", name.strip())
+        return re.sub(r"\s+", " ", name)[:120]
+
+    def record(self, timeline: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self.total_builds += 1
+            for step in timeline:
+                key = self.normalize_step(step["step"])
+                agg = self._steps.setdefault(key, {"step": key, "occurrences": 0, "total_sec": 0.0, "cached": 0, "bytes": 0, "max_sec": 0.0})
+                agg["occurrences"] += 1
+                agg["total_sec"] += step["duration_sec"]
+                agg["max_sec"] = max(agg["max_sec"], step["duration_sec"])
+                agg["cached"] += 1 if step["cached"] else 0
+                agg["bytes"] += step.get("bytes", 0)
+                self.total_step_sec += step["duration_sec"]
+
+    def summary(self, top_n: int = 10) -> Dict[str, Any]:
+        """Top steps by cumulative wall time, with their share of all step time."""
+        with self._lock:
+            ranked = sorted(self._steps.values(), key=lambda a: a["total_sec"], reverse=True)[:top_n]
+            total = self.total_step_sec or 1.0
+            return {
+                "total_builds": self.total_builds,
+                "total_step_sec": round(self.total_step_sec, 2),
+                "top_steps": [{
+                    "step": a["step"],
+                    "occurrences": a["occurrences"],
+                    "total_sec": round(a["total_sec"], 2),
+                    "avg_sec": round(a["total_sec"] / a["occurrences"], 2),
+                    "max_sec": round(a["max_sec"], 2),
+                    "cache_hit_rate": round(a["cached"] / a["occurrences"], 2),
+                    "bytes": a["bytes"],
+                    "share_of_build_time": round(a["total_sec"] / total, 4),
+                } for a in ranked],
+            }
+
+
+# Shared by every DockerSandbox in this process unless one is injected
+fleet_build_timeline = BuildTimelineAggregator()
@@ -0,0 +1,313 @@
+import os
+import queue
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+class TscWatchWorker:
+    """
+    Long-lived `tsc --watch --noEmit` over a shadow copy of one TypeScript
+    project (node_modules is symlinked, not copied). A check writes the patched
+    file into the shadow tree and waits for the next incremental cycle, then
+    restores the original, so each check costs two incremental compilations
+    instead of a cold `tsc` run.
+    """
+
+    CYCLE_DONE = re.compile(r"Found (\d+) errors?\b")
+    DIAGNOSTIC = re.compile(r"^(.+?)\((\d+),(\d+)\): error (TS\d+): (.*)$")
+    SHADOW_IGNORES = ("node_modules", ".git", "dist", "build", ".angular", "coverage")
+
+    def __init__(self, project_root: str, tsc_path: str, timeout_sec: float = 60):
+        self.project_root = project_root
+        self.timeout_sec = timeout_sec
+        self.shadow_root = tempfile.mkdtemp(prefix="tsc-worker-")
+        shutil.copytree(project_root, self.shadow_root, dirs_exist_ok=True, ignore=shutil.ignore_patterns(*self.SHADOW_IGNORES))
+        node_modules = os.path.join(project_root, "node_modules")
+        if os.path.isdir(node_modules):
+            os.symlink(node_modules, os.path.join(self.shadow_root, "node_modules"))
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self.process = subprocess.Popen(
+            [tsc_path, "--watch", "--noEmit", "--preserveWatchOutput", "--pretty", "false",
+             "-p", os.path.join(self.shadow_root, "tsconfig.json")],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, cwd=self.shadow_root)
+        threading.Thread(target=self._pump, daemon=True).start()
+        # The initial full compilation is the baseline every check is compared with
+        try:
+            self.baseline = self._wait_cycle()
+        except (RuntimeError, subprocess.TimeoutExpired):
+            self.close()
+            raise
+
+    def _pump(self) -> None:
+        for line in self.process.stdout:
+            self._lines.put(line.rstrip("\n"))
+        self._lines.put(None)
+
+    def _wait_cycle(self) -> List[Tuple[str, str, str]]:
+        diagnostics = []
+        deadline = time.time() + self.timeout_sec
+        while True:
+            try:
+                line = self._lines.get(timeout=max(0.0, deadline - time.time()))
+            except queue.Empty:
+                raise subprocess.TimeoutExpired("tsc --watch", self.timeout_sec)
+            if line is None:
+                raise RuntimeError("tsc --watch exited")
+            match = self.DIAGNOSTIC.match(line)
+            if match:
+                path, _, _, code, message = match.groups()
+                diagnostics.append((os.path.relpath(os.path.join(self.shadow_root, path), self.shadow_root), code, message))
+            elif self.CYCLE_DONE.search(line):
+                return diagnostics
+
+    @staticmethod
+    def _read(path: str) -> Optional[str]:
+        if not os.path.isfile(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    @staticmethod
+    def _write(path: str, content: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def compile(self, relative_path: str, content: str) -> List[Tuple[str, str, str]]:
+        """Diagnostics (file, code, message) of the whole project with `relative_path` replaced by `content`."""
+        target = os.path.join(self.shadow_root, relative_path)
+        with self._lock:
+            original = self._read(target)
+            current = self._read(os.path.join(self.project_root, relative_path))
+            if current is not None and current != original:
+                # The project file changed since the shadow copy (e.g. an applied patch): refresh the baseline
+                self._write(target, current)
+                self.baseline = self._wait_cycle()
+                original = current
+            if original == content:
+                return list(self.baseline)
+            self._write(target, content)
+            try:
+                return self._wait_cycle()
+            finally:
+                if original is None:
+                    os.remove(target)
+                else:
+                    self._write(target, original)
+                # Let the restore cycle finish so the next check starts from the baseline
+                self._wait_cycle()
+
+    def close(self) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        shutil.rmtree(self.shadow_root, ignore_errors=True)
+
+
+class JavacWorker:
+    """
+    Single-file javac check for one Maven/Gradle module. javac has no watch
+    mode, so the worker keeps what is reusable warm instead: the source path,
+    the classpath (module classes plus resolved dependency jars, when the build
+    left them under target/ or build/) and the baseline diagnostics per
+    original file. The patched file is compiled from an overlay source root
+    that shadows src/main/java; other project sources are read on demand.
+    """
+
+    DIAGNOSTIC = re.compile(r"^(.+?\.java):(\d+): error: (.*)$")
+    CLASSPATH_DIRS = ("target/classes", "build/classes/java/main")
+    DEPENDENCY_DIRS = ("target/dependency", "build/dependency")
+    JVM_FLAGS = ["-J-XX:TieredStopAtLevel=1", "-J-Xshare:auto"]
+
+    def __init__(self, source_root: str, javac_path: str, timeout_sec: float = 60):
+        self.source_root = source_root
+        self.module_root = os.path.dirname(os.path.dirname(os.path.dirname(source_root)))
+        self.javac_path = javac_path
+        self.timeout_sec = timeout_sec
+        self.classpath = self._classpath()
+        self._baselines: Dict[str, List[Tuple[str, str, str]]] = {}
+        self._lock = threading.Lock()
+
+    def _classpath(self) -> str:
+        entries = [os.path.join(self.module_root, d) for d in self.CLASSPATH_DIRS
+                   if os.path.isdir(os.path.join(self.module_root, d))]
+        entries += [os.path.join(self.module_root, d, "*") for d in self.DEPENDENCY_DIRS
+                    if os.path.isdir(os.path.join(self.module_root, d))]
+        return os.pathsep.join(entries)
+
+    def _javac(self, relative_path: str, content: str) -> List[Tuple[str, str, str]]:
+        with tempfile.TemporaryDirectory(prefix="javac-check-") as scratch:
+            overlay = os.path.join(scratch, "src")
+            target = os.path.join(overlay, relative_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "w", encoding="utf-8") as f:
+                f.write(content)
+            cmd = [self.javac_path, *self.JVM_FLAGS, "-proc:none", "-implicit:none", "-Xmaxerrs", "200",
+                   "-d", os.path.join(scratch, "out"), "-sourcepath", os.pathsep.join([overlay, self.source_root])]
+            if self.classpath:
+                cmd += ["-cp", self.classpath]
+            result = subprocess.run(cmd + [target], capture_output=True, text=True, timeout=self.timeout_sec)
+            diagnostics = []
+            for line in (result.stdout + result.stderr).splitlines():
+                match = self.DIAGNOSTIC.match(line)
+                if match:
+                    path, _, message = match.groups()
+                    for root in (overlay, self.source_root):
+                        if path.startswith(root):
+                            path = os.path.relpath(path, root)
+                    diagnostics.append((path, "javac", message))
+            return diagnostics
+
+    def compile(self, relative_path: str, content: str) -> List[Tuple[str, str, str]]:
+        return self._javac(relative_path, content)
+
+    def baseline_for(self, relative_path: str) -> List[Tuple[str, str, str]]:
+        original_path = os.path.join(self.source_root, relative_path)
+        if not os.path.isfile(original_path):
+            return []
+        # Keyed by mtime so a patch applied to the project since refreshes the baseline
+        key = f"{relative_path}:{os.stat(original_path).st_mtime_ns}"
+        with self._lock:
+            if key not in self._baselines:
+                with open(original_path, "r", encoding="utf-8") as f:
+                    self._baselines[key] = self._javac(relative_path, f.read())
+            return self._baselines[key]
+
+    def close(self) -> None:
+        pass
+
+
+class IncrementalCompilePrecheck:
+    """
+    Seconds-level compile check of a patched file before the full sandbox
+    rebuild. Toolchain workers (tsc watch per tsconfig project, javac per Java
+    source root) start on first use and stay warm until `close()`.
+
+    Only diagnostics the patch *introduces* fail the check: errors already in
+    the unpatched baseline (including ones caused by dependencies that are not
+    resolvable on this host) are ignored. Files with no usable toolchain are
+    reported as "skipped" and never block a patch. A worker that times out or
+    dies is closed and replaced on the next check, since a late tsc cycle would
+    otherwise be read as the next check's result.
+    """
+
+    TS_EXTENSIONS = {".ts", ".tsx"}
+    JAVA_SOURCE_ROOT = os.path.join("src", "main", "java")
+
+    def __init__(self, project_path: str, timeout_sec: float = 60):
+        self.project_path = os.path.abspath(project_path)
+        self.timeout_sec = timeout_sec
+        self._workers: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.stats = {"checks": 0, "passed": 0, "failed": 0, "skipped": 0}
+
+    def __enter__(self) -> "IncrementalCompilePrecheck":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _tsc_path(self, project_root: str) -> Optional[str]:
+        local = os.path.join(project_root, "node_modules", ".bin", "tsc")
+        return local if os.path.isfile(local) else shutil.which("tsc")
+
+    def _worker_for(self, absolute_path: str) -> Tuple[Optional[Any], str]:
+        """(worker, path relative to the worker root), or (None, reason) when no toolchain applies."""
+        extension = os.path.splitext(absolute_path)[1].lower()
+        directory = os.path.dirname(absolute_path)
+        if extension in self.TS_EXTENSIONS:
+            # Nearest tsconfig.json between the file and the project root
+            while self._within_project(directory):
+                if os.path.isfile(os.path.join(directory, "tsconfig.json")):
+                    tsc = self._tsc_path(directory)
+                    if tsc is None:
+                        return None, "tsc not installed"
+                    return self._start(directory, lambda: TscWatchWorker(directory, tsc, self.timeout_sec)), \
+                        os.path.relpath(absolute_path, directory)
+                parent = os.path.dirname(directory)
+                if parent == directory:
+                    break
+                directory = parent
+            return None, "no tsconfig.json"
+        if extension == ".java":
+            marker = os.sep + self.JAVA_SOURCE_ROOT + os.sep
+            if marker not in absolute_path:
+                return None, "not under src/main/java"
+            source_root = absolute_path.split(marker, 1)[0] + os.sep + self.JAVA_SOURCE_ROOT
+            javac = shutil.which("javac")
+            if javac is None:
+                return None, "javac not installed"
+            return self._start(source_root, lambda: JavacWorker(source_root, javac, self.timeout_sec)), \
+                os.path.relpath(absolute_path, source_root)
+        return None, f"no incremental toolchain for {extension or 'this file'}"
+
+    def _within_project(self, path: str) -> bool:
+        return os.path.commonpath([path, self.project_path]) == self.project_path
+
+    def _start(self, root: str, factory) -> Any:
+        with self._lock:
+            if root not in self._workers:
+                print(f"🔧 Starting compile worker for {os.path.relpath(root, self.project_path)}")
+                self._workers[root] = factory()
+            return self._workers[root]
+
+    def _retire(self, worker: Any) -> None:
+        """Closes a worker left in an unknown state; the next check for its root starts a fresh one."""
+        with self._lock:
+            self._workers = {root: w for root, w in self._workers.items() if w is not worker}
+        worker.close()
+
+    @staticmethod
+    def _new_errors(baseline: List[Tuple[str, str, str]], patched: List[Tuple[str, str, str]]) -> List[Tuple[str, str, str]]:
+        # Line numbers shift with any edit, so diagnostics are compared as (file, code, message) multisets
+        introduced = Counter(patched) - Counter(baseline)
+        new_errors = []
+        for diagnostic in patched:
+            if introduced[diagnostic] > 0:
+                introduced[diagnostic] -= 1
+                new_errors.append(diagnostic)
+        return new_errors
+
+    def check(self, file_path: str, updated_content: str) -> Dict[str, Any]:
+        """
+        Compiles `file_path` (relative to the project) with `updated_content`.
+        Returns {"status": "passed" | "failed" | "skipped", "new_errors", "duration_sec", "reason"}.
+        """
+        start_time = time.time()
+        absolute_path = os.path.abspath(os.path.join(self.project_path, file_path))
+        result = {"status": "skipped", "new_errors": [], "duration_sec": 0.0, "reason": None}
+        worker = None
+        try:
+            worker, relative_path = self._worker_for(absolute_path)
+            if worker is None:
+                result["reason"] = relative_path
+            else:
+                patched = worker.compile(relative_path, updated_content)
+                baseline = worker.baseline if isinstance(worker, TscWatchWorker) else worker.baseline_for(relative_path)
+                new_errors = self._new_errors(baseline, patched)
+                result["status"] = "failed" if new_errors else "passed"
+                result["new_errors"] = [f"{path}: {code} {message}" for path, code, message in new_errors]
+        except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+            # A broken toolchain must not block the fix; the sandbox build stays authoritative
+            result["reason"] = f"compile worker unavailable: {e}"
+            if worker is not None:
+                self._retire(worker)
+        result["duration_sec"] = round(time.time() - start_time, 3)
+        with self._lock:
+            self.stats["checks"] += 1
+            self.stats[result["status"]] += 1
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            workers, self._workers = list(self._workers.values()), {}
+        for worker in workers:
+            worker.close()
@@ -0,0 +1,238 @@
+import os
+import re
+import threading
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+class ContextMinimizer:
+    """
+    Shrinks the code context sent to the debug agent.
+
+    Instead of the whole file, the payload carries the enclosing scope of the
+    failing line (the method/function, or the class body for field errors in
+    Java/TS), cut to a token budget around that line. The declarations of the
+    enclosing blocks and only the imports the window or error log refer to are
+    sent separately as read-only context. Error log lines that just echo source
+    already in the window (javac/tsc code frames with ^/~ markers) and repeated
+    lines are dropped.
+
+    The window is a contiguous line range, so the model's new text for the
+    excerpt can be spliced back into the full file (see `splice`).
+    """
+
+    CHARS_PER_TOKEN = 4 # same ratio as patch_debugger.estimate_tokens
+    LOG_SHARE = 0.4     # part of the budget the error log may use
+    BRACE_EXTENSIONS = {".java", ".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs", ".kt", ".scala"}
+    FALLBACK_RADIUS = 30 # lines kept around the failing line for other languages
+
+    CONTROL_HEADER = re.compile(
+        r"^\s*(\}\s*)?(if|else|for|while|do|try|catch|finally|switch|case|default|synchronized|return)\b"
+        r"|^\s*static\s*\{|[=:(,\[?]\s*\{\s*$"
+        r"|[(,]\s*(async\s+)?(\([^)]*\)|\w+)\s*=>\s*\{\s*$") # callbacks passed as arguments
+    STRING_LITERAL = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|`(?:\\.|[^`\\])*`')
+    IMPORT_LINE = re.compile(r"^\s*(import\b|package\b|(const|let|var)\s+.*=\s*require\()")
+    IDENTIFIER = re.compile(r"[A-Za-z_$][\w$]*")
+    MARKER_LINE = re.compile(r"^\s*[\^~]+\s*$")
+    LINE_NUMBER = re.compile(r"^\d+$")
+
+    def __init__(self, max_tokens: int = 1500):
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self.totals = {"calls": 0, "minimized": 0, "bytes_in": 0, "bytes_out": 0}
+
+    # --- Public API ------------------------------------------------------
+
+    def minimize(self, file_path: str, failing_line: str, source_code: str, error_log: str) -> Dict[str, Any]:
+        """
+        Returns {"snippet", "outline", "error_log", "window", "stats"}.
+        `window` is the 1-based inclusive (start, end) line range of `snippet`,
+        or None when the whole file is sent unchanged.
+        """
+        max_chars = self.max_tokens * self.CHARS_PER_TOKEN
+        lines = source_code.splitlines()
+
+        # 1. Error log: drop echoed source and repeated lines, then cap it
+        log = self._dedupe_log(error_log, {l.strip() for l in lines if len(l.strip()) >= 8})
+        log = self._cap_log(log, int(max_chars * self.LOG_SHARE))
+        snippet_chars = max(max_chars - len(log), max_chars // 2)
+
+        # 2. Code window around the failing line
+        index = self._locate(lines, failing_line)
+        if len(source_code) <= snippet_chars or index is None:
+            snippet, outline, window = source_code, "", None
+        else:
+            start, end, headers = self._scope(file_path, lines, index)
+            start, end = self._fit(lines, index, start, end, snippet_chars)
+            snippet = "\n".join(lines[start:end + 1])
+            # Declarations the (possibly narrowed) window no longer shows
+            outline = "\n".join(self._imports(lines, start, end, snippet + "\n" + failing_line + "\n" + log)
+                                 + [header for line_no, header in headers if line_no < start])
+            window = (start + 1, end + 1)
+
+        stats = self._stats(source_code, error_log, snippet, outline, log, window)
+        return {"snippet": snippet, "outline": outline, "error_log": log, "window": window, "stats": stats}
+
+    @staticmethod
+    def splice(source_code: str, window: Optional[Tuple[int, int]], updated_content: str) -> str:
+        """Replaces the window's lines of `source_code` with `updated_content`."""
+        if window is None:
+            return updated_content
+        lines = source_code.splitlines(keepends=True)
+        start, end = window
+        if updated_content and not updated_content.endswith("\n") and end < len(lines):
+            updated_content += "\n"
+        return "".join(lines[:start - 1]) + updated_content + "".join(lines[end:])
+
+    # --- Code window -----------------------------------------------------
+
+    def _locate(self, lines: List[str], failing_line: str) -> Optional[int]:
+        """0-based index of the failing line; accepts the line text or a 1-based line number."""
+        target = failing_line.strip()
+        if not target:
+            return None
+        if self.LINE_NUMBER.match(target):
+            number = int(target)
+            return number - 1 if 1 <= number <= len(lines) else None
+        for i, line in enumerate(lines):
+            if target in line:
+                return i
+        return None
+
+    def _code_only(self, line: str, in_comment: bool) -> Tuple[str, bool]:
+        """Strips string literals and comments so braces inside them are not counted."""
+        out = []
+        i = 0
+        line = self.STRING_LITERAL.sub('""', line)
+        while i < len(line):
+            if in_comment:
+                close = line.find("*/", i)
+                if close < 0:
+                    return "".join(out), True
+                i, in_comment = close + 2, False
+                continue
+            if line.startswith("//", i):
+                break
+            if line.startswith("/*", i):
+                in_comment, i = True, i + 2
+                continue
+            out.append(line[i])
+            i += 1
+        return "".join(out), in_comment
+
+    def _blocks(self, lines: List[str]) -> List[Tuple[int, int]]:
+        """(open_line, close_line) of every brace block; unclosed blocks run to EOF."""
+        blocks, stack, in_comment = [], [], False
+        for i, line in enumerate(lines):
+            code, in_comment = self._code_only(line, in_comment)
+            for ch in code:
+                if ch == "{":
+                    stack.append(i)
+                elif ch == "}" and stack:
+                    blocks.append((stack.pop(), i))
+        blocks.extend((open_line, len(lines) - 1) for open_line in stack)
+        return blocks
+
+    def _header(self, lines: List[str], open_line: int) -> Tuple[int, str]:
+        """Declaration line of a block (the previous line for Allman-style braces)."""
+        if lines[open_line].strip() == "{" and open_line > 0:
+            open_line -= 1
+        return open_line, lines[open_line].rstrip()
+
+    def _scope(self, file_path: str, lines: List[str], index: int) -> Tuple[int, int, List[Tuple[int, str]]]:
+        """Line range of the enclosing method/function/class and the headers of the blocks around it."""
+        if os.path.splitext(file_path)[1].lower() not in self.BRACE_EXTENSIONS:
+            return max(0, index - self.FALLBACK_RADIUS), min(len(lines) - 1, index + self.FALLBACK_RADIUS), []
+        enclosing = sorted((b for b in self._blocks(lines) if b[0] <= index <= b[1]), reverse=True)
+        for depth, (open_line, close_line) in enumerate(enclosing):
+            header_line, header = self._header(lines, open_line)
+            # Control-flow bodies and object/array literals are not scopes; keep widening
+            if self.CONTROL_HEADER.search(header) and depth < len(enclosing) - 1:
+                continue
+            headers = [self._header(lines, b[0]) for b in enclosing[depth:]]
+            return header_line, close_line, sorted(headers)
+        return 0, len(lines) - 1, []
+
+    def _fit(self, lines: List[str], index: int, start: int, end: int, max_chars: int) -> Tuple[int, int]:
+        """Narrows [start, end] symmetrically around `index` until it fits `max_chars`."""
+        if sum(len(l) + 1 for l in lines[start:end + 1]) <= max_chars:
+            return start, end
+        lo = hi = index
+        used = len(lines[index]) + 1
+        while True:
+            grew = False
+            for candidate in (lo - 1, hi + 1):
+                if start <= candidate <= end and used + len(lines[candidate]) + 1 <= max_chars:
+                    used += len(lines[candidate]) + 1
+                    lo, hi = min(lo, candidate), max(hi, candidate)
+                    grew = True
+            if not grew:
+                return lo, hi
+
+    def _imports(self, lines: List[str], start: int, end: int, referenced_text: str) -> List[str]:
+        """Package line plus the imports whose names appear in the window or the error log."""
+        referenced = set(self.IDENTIFIER.findall(referenced_text))
+        kept = []
+        for i, line in enumerate(lines):
+            if start <= i <= end or not self.IMPORT_LINE.match(line):
+                continue
+            stripped = line.strip()
+            if stripped.startswith("package") or self._imported_names(stripped) & referenced or "*" in stripped.split(" from ")[0]:
+                kept.append(line.rstrip())
+        return kept
+
+    def _imported_names(self, import_line: str) -> Set[str]:
+        if import_line.startswith("import") and ("from" in import_line or "{" in import_line or "require(" in import_line):
+            # TS/JS: import Default, { A, B as C } from 'x'; import * as X from 'x'
+            clause = re.split(r"\bfrom\b|=\s*require\(", import_line)[0]
+            clause = re.sub(r"\b\w+\s+as\s+", "", clause.replace("import", "", 1).replace("type ", ""))
+            return set(self.IDENTIFIER.findall(clause))
+        if import_line.startswith("import"):
+            # Java: import [static] a.b.C[.member];
+            target = import_line.rstrip(";").split()[-1]
+            return {target.rsplit(".", 1)[-1]}
+        # const { a, b } = require('x')
+        return set(self.IDENTIFIER.findall(import_line.split("=")[0])) - {"const", "let", "var"}
+
+    # --- Error log -------------------------------------------------------
+
+    def _dedupe_log(self, error_log: str, source_lines: Set[str]) -> str:
+        kept, seen, skip_marker = [], set(), False
+        for line in error_log.splitlines():
+            stripped = line.strip()
+            # Strip tsc-style "12   code" gutters before comparing with the source
+            code = re.sub(r"^\d+\s+", "", stripped)
+            if skip_marker and self.MARKER_LINE.match(line):
+                continue
+            skip_marker = False
+            if stripped and (code in source_lines or stripped in source_lines):
+                skip_marker = True
+                continue
+            if len(stripped) >= 8 and stripped in seen:
+                continue
+            seen.add(stripped)
+            kept.append(line)
+        return "\n".join(kept)
+
+    def _cap_log(self, log: str, max_chars: int) -> str:
+        # Compiler output puts the first (root-cause) errors first; keep the head
+        if len(log) <= max_chars:
+            return log
+        return log[:max_chars].rsplit("\n", 1)[0] + "\n...\n[TRIMMED]"
+
+    # --- Reporting -------------------------------------------------------
+
+    def _stats(self, source_code: str, error_log: str, snippet: str, outline: str, log: str,
+               window: Optional[Tuple[int, int]]) -> Dict[str, Any]:
+        bytes_in = len(source_code.encode("utf-8")) + len(error_log.encode("utf-8"))
+        bytes_out = sum(len(part.encode("utf-8")) for part in (snippet, outline, log))
+        with self._lock:
+            self.totals["calls"] += 1
+            self.totals["minimized"] += 1 if window else 0
+            self.totals["bytes_in"] += bytes_in
+            self.totals["bytes_out"] += bytes_out
+        return {
+            "bytes_in": bytes_in,
+            "bytes_out": bytes_out,
+            "bytes_saved": bytes_in - bytes_out,
+            "window": window,
+            "total_lines": source_code.count("\n") + 1,
+        }
@@ -0,0 +1,248 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, Any, List, Iterable, Optional, Callable, IO
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from docker_engine_client import DockerEngineClient, BuildCancelledError
+from build_context import BuildContextBuilder
+from build_timeline import BuildTimelineParser
+
+class SandboxBackend:
+    """
+    Interface every sandbox backend implements.
+
+    build() streams `context` and returns {"exit_code", "stdout", "stderr", "timeline"};
+    run() executes `command` under `limits` and returns {"exit_code", "stdout", "stderr"}.
+    Both raise subprocess.TimeoutExpired or TimeoutError past `timeout_sec`, and
+    build() raises BuildCancelledError once `cancel_event` is set.
+    Output lines are passed to `options["on_output"]` (build) / `on_output` (run)
+    while the operation runs, where the backend can stream them.
+    """
+    name = "base"
+    # Whether builds accept BuildKit named contexts / RUN --mount (needed by the build caches)
+    supports_named_contexts = False
+
+    def build(self, image_name: str, context: BuildContextBuilder, timeout_sec: float,
+              options: Optional[Dict[str, Any]] = None, cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def run(self, image_name: str, command: List[str], limits: Dict[str, Any], timeout_sec: float,
+            on_output: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class CliDockerBackend(SandboxBackend):
+    """
+    Drives the sandbox through the `docker` CLI (one subprocess per operation).
+    Kept as the default, battle-tested path.
+    Builds run with BuildKit `--progress=rawjson` so steps can be timed;
+    pass progress=None for daemons whose buildx predates rawjson.
+    """
+    name = "cli"
+    supports_named_contexts = True
+
+    def __init__(self, progress: Optional[str] = "rawjson"):
+        self.progress = progress
+
+    @staticmethod
+    def _pump(stream: IO[bytes], lines: List[str], on_line: Optional[Callable[[str], None]]) -> None:
+        for raw in iter(stream.readline, b""):
+            line = raw.decode("utf-8", "replace")
+            lines.append(line)
+            if on_line is not None:
+                on_line(line.rstrip("\n"))
+        stream.close()
+
+    @classmethod
+    def _run_with_stdin(cls, cmd: List[str], chunks: Iterable[bytes], timeout_sec: float,
+                        cancel_event: Optional[threading.Event] = None,
+                        env: Optional[Dict[str, str]] = None,
+                        on_stdout_line: Optional[Callable[[str], None]] = None,
+                        on_stderr_line: Optional[Callable[[str], None]] = None) -> subprocess.CompletedProcess:
+        """
+        Runs `cmd` while a feeder thread streams `chunks` into its stdin and reader
+        threads hand stdout/stderr lines to the callbacks as they arrive.
+        The process is killed on timeout or as soon as `cancel_event` is set.
+        """
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+        feed_errors = []
+        stdout_lines: List[str] = []
+        stderr_lines: List[str] = []
+
+        def feed():
+            try:
+                for chunk in chunks:
+                    proc.stdin.write(chunk)
+            except BrokenPipeError:
+                pass # docker exited early; its stderr carries the reason
+            except Exception as e:
+                feed_errors.append(e)
+            finally:
+                try:
+                    proc.stdin.close()
+                except OSError:
+                    pass
+
+        threads = [
+            threading.Thread(target=feed, daemon=True),
+            threading.Thread(target=cls._pump, args=(proc.stdout, stdout_lines, on_stdout_line), daemon=True),
+            threading.Thread(target=cls._pump, args=(proc.stderr, stderr_lines, on_stderr_line), daemon=True),
+        ]
+        for t in threads:
+            t.start()
+        deadline = time.time() + timeout_sec
+        try:
+            while True:
+                try:
+                    # Short slices so a cancellation is noticed promptly
+                    proc.wait(timeout=max(0.01, min(0.25, deadline - time.time())))
+                    break
+                except subprocess.TimeoutExpired:
+                    if cancel_event is not None and cancel_event.is_set():
+                        proc.kill()
+                        proc.wait()
+                        raise BuildCancelledError(f"{' '.join(cmd[:2])} cancelled.")
+                    if time.time() >= deadline:
+                        proc.kill()
+                        proc.wait()
+                        raise subprocess.TimeoutExpired(cmd, timeout_sec)
+        finally:
+            for t in threads:
+                t.join(timeout=5)
+        if feed_errors:
+            raise feed_errors[0]
+        return subprocess.CompletedProcess(cmd, proc.returncode, "".join(stdout_lines), "".join(stderr_lines))
+
+    def build(self, image_name: str, context: BuildContextBuilder, timeout_sec: float,
+              options: Optional[Dict[str, Any]] = None, cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        options = options or {}
+        build_cmd = ["docker", "build", "-t", image_name]
+        if self.progress:
+            build_cmd += ["--progress", self.progress]
+        for name, path in options.get("build_contexts", {}).items():
+            build_cmd += ["--build-context", f"{name}={path}"]
+        if options.get("network"):
+            build_cmd += ["--network", options["network"]]
+        # "-" makes docker read the (already filtered) tar context from stdin
+        build_cmd.append("-")
+        # BuildKit runs independent stages of multi-stage Dockerfiles in parallel
+        env = {**os.environ, "DOCKER_BUILDKIT": "1"}
+        # BuildKit writes progress to stderr; a readable log is rebuilt from it as it streams
+        parser = BuildTimelineParser(on_line=options.get("on_output"))
+        result = self._run_with_stdin(build_cmd, context.stream(), timeout_sec, cancel_event=cancel_event, env=env,
+                                      on_stderr_line=parser.feed_line)
+        return {
+            "exit_code": result.returncode,
+            "stdout": result.stdout or parser.log_text(),
+            "stderr": parser.log_text(),
+            "timeline": parser.timeline(),
+        }
+
+    def run(self, image_name: str, command: List[str], limits: Dict[str, Any], timeout_sec: float,
+            on_output: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        run_cmd = [
+            "docker", "run",
+            "--rm",
+            "--memory", limits["memory"],
+            "--cpus", limits["cpus"],
+            "--network", limits["network"],
+        ]
+        if limits.get("read_only"):
+            run_cmd.append("--read-only")
+        for mount in limits.get("tmpfs", []):
+            run_cmd += ["--tmpfs", mount]
+        for opt in limits.get("security_opt", []):
+            run_cmd += ["--security-opt", opt]
+        run_cmd += [image_name] + command
+
+        result = self._run_with_stdin(run_cmd, (), timeout_sec, on_stdout_line=on_output, on_stderr_line=on_output)
+        return {"exit_code": result.returncode, "stdout": result.stdout, "stderr": result.stderr}
+
+
+class EngineApiDockerBackend(SandboxBackend):
+    """
+    Drives the sandbox through the Docker Engine API over the Unix socket.
+    Reuses one keep-alive connection and times build steps from the JSON progress stream.
+    """
+    name = "engine"
+    # The classic /build endpoint has no BuildKit session, hence no named contexts or RUN --mount
+    supports_named_contexts = False
+
+    def __init__(self, socket_path: str = "/var/run/docker.sock"):
+        self.client = DockerEngineClient(socket_path=socket_path)
+
+    @staticmethod
+    def _parse_memory(limit: str) -> int:
+        units = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+        suffix = limit[-1].lower()
+        if suffix in units:
+            return int(float(limit[:-1]) * units[suffix])
+        return int(limit)
+
+    def build(self, image_name: str, context: BuildContextBuilder, timeout_sec: float,
+              options: Optional[Dict[str, Any]] = None, cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        options = options or {}
+        parser = BuildTimelineParser(on_line=options.get("on_output"))
+        result = self.client.build(context.stream(), tag=image_name, timeout_sec=timeout_sec,
+                                   on_progress=parser.feed, network=options.get("network"),
+                                   cancel_event=cancel_event)
+        parser.finish()
+        failed = result["error"] is not None
+        return {
+            "exit_code": 1 if failed else 0,
+            "stdout": result["log"],
+            "stderr": result["log"] if failed else "",
+            "timeline": parser.timeline(),
+        }
+
+    def run(self, image_name: str, command: List[str], limits: Dict[str, Any], timeout_sec: float,
+            on_output: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        host_config = {
+            "Memory": self._parse_memory(limits["memory"]),
+            "NanoCpus": int(float(limits["cpus"]) * 1e9),
+            "NetworkMode": limits["network"],
+            "ReadonlyRootfs": bool(limits.get("read_only")),
+            "Tmpfs": {mount: "" for mount in limits.get("tmpfs", [])},
+            "SecurityOpt": list(limits.get("security_opt", [])),
+        }
+        container_id = self.client.create_container(image_name, command, host_config)
+        try:
+            self.client.start_container(container_id)
+            try:
+                status = self.client.wait_container(container_id, timeout_sec=timeout_sec)
+            except (socket.timeout, TimeoutError):
+                # Same contract as the CLI backend: stop the container, then report the timeout
+                self.client.kill_container(container_id)
+                raise TimeoutError(f"Container {container_id[:12]} exceeded {timeout_sec}s.")
+            logs = self.client.container_logs(container_id)
+            # Logs are only fetched once the container exits (no attach on this path)
+            if on_output is not None:
+                for line in (logs["stdout"] + logs["stderr"]).splitlines():
+                    on_output(line)
+            return {"exit_code": status.get("StatusCode", 1), "stdout": logs["stdout"], "stderr": logs["stderr"]}
+        finally:
+            # Equivalent of `--rm`, done after log collection so nothing is lost
+            self.client.remove_container(container_id)
+
+
+SANDBOX_BACKENDS = {
+    CliDockerBackend.name: CliDockerBackend,
+    EngineApiDockerBackend.name: EngineApiDockerBackend,
+}
+
+def register_backend(backend_cls: type) -> type:
+    """Makes a SandboxBackend subclass available to create_backend() under its `name`."""
+    SANDBOX_BACKENDS[backend_cls.name] = backend_cls
+    return backend_cls
+
+def create_backend(name, **kwargs) -> SandboxBackend:
+    """Instantiates a sandbox backend by name ("cli", "engine", ...); instances are passed through."""
+    if isinstance(name, SandboxBackend):
+        return name
+    if name not in SANDBOX_BACKENDS:
+        raise ValueError(f"Unknown sandbox backend '{name}'. Expected one of {sorted(SANDBOX_BACKENDS)}.")
+    return SANDBOX_BACKENDS[name](**kwargs)
@@ -0,0 +1,29 @@
+import re
+from typing import Callable, Optional
+
+RUN_INSTRUCTION = re.compile(r"^(\s*RUN\s+)((?:--\S+\s+)*)(.*)$", re.IGNORECASE | re.DOTALL)
+
+def rewrite_shell_runs(dockerfile: str, rewrite: Callable[[str, str], Optional[str]]) -> str:
+    """
+    Calls `rewrite(flags, command)` for every shell-form RUN instruction
+    (continuation lines joined, exec-form JSON arrays skipped). A returned
+    string replaces the instruction as `RUN <returned>`; None leaves it as is.
+    """
+    lines = dockerfile.splitlines()
+    out = []
+    i = 0
+    while i < len(lines):
+        # Gather continuation lines so callers see the whole instruction
+        block = [lines[i]]
+        while block[-1].rstrip().endswith("\\") and i + 1 < len(lines):
+            i += 1
+            block.append(lines[i])
+        i += 1
+        instruction = "\n".join(block)
+        match = RUN_INSTRUCTION.match(instruction)
+        if match and not match.group(3).lstrip().startswith("["):
+            replacement = rewrite(match.group(2), match.group(3))
+            if replacement is not None:
+                instruction = f"{match.group(1)}{replacement}"
+        out.append(instruction)
+    return "\n".join(out) + ("\n" if dockerfile.endswith("\n") else "")
@@ -0,0 +1,171 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, Any, List, Optional, Union, Callable
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from docker_backends import SandboxBackend, BuildCancelledError, register_backend
+from build_context import BuildContextBuilder
+
+# Exit status Docker reports for a container killed by the OOM killer (128 + SIGKILL)
+OOM_EXIT_CODE = 137
+
+@register_backend
+class FakeDockerBackend(SandboxBackend):
+    """
+    Deterministic in-process stand-in for Docker, for tests and benchmarks of the
+    orchestration layer (DockerSandbox, gatekeeper, debug loop) without a daemon.
+
+    Outcomes come from recorded fixtures (see RecordingBackend), replayed
+    round-robin per operation, or are synthesised from the configured exit codes.
+    Failures and OOM kills are injected from a seeded RNG, so a given seed always
+    yields the same sequence. With `sleep=False` latency is only accounted in
+    `virtual_sec`, which lets thousands of builds run per second.
+    """
+    name = "fake"
+    supports_named_contexts = True
+
+    def __init__(self, fixtures: Union[str, Dict[str, Any], None] = None,
+                 build_latency_sec: float = 0.0, run_latency_sec: float = 0.0,
+                 build_exit_code: int = 0, run_exit_code: int = 0,
+                 failure_rate: float = 0.0, oom_rate: float = 0.0,
+                 seed: int = 0, sleep: bool = True, consume_context: bool = False):
+        if isinstance(fixtures, str):
+            with open(fixtures, "r", encoding="utf-8") as f:
+                fixtures = json.load(f)
+        self.fixtures: Dict[str, List[Dict[str, Any]]] = fixtures or {}
+        self.latency_sec = {"build": build_latency_sec, "run": run_latency_sec}
+        self.exit_codes = {"build": build_exit_code, "run": run_exit_code}
+        self.failure_rate = failure_rate
+        self.oom_rate = oom_rate
+        self.sleep = sleep
+        # Streaming the tar adds the real context I/O cost to the measurement
+        self.consume_context = consume_context
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._cursor = {"build": 0, "run": 0}
+        self.counters = {"builds": 0, "runs": 0, "failures": 0, "ooms": 0, "timeouts": 0, "virtual_sec": 0.0}
+
+    def _next_outcome(self, operation: str, image_name: str) -> Dict[str, Any]:
+        with self._lock:
+            recorded = self.fixtures.get(operation) or []
+            if recorded:
+                outcome = dict(recorded[self._cursor[operation] % len(recorded)])
+                self._cursor[operation] += 1
+            else:
+                outcome = {"exit_code": self.exit_codes[operation], "stdout": f"fake {operation} of {image_name} ok\n", "stderr": ""}
+            outcome.setdefault("latency_sec", self.latency_sec[operation])
+            roll = self._rng.random()
+            # Runs split [0, 1) into an OOM band then a failure band; builds cannot OOM, so
+            # their failure band starts at 0 and failure_rate stays the real build failure rate
+            failure_floor = self.oom_rate if operation == "run" else 0.0
+            if operation == "run" and roll < self.oom_rate:
+                outcome["oom"] = True
+            elif roll < failure_floor + self.failure_rate and outcome["exit_code"] == 0:
+                outcome.update(exit_code=1, stderr=f"fake {operation} failure injected for {image_name}\n")
+            self.counters["builds" if operation == "build" else "runs"] += 1
+            self.counters["virtual_sec"] += outcome["latency_sec"]
+        return outcome
+
+    def _wait(self, latency_sec: float, timeout_sec: float, cmd: List[str],
+              cancel_event: Optional[threading.Event] = None) -> None:
+        """Spends the simulated latency, honouring the deadline and cancellation like a real backend."""
+        delay = min(latency_sec, timeout_sec)
+        if self.sleep and delay > 0:
+            if cancel_event is not None:
+                cancel_event.wait(delay)
+            else:
+                time.sleep(delay)
+        if cancel_event is not None and cancel_event.is_set():
+            raise BuildCancelledError(f"{' '.join(cmd)} cancelled.")
+        if latency_sec > timeout_sec:
+            with self._lock:
+                self.counters["timeouts"] += 1
+            raise subprocess.TimeoutExpired(cmd, timeout_sec)
+
+    @staticmethod
+    def _emit(outcome: Dict[str, Any], on_output: Optional[Callable[[str], None]]) -> None:
+        if on_output is not None:
+            for line in (outcome.get("stdout", "") + outcome.get("stderr", "")).splitlines():
+                on_output(line)
+
+    def build(self, image_name: str, context: BuildContextBuilder, timeout_sec: float,
+              options: Optional[Dict[str, Any]] = None, cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        if self.consume_context:
+            for _ in context.stream():
+                pass
+        outcome = self._next_outcome("build", image_name)
+        self._wait(outcome["latency_sec"], timeout_sec, ["fake", "build", image_name], cancel_event)
+        if outcome["exit_code"] != 0:
+            with self._lock:
+                self.counters["failures"] += 1
+        self._emit(outcome, (options or {}).get("on_output"))
+        return {
+            "exit_code": outcome["exit_code"],
+            "stdout": outcome.get("stdout", ""),
+            "stderr": outcome.get("stderr", ""),
+            "timeline": outcome.get("timeline", []),
+        }
+
+    def run(self, image_name: str, command: List[str], limits: Dict[str, Any], timeout_sec: float,
+            on_output: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        outcome = self._next_outcome("run", image_name)
+        self._wait(outcome["latency_sec"], timeout_sec, ["fake", "run", image_name] + command)
+        self._emit(outcome, on_output)
+        with self._lock:
+            if outcome.get("oom"):
+                self.counters["ooms"] += 1
+            elif outcome["exit_code"] != 0:
+                self.counters["failures"] += 1
+        if outcome.get("oom"):
+            return {
+                "exit_code": OOM_EXIT_CODE,
+                "stdout": outcome.get("stdout", ""),
+                "stderr": f"OOMKilled: container exceeded its {limits.get('memory')} memory limit\n",
+            }
+        return {"exit_code": outcome["exit_code"], "stdout": outcome.get("stdout", ""), "stderr": outcome.get("stderr", "")}
+
+
+class RecordingBackend(SandboxBackend):
+    """
+    Wraps a real backend and records every build/run outcome (with its latency)
+    in the fixture format FakeDockerBackend replays.
+    """
+
+    def __init__(self, inner: SandboxBackend):
+        self.inner = inner
+        self.name = inner.name
+        self.supports_named_contexts = inner.supports_named_contexts
+        self.fixtures: Dict[str, List[Dict[str, Any]]] = {"build": [], "run": []}
+        self._lock = threading.Lock()
+
+    def _record(self, operation: str, result: Dict[str, Any], start_time: float) -> Dict[str, Any]:
+        entry = {k: result.get(k) for k in ("exit_code", "stdout", "stderr")}
+        entry["latency_sec"] = round(time.time() - start_time, 3)
+        if operation == "build":
+            entry["timeline"] = result.get("timeline", [])
+        entry["oom"] = operation == "run" and result.get("exit_code") == OOM_EXIT_CODE
+        with self._lock:
+            self.fixtures[operation].append(entry)
+        return result
+
+    def build(self, image_name: str, context: BuildContextBuilder, timeout_sec: float,
+              options: Optional[Dict[str, Any]] = None, cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        start_time = time.time()
+        result = self.inner.build(image_name, context, timeout_sec, options=options, cancel_event=cancel_event)
+        return self._record("build", result, start_time)
+
+    def run(self, image_name: str, command: List[str], limits: Dict[str, Any], timeout_sec: float,
+            on_output: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        start_time = time.time()
+        result = self.inner.run(image_name, command, limits, timeout_sec, on_output=on_output)
+        return self._record("run", result, start_time)
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.fixtures, f, indent=2)
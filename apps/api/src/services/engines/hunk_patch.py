@@ -0,0 +1,174 @@
+import re
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+
+class HunkPatchApplier:
+    """
+    Applies a unified diff (as emitted by an LLM) to a single file.
+
+    LLM diffs are often slightly off, so application is tolerant:
+    - line numbers in @@ headers are only a hint (or may be missing: "@@ @@");
+      each hunk is searched for nearest-first around the expected position
+    - context lines match exactly, then ignoring surrounding whitespace
+    - up to `fuzz` leading/trailing context lines may be dropped (like GNU patch)
+    Hunks must apply in order and without overlap. If any hunk cannot be placed,
+    nothing is applied and every conflict is reported.
+    """
+
+    HUNK_HEADER = re.compile(r"^@@ -?(\d+)?(?:,(\d+))? ?\+?(\d+)?(?:,(\d+))? ?@@")
+
+    def __init__(self, fuzz: int = 2, max_offset: Optional[int] = None):
+        self.fuzz = fuzz
+        # None searches the whole file
+        self.max_offset = max_offset
+
+    def parse(self, diff: str) -> List[Dict[str, Any]]:
+        """Hunks as {"old_start" (0-based hint or None), "lines": [(op, text)]} with op in ' ', '-', '+'."""
+        hunks = []
+        current = None
+        for line in diff.splitlines():
+            if line.startswith(("--- ", "+++ ", "diff ", "index ")) and (current is None or not current["lines"]):
+                continue
+            header = self.HUNK_HEADER.match(line)
+            if header:
+                old_start = int(header.group(1)) if header.group(1) else None
+                # "-a,0" (pure insertion) means after line a, i.e. index a; otherwise line a is index a-1
+                if old_start is not None and header.group(2) != "0":
+                    old_start -= 1
+                current = {"old_start": old_start, "lines": []}
+                hunks.append(current)
+                continue
+            if current is None or line.startswith("\\"):
+                # Text before the first hunk, or "\ No newline at end of file"
+                continue
+            op, text = (line[0], line[1:]) if line[:1] in (" ", "-", "+") else (" ", line)
+            current["lines"].append((op, text))
+        return [h for h in hunks if any(op != " " for op, _ in h["lines"])]
+
+    def apply(self, source_code: str, diff: str) -> Dict[str, Any]:
+        """
+        Returns {"applied": bool, "content": str or None, "conflicts": [...],
+        "hunks": n, "offsets": [line offset of each applied hunk]}.
+        """
+        hunks = self.parse(diff)
+        if not hunks:
+            return {"applied": False, "content": None, "hunks": 0, "offsets": [],
+                    "conflicts": [{"hunk": None, "reason": "diff contains no hunks"}]}
+
+        newline = "\r\n" if "\r\n" in source_code else "\n"
+        lines = source_code.splitlines()
+        ends_with_newline = source_code.endswith(("\n", "\r"))
+        index = self._index(lines)
+
+        placements, conflicts, offsets = [], [], []
+        cursor = 0 # hunks apply in order; the next one cannot start before this line
+        drift = 0  # offset of the previous hunk, applied to later line-number hints
+        for number, hunk in enumerate(hunks, 1):
+            old = [text for op, text in hunk["lines"] if op != "+"]
+            expected = (hunk["old_start"] + drift) if hunk["old_start"] is not None else cursor
+            found = self._locate(lines, index, hunk["lines"], max(expected, cursor), cursor)
+            if found is None:
+                conflicts.append({"hunk": number, "expected_line": expected + 1,
+                                  "reason": "context not found", "context": old[:3]})
+                continue
+            position, trimmed_lines = found
+            offsets.append(position - expected)
+            drift = position - hunk["old_start"] if hunk["old_start"] is not None else drift
+            placements.append((position, trimmed_lines))
+            cursor = position + sum(1 for op, _ in trimmed_lines if op != "+")
+
+        if conflicts:
+            return {"applied": False, "content": None, "hunks": len(hunks), "offsets": offsets, "conflicts": conflicts}
+
+        # Rebuild back to front so earlier positions stay valid
+        for position, hunk_lines in reversed(placements):
+            old_count = sum(1 for op, _ in hunk_lines if op != "+")
+            original = lines[position:position + old_count]
+            diff_indent, file_indent = self._indent_shift(hunk_lines, original)
+            replacement, cursor_in_old = [], 0
+            for op, text in hunk_lines:
+                if op == " ":
+                    # Keep the file's own version of context lines (whitespace may differ from the diff)
+                    replacement.append(original[cursor_in_old])
+                    cursor_in_old += 1
+                elif op == "-":
+                    cursor_in_old += 1
+                elif diff_indent != file_indent and text.startswith(diff_indent):
+                    # Matched ignoring whitespace: re-indent added lines like the surrounding file
+                    replacement.append(file_indent + text[len(diff_indent):])
+                else:
+                    replacement.append(text)
+            lines[position:position + old_count] = replacement
+
+        content = newline.join(lines) + (newline if ends_with_newline and lines else "")
+        return {"applied": True, "content": content, "hunks": len(hunks), "offsets": offsets, "conflicts": []}
+
+    @staticmethod
+    def _indent_shift(hunk_lines: List[Tuple[str, str]], original: List[str]) -> Tuple[str, str]:
+        """Leading whitespace of the first non-blank old line in the diff and in the file."""
+        old = [text for op, text in hunk_lines if op != "+"]
+        for diff_line, file_line in zip(old, original):
+            if diff_line.strip():
+                return (diff_line[:len(diff_line) - len(diff_line.lstrip())],
+                        file_line[:len(file_line) - len(file_line.lstrip())])
+        return "", ""
+
+    @staticmethod
+    def _index(lines: List[str]) -> Dict[str, List[int]]:
+        index = defaultdict(list)
+        for i, line in enumerate(lines):
+            index[line.strip()].append(i)
+        return index
+
+    def _locate(self, lines: List[str], index: Dict[str, List[int]], hunk_lines: List[Tuple[str, str]],
+                expected: int, lower_bound: int) -> Optional[Tuple[int, List[Tuple[str, str]]]]:
+        """(start line, hunk lines actually matched) nearest to `expected`, trying fuzz levels in order."""
+        for fuzz in range(self.fuzz + 1):
+            trimmed = self._trim_context(hunk_lines, fuzz)
+            if trimmed is None:
+                break
+            old = [text for op, text in trimmed if op != "+"]
+            dropped_head = self._leading_context(hunk_lines) - self._leading_context(trimmed)
+            if not old:
+                if fuzz > 0:
+                    # Fuzz trimmed away all context; with nothing left to match the hunk does not apply
+                    break
+                # Pure insertion without context: trust the line-number hint
+                return min(max(expected, lower_bound), len(lines)), trimmed
+            for strict in (True, False):
+                position = self._nearest_match(lines, index, old, expected + dropped_head, lower_bound, strict)
+                if position is not None:
+                    return position, trimmed
+        return None
+
+    @staticmethod
+    def _leading_context(hunk_lines: List[Tuple[str, str]]) -> int:
+        count = 0
+        for op, _ in hunk_lines:
+            if op != " ":
+                break
+            count += 1
+        return count
+
+    def _trim_context(self, hunk_lines: List[Tuple[str, str]], fuzz: int) -> Optional[List[Tuple[str, str]]]:
+        if fuzz == 0:
+            return hunk_lines
+        head = min(fuzz, self._leading_context(hunk_lines))
+        tail = min(fuzz, self._leading_context(list(reversed(hunk_lines))))
+        if head == 0 and tail == 0:
+            return None
+        return hunk_lines[head:len(hunk_lines) - tail]
+
+    def _nearest_match(self, lines: List[str], index: Dict[str, List[int]], old: List[str],
+                       expected: int, lower_bound: int, strict: bool) -> Optional[int]:
+        # Candidate starts come from the index of the first old line, nearest to the hint first
+        candidates = [i for i in index.get(old[0].strip(), []) if i >= lower_bound and i + len(old) <= len(lines)]
+        if self.max_offset is not None:
+            candidates = [i for i in candidates if abs(i - expected) <= self.max_offset]
+        for start in sorted(candidates, key=lambda i: (abs(i - expected), i)):
+            window = lines[start:start + len(old)]
+            if strict and window == old:
+                return start
+            if not strict and [l.strip() for l in window] == [l.strip() for l in old]:
+                return start
+        return None
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import sys
+import time
+from typing import Dict, Any, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from dockerfile_rewriter import rewrite_shell_runs
+
+class IncrementalBuildCache:
+    """
+    Opt-in persistence of compiler incremental state between sandbox builds of
+    the same project (e.g. the 2–3 rebuilds of a PatchDebugEngine loop).
+
+    Build RUN steps get a BuildKit cache mount keyed by project ID *and* a
+    digest of the dependency/toolchain manifests. Before the build the stored
+    `.angular/cache`, `target/classes` (+ `target/maven-status`) and
+    `*.tsbuildinfo` files are restored into the workdir; after a successful
+    build they are saved back. Changing any manifest yields a new key, so stale
+    state is never reused; orphaned keys are reclaimed by BuildKit's GC.
+    """
+
+    DEFAULT_STATE_PATH = "/var/cache/sandbox-incremental/index.json"
+
+    MOUNT_TARGET = "/inc-cache"
+
+    # Files whose change invalidates incremental state (dependencies, compiler/bundler config)
+    MANIFESTS = ("pom.xml", "package.json", "package-lock.json", "angular.json",
+                 "tsconfig.json", "tsconfig.app.json", "tsconfig.spec.json")
+
+    BUILD_COMMAND = re.compile(
+        r"(\bmvnw?\b.*\b(compile|package|install|verify)\b)|(\bng\s+build\b)|(\bnpm\s+run\s+build\b)|(\btsc\b)",
+        re.DOTALL,
+    )
+
+    RESTORE = "(cp -a {mount}/. ./ 2>/dev/null || true)"
+    SAVE = (
+        "(find . -path ./node_modules -prune -o \\( -path ./target/classes -o -path ./target/maven-status"
+        " -o -path ./.angular/cache -o -name '*.tsbuildinfo' \\) -print -prune"
+        " | tar -cf - -T - 2>/dev/null | tar -xf - -C {mount} 2>/dev/null || true)"
+    )
+
+    def __init__(self, state_path: str = DEFAULT_STATE_PATH):
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict[str, Any]] = {}
+        if os.path.isfile(state_path):
+            with open(state_path, "r", encoding="utf-8") as f:
+                self._index = json.load(f)
+
+    @classmethod
+    def manifest_digest(cls, project_path: str, dockerfile: str = "") -> str:
+        """Digest of every manifest (root and one level below) plus the Dockerfile's FROM lines."""
+        digest = hashlib.sha256()
+        for dirpath, dirnames, filenames in os.walk(project_path):
+            rel_dir = os.path.relpath(dirpath, project_path)
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith(".") and d not in ("node_modules", "target"))
+            if rel_dir != ".":
+                dirnames[:] = [] # root and one level below only
+            for name in sorted(filenames):
+                if name in cls.MANIFESTS:
+                    with open(os.path.join(dirpath, name), "rb") as f:
+                        digest.update(f"{rel_dir}/{name}\0".encode("utf-8") + f.read())
+        # A toolchain upgrade (new base image) must not reuse old compiler state
+        for line in dockerfile.splitlines():
+            if line.strip().upper().startswith("FROM "):
+                digest.update(line.strip().encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _sanitize(project_id: str) -> str:
+        return re.sub(r"[^a-zA-Z0-9_.-]", "-", project_id)[:64]
+
+    def prepare(self, project_id: str, project_path: str, dockerfile: str = "") -> Dict[str, Any]:
+        """Resolves the cache key for this build and reports whether earlier state was invalidated."""
+        manifest_digest = self.manifest_digest(project_path, dockerfile)
+        with self._lock:
+            entry = self._index.get(project_id)
+            invalidated = entry is not None and entry["manifest_digest"] != manifest_digest
+            reused = entry is not None and not invalidated and entry.get("successful_builds", 0) > 0
+            if entry is None or invalidated:
+                entry = {"manifest_digest": manifest_digest, "successful_builds": 0}
+                self._index[project_id] = entry
+        return {
+            "cache_id": f"sandbox-inc-{self._sanitize(project_id)}-{manifest_digest[:16]}",
+            "manifest_digest": manifest_digest,
+            "invalidated": invalidated,
+            "reused": reused,
+        }
+
+    def record_build(self, project_id: str, success: bool) -> None:
+        if not success:
+            return
+        with self._lock:
+            entry = self._index.get(project_id)
+            if entry is None:
+                return
+            entry["successful_builds"] = entry.get("successful_builds", 0) + 1
+            entry["last_build_at"] = time.time()
+            self._save()
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.state_path)
+
+    def rewrite_dockerfile(self, dockerfile: str, cache_id: str) -> str:
+        """Wraps every compile/bundle RUN with restore/save of incremental state through a cache mount."""
+        mount = f"--mount=type=cache,id={cache_id},target={self.MOUNT_TARGET},mode=0777,sharing=locked"
+        restore = self.RESTORE.format(mount=self.MOUNT_TARGET)
+        save = self.SAVE.format(mount=self.MOUNT_TARGET)
+
+        def wrap(flags: str, command: str) -> Optional[str]:
+            if not self.BUILD_COMMAND.search(command):
+                return None
+            # SAVE must run where RESTORE did, even if the command cd's elsewhere
+            return f"{flags}{mount} _w=\"$PWD\" && {restore} && {{ {command}; }} && cd \"$_w\" && {save}"
+
+        return rewrite_shell_runs(dockerfile, wrap)
@@ -0,0 +1,41 @@
+import math
+from typing import Dict, List, Optional, Sequence
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (q in [0, 100]); None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def summarize(values: Sequence[float], digits: int = 2) -> Dict[str, Optional[float]]:
+    """count / min / p50 / p90 / p99 / max / mean of a latency sample."""
+    if not values:
+        return {"count": 0, "min": None, "p50": None, "p90": None, "p99": None, "max": None, "mean": None}
+    return {
+        "count": len(values),
+        "min": round(min(values), digits),
+        "p50": round(percentile(values, 50), digits),
+        "p90": round(percentile(values, 90), digits),
+        "p99": round(percentile(values, 99), digits),
+        "max": round(max(values), digits),
+        "mean": round(sum(values) / len(values), digits),
+    }
+
+# Default latency buckets in milliseconds
+DEFAULT_BOUNDS_MS = [25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+def histogram(values: Sequence[float], bounds: Optional[List[float]] = None) -> Dict[str, int]:
+    """Counts per upper bound ("<=50", ..., "+Inf"), Prometheus-style but non-cumulative."""
+    bounds = bounds or DEFAULT_BOUNDS_MS
+    buckets = {f"<={b:g}": 0 for b in bounds}
+    buckets["+Inf"] = 0
+    for value in values:
+        for b in bounds:
+            if value <= b:
+                buckets[f"<={b:g}"] += 1
+                break
+        else:
+            buckets["+Inf"] += 1
+    return buckets
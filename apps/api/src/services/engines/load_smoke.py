@@ -0,0 +1,183 @@
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from latency_stats import summarize
+
+class SmokeLoadTester:
+    """
+    Open-loop load burst: requests are issued on a fixed schedule (target RPS)
+    whatever the response times, like real users arriving. Latency is measured
+    from the *scheduled* send time, so a saturated app shows up as growing
+    latency (no coordinated omission) instead of silently lowering the rate.
+    """
+
+    def __init__(self, max_in_flight: int = 64, timeout_sec: float = 5.0):
+        self.max_in_flight = max_in_flight
+        self.timeout_sec = timeout_sec
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _request(self, name: str, url: str, scheduled_at: float) -> Dict[str, Any]:
+        try:
+            response = self.session.get(url, timeout=self.timeout_sec)
+            ok, status = response.status_code == 200, response.status_code
+        except requests.RequestException as e:
+            ok, status = False, type(e).__name__
+        return {"endpoint": name, "ok": ok, "status": status,
+                "latency_ms": (time.perf_counter() - scheduled_at) * 1000}
+
+    def run(self, endpoints: Dict[str, str], rps: float, duration_sec: float) -> Dict[str, Any]:
+        """Sends `rps * duration_sec` requests round-robin over `endpoints` and reports the outcome."""
+        names = list(endpoints)
+        total = int(rps * duration_sec)
+        interval = 1.0 / rps
+        futures = []
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            for i in range(total):
+                scheduled_at = start + i * interval
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                name = names[i % len(names)]
+                futures.append(pool.submit(self._request, name, endpoints[name], scheduled_at))
+            samples = [f.result() for f in futures]
+        elapsed = time.perf_counter() - start
+        return self._report(samples, rps, duration_sec, elapsed)
+
+    @staticmethod
+    def _report(samples: List[Dict[str, Any]], rps: float, duration_sec: float, elapsed: float) -> Dict[str, Any]:
+        ok = [s for s in samples if s["ok"]]
+        statuses: Dict[str, int] = {}
+        for s in samples:
+            if not s["ok"]:
+                statuses[str(s["status"])] = statuses.get(str(s["status"]), 0) + 1
+        per_endpoint = {}
+        for name in sorted({s["endpoint"] for s in samples}):
+            mine = [s for s in samples if s["endpoint"] == name]
+            per_endpoint[name] = {
+                "requests": len(mine),
+                "error_rate": round(sum(1 for s in mine if not s["ok"]) / len(mine), 4),
+                "latency_ms": summarize([s["latency_ms"] for s in mine], digits=1),
+            }
+        return {
+            "target_rps": rps,
+            "duration_sec": duration_sec,
+            "requests": len(samples),
+            "elapsed_sec": round(elapsed, 2),
+            "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round((len(samples) - len(ok)) / len(samples), 4) if samples else 0.0,
+            "errors_by_status": statuses,
+            "latency_ms": summarize([s["latency_ms"] for s in samples], digits=1),
+            "endpoints": per_endpoint,
+        }
+
+
+class StubAppServer:
+    """
+    Local stand-in for a deployed app exposing the gatekeeper's endpoints, with
+    configurable latency, error rate and a concurrency limit (to mimic an
+    exhausted connection pool). Use as a context manager; `base_url` is set on entry.
+    """
+
+    PATHS = ("/", "/api/health", "/api/health/db", "/api/auth/verify")
+
+    def __init__(self, latency_ms: float = 5.0, error_rate: float = 0.0, max_concurrency: Optional[int] = None,
+                 seed: int = 0, port: int = 0):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.port = port
+        self.base_url: Optional[str] = None
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out as separate writes; Nagle would add ~40 ms per response
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                if self.path not in stub.PATHS:
+                    return self._reply(404, b"not found")
+                # Saturated pool: requests wait for a free slot, like a blocked DB pool
+                if stub._slots:
+                    stub._slots.acquire()
+                try:
+                    time.sleep(stub.latency_ms / 1000.0)
+                    with stub._rng_lock:
+                        failed = stub._rng.random() < stub.error_rate
+                finally:
+                    if stub._slots:
+                        stub._slots.release()
+                self._reply(503 if failed else 200, b'{"status":"down"}' if failed else b'{"status":"ok"}')
+
+            def _reply(self, code: int, body: bytes):
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "StubAppServer":
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), self._handler())
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Open-loop smoke load against a deployed app's health/auth endpoints.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Live base URL")
+    target.add_argument("--stub", action="store_true", help="Run against a local stub server")
+    parser.add_argument("--rps", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--stub-latency-ms", type=float, default=5)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--stub-max-concurrency", type=int)
+    args = parser.parse_args(argv)
+
+    def burst(base_url: str) -> Dict[str, Any]:
+        endpoints = {"System_Health": f"{base_url}/api/health", "JWT_Auth_Pipeline": f"{base_url}/api/auth/verify"}
+        return SmokeLoadTester().run(endpoints, args.rps, args.duration)
+
+    if args.stub:
+        with StubAppServer(args.stub_latency_ms, args.stub_error_rate, args.stub_max_concurrency) as stub:
+            report = burst(stub.base_url)
+    else:
+        report = burst(args.url.rstrip("/"))
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import os
+from typing import Dict, List
+
+# Marker files per stack, checked at the project root and one level below
+# (generated apps usually ship backend/ and frontend/ side by side).
+STACK_MARKERS = {
+    "spring-boot": ["pom.xml", "build.gradle", "build.gradle.kts"],
+    "angular": ["angular.json"],
+    "node": ["package.json"],
+}
+
+def _candidate_dirs(project_path: str) -> List[str]:
+    dirs = [project_path]
+    try:
+        with os.scandir(project_path) as it:
+            dirs += sorted(e.path for e in it if e.is_dir() and not e.name.startswith(".") and e.name != "node_modules")
+    except OSError:
+        pass
+    return dirs
+
+def detect_stacks(project_path: str) -> List[str]:
+    """Returns every stack whose marker files appear in the project (sorted)."""
+    found = set()
+    for directory in _candidate_dirs(project_path):
+        for stack, markers in STACK_MARKERS.items():
+            if any(os.path.isfile(os.path.join(directory, m)) for m in markers):
+                found.add(stack)
+    # An Angular app is also a node package; keep the more specific label
+    if "angular" in found:
+        found.discard("node")
+    return sorted(found)
+
+def detect_stack(project_path: str) -> str:
+    """Single label such as "spring-boot", "angular", "spring-boot+angular" or "unknown"."""
+    stacks = detect_stacks(project_path)
+    return "+".join(stacks) if stacks else "unknown"
+
+def detect_components(project_path: str) -> Dict[str, Dict[str, str]]:
+    """
+    Independently buildable components: first-level directories that carry
+    their own Dockerfile plus stack markers (e.g. backend/ with pom.xml and
+    frontend/ with angular.json). Returns {} unless at least two exist.
+    """
+    components = {}
+    for directory in _candidate_dirs(project_path)[1:]:
+        if not os.path.isfile(os.path.join(directory, "Dockerfile")):
+            continue
+        stacks = detect_stacks(directory)
+        if stacks:
+            components[os.path.basename(directory)] = {"path": directory, "stack": "+".join(stacks)}
+    return components if len(components) >= 2 else {}
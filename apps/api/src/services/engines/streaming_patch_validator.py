@@ -0,0 +1,234 @@
+import json
+import re
+from typing import Dict, Any, Optional, Set
+
+class StreamingPatchValidator:
+    """
+    Incremental validator for a streamed debug-agent answer.
+
+    Chunks are fed as they arrive. A push-down automaton checks JSON syntax
+    character by character and checks the patch contract as soon as the
+    relevant tokens are complete:
+    - the top-level value must be an object
+    - file_path / patch_type / updated_content must be strings
+    - patch_type must be an allowed value
+    - the object must not close without every required key
+    Like the non-streaming parser, anything before the first '{' (prose such
+    as "Here is the fix:", a ```json fence) is skipped, up to MAX_PREAMBLE_CHARS.
+    `state` becomes "invalid" at the first violation, so the caller can cancel
+    generation right away, and "complete" once the top-level object closes.
+    """
+
+    REQUIRED_KEYS = ("file_path", "patch_type", "updated_content")
+    STRING_KEYS = {"file_path", "patch_type", "updated_content"}
+    PATCH_TYPES = {"replace", "insert", "delete"}
+
+    NUMBER = re.compile(r"-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?")
+    LITERALS = ("true", "false", "null")
+    # Text tolerated before the object; an answer that is all prose is cancelled after this
+    MAX_PREAMBLE_CHARS = 2000
+    WHITESPACE = " \t\r\n"
+
+    def __init__(self, patch_types: Optional[Set[str]] = None, string_keys: Optional[Set[str]] = None):
+        self.patch_types = patch_types or self.PATCH_TYPES
+        self.string_keys = string_keys or self.STRING_KEYS
+        self.state = "pending" # pending | in_progress | invalid | complete
+        self.reason: Optional[str] = None
+        self.chars_seen = 0
+        self._preamble_chars = 0  # text skipped before the JSON starts
+        self._json_chars = []     # the JSON document itself
+        self._stack = []          # frames: [kind, state]
+        self._token = None        # ("string" | "number" | "literal", buffer)
+        self._escape = False
+        self._unicode_left = 0
+        self._key_is_next = False # the string being read at depth 1 is a key
+        self._current_key: Optional[str] = None
+        self._seen_keys: Set[str] = set()
+
+    # --- Public API ------------------------------------------------------
+
+    def feed(self, chunk: str) -> str:
+        """Consumes a chunk and returns the new state."""
+        for ch in chunk:
+            if self.state in ("invalid", "complete"):
+                break
+            self.chars_seen += 1
+            self._step(ch)
+        return self.state
+
+    def finish(self) -> str:
+        """Marks the end of the stream; an unfinished document is invalid."""
+        if self.state in ("pending", "in_progress"):
+            self._fail("response ended before the JSON object was closed")
+        return self.state
+
+    @property
+    def patch(self) -> Optional[Dict[str, Any]]:
+        if self.state != "complete":
+            return None
+        return json.loads("".join(self._json_chars))
+
+    # --- Automaton -------------------------------------------------------
+
+    def _fail(self, reason: str) -> None:
+        self.state = "invalid"
+        self.reason = f"{reason} (after {self.chars_seen} chars)"
+
+    def _step(self, ch: str) -> None:
+        if self.state == "pending":
+            if ch == "{":
+                self.state = "in_progress"
+                self._json_chars.append(ch)
+                self._stack.append(["obj", "key_or_end"])
+                return
+            self._preamble_chars += 1
+            if self._preamble_chars > self.MAX_PREAMBLE_CHARS:
+                self._fail(f"no JSON object in the first {self.MAX_PREAMBLE_CHARS} chars")
+            return
+
+        self._json_chars.append(ch)
+        if self._token is not None:
+            self._step_token(ch)
+            return
+        self._step_structure(ch)
+
+    def _step_token(self, ch: str) -> None:
+        kind, buffer = self._token
+        if kind == "string":
+            if self._unicode_left:
+                if ch not in "0123456789abcdefABCDEF":
+                    return self._fail("invalid \\u escape")
+                self._unicode_left -= 1
+            elif self._escape:
+                if ch not in '"\\/bfnrtu':
+                    return self._fail(f"invalid escape \\{ch}")
+                self._escape = False
+                if ch == "u":
+                    self._unicode_left = 4
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._token = None
+                self._end_string(buffer)
+                return
+            elif ch < " ":
+                return self._fail("unescaped control character in string")
+            # Key/patch_type strings are short; only keep what the contract needs
+            if len(self._stack) == 1 and (self._key_is_next or self._current_key == "patch_type"):
+                self._token = (kind, buffer + ch)
+            return
+
+        if kind == "number":
+            if ch in "0123456789+-.eE":
+                self._token = (kind, buffer + ch)
+                return
+            if not self.NUMBER.fullmatch(buffer):
+                return self._fail(f"invalid number {buffer!r}")
+            self._token = None
+            self._end_value()
+            return self._step_structure(ch)
+
+        # literal
+        buffer += ch
+        if not any(lit.startswith(buffer) for lit in self.LITERALS):
+            return self._fail(f"invalid literal {buffer!r}")
+        self._token = (kind, buffer)
+        if buffer in self.LITERALS:
+            self._token = None
+            self._end_value()
+
+    def _end_string(self, text: str) -> None:
+        frame = self._stack[-1]
+        if frame[0] == "obj" and frame[1] in ("key_or_end", "key"):
+            if len(self._stack) == 1:
+                self._current_key = self._decode(text)
+                self._seen_keys.add(self._current_key)
+                self._key_is_next = False
+            frame[1] = "colon"
+            return
+        if len(self._stack) == 1 and self._current_key == "patch_type":
+            value = self._decode(text)
+            if value not in self.patch_types:
+                return self._fail(f"patch_type {value!r} is not one of {sorted(self.patch_types)}")
+        self._end_value()
+
+    @staticmethod
+    def _decode(text: str) -> str:
+        try:
+            return json.loads(f'"{text}"')
+        except json.JSONDecodeError:
+            return text
+
+    def _end_value(self) -> None:
+        frame = self._stack[-1]
+        frame[1] = "comma_or_end"
+
+    def _begin_value(self, ch: str) -> None:
+        """Starts a value inside the current frame; checks contract types at the top level."""
+        if len(self._stack) == 1 and self._current_key in self.string_keys and ch != '"':
+            return self._fail(f"{self._current_key} must be a string")
+        if ch == '"':
+            self._token = ("string", "")
+        elif ch == "{":
+            self._stack[-1][1] = "comma_or_end"
+            self._stack.append(["obj", "key_or_end"])
+        elif ch == "[":
+            self._stack[-1][1] = "comma_or_end"
+            self._stack.append(["arr", "value_or_end"])
+        elif ch == "-" or ch.isdigit():
+            self._token = ("number", ch)
+        elif ch in "tfn":
+            self._token = ("literal", ch)
+        else:
+            self._fail(f"unexpected character {ch!r}")
+
+    def _step_structure(self, ch: str) -> None:
+        if ch in self.WHITESPACE:
+            return
+        kind, state = self._stack[-1]
+        if kind == "obj":
+            if state in ("key_or_end", "key"):
+                if ch == '"':
+                    self._key_is_next = len(self._stack) == 1
+                    self._token = ("string", "")
+                elif ch == "}" and state == "key_or_end":
+                    self._close()
+                else:
+                    self._fail(f"expected a key, got {ch!r}")
+            elif state == "colon":
+                if ch != ":":
+                    return self._fail(f"expected ':', got {ch!r}")
+                self._stack[-1][1] = "value"
+            elif state == "value":
+                self._begin_value(ch)
+            elif state == "comma_or_end":
+                if ch == ",":
+                    self._stack[-1][1] = "key"
+                elif ch == "}":
+                    self._close()
+                else:
+                    self._fail(f"expected ',' or '}}', got {ch!r}")
+            return
+
+        # array
+        if state in ("value_or_end", "value"):
+            if ch == "]" and state == "value_or_end":
+                return self._close()
+            self._begin_value(ch)
+        elif state == "comma_or_end":
+            if ch == ",":
+                self._stack[-1][1] = "value"
+            elif ch == "]":
+                self._close()
+            else:
+                self._fail(f"expected ',' or ']', got {ch!r}")
+
+    def _close(self) -> None:
+        self._stack.pop()
+        if self._stack:
+            self._end_value()
+            return
+        missing = [k for k in self.REQUIRED_KEYS if k not in self._seen_keys]
+        if missing:
+            return self._fail(f"patch object closed without {missing}")
+        self.state = "complete"
@@ -0,0 +1,135 @@
+import heapq
+import json
+import os
+import posixpath
+import shlex
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+# Test file conventions of the generated stacks
+TS_TEST_SUFFIXES = (".spec.ts", ".test.ts", ".spec.js", ".test.js")
+JAVA_TEST_SUFFIXES = ("Test.java", "Tests.java")
+SKIP_DIRS = {"node_modules", "target", "dist", ".git", ".angular"}
+GRADLE_MANIFESTS = ("build.gradle", "build.gradle.kts")
+
+def discover_test_files(project_path: str) -> List[str]:
+    """Relative paths of every test file in the project, sorted for stable sharding."""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(project_path):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for name in filenames:
+            rel_path = os.path.relpath(os.path.join(dirpath, name), project_path).replace(os.sep, "/")
+            if name.endswith(TS_TEST_SUFFIXES) or ("/src/test/" in f"/{rel_path}" and name.endswith(JAVA_TEST_SUFFIXES)):
+                found.append(rel_path)
+    return sorted(found)
+
+def _component_root(project_path: str, rel_path: str, manifests: Tuple[str, ...]) -> Optional[str]:
+    """Nearest directory (relative, "" for the root) between the file and the project root holding a manifest."""
+    parts = rel_path.split("/")[:-1]
+    for depth in range(len(parts), -1, -1):
+        rel_dir = "/".join(parts[:depth])
+        if any(os.path.isfile(os.path.join(project_path, rel_dir, m)) for m in manifests):
+            return rel_dir
+    return None
+
+def _in_dir(rel_dir: str, command: List[str]) -> List[str]:
+    return command if not rel_dir else ["sh", "-c", f"cd {shlex.quote(rel_dir)} && exec {shlex.join(command)}"]
+
+def build_shard_commands(project_path: str, files: List[str]) -> List[Dict[str, Any]]:
+    """
+    Test commands restricted to one shard's files: one per component (the nearest
+    directory with a pom.xml / build.gradle or package.json), each run from that
+    directory with paths rebased onto it. A Spring Boot + Angular shard gets both
+    a Maven and a Karma command. Raises ValueError if any file has no command.
+    """
+    groups: Dict[Tuple[str, str], List[str]] = {}
+    uncovered = []
+    for rel_path in files:
+        if rel_path.endswith(".java"):
+            stack, root = "maven", _component_root(project_path, rel_path, ("pom.xml",))
+            if root is None:
+                stack, root = "gradle", _component_root(project_path, rel_path, GRADLE_MANIFESTS)
+        else:
+            root = _component_root(project_path, rel_path, ("package.json",))
+            angular = root is not None and os.path.isfile(os.path.join(project_path, root, "angular.json"))
+            stack = "angular" if angular else "jest"
+        if root is None:
+            uncovered.append(rel_path)
+        else:
+            groups.setdefault((root, stack), []).append(rel_path)
+    if uncovered:
+        raise ValueError(f"No test command covers {len(uncovered)} file(s) (no build manifest above them): {', '.join(uncovered)}")
+
+    commands = []
+    for (root, stack), group in sorted(groups.items()):
+        local = [posixpath.relpath(f, root) if root else f for f in group]
+        if stack in ("maven", "gradle"):
+            classes = [os.path.basename(f)[:-len(".java")] for f in local]
+            if stack == "maven":
+                command = ["mvn", "-o", "-q", "test", f"-Dtest={','.join(classes)}", "-Dsurefire.failIfNoSpecifiedTests=false"]
+            else:
+                command = ["gradle", "--offline", "-q", "test"] + [arg for c in classes for arg in ("--tests", c)]
+        elif stack == "angular":
+            command = ["npm", "run", "test", "--", "--watch=false"] + [f"--include={f}" for f in local]
+        else:
+            command = ["npm", "run", "test", "--"] + local
+        commands.append({"component": root or ".", "stack": stack, "files": group, "command": _in_dir(root, command)})
+    return commands
+
+
+class TestShardBalancer:
+    """
+    Splits test files across N shards using learned per-file durations
+    (longest-processing-time-first greedy). Shard wall times are fed back
+    after each run, so the split converges towards equal shard durations.
+    """
+
+    # Weight of the newest observation in the per-file moving average
+    EWMA_ALPHA = 0.3
+
+    def __init__(self, default_file_sec: float = 2.0, state_path: Optional[str] = None):
+        self.default_file_sec = default_file_sec
+        self.state_path = state_path
+        self._estimates: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        if state_path and os.path.isfile(state_path):
+            with open(state_path, "r", encoding="utf-8") as f:
+                self._estimates = json.load(f)
+
+    def estimate(self, test_file: str) -> float:
+        return self._estimates.get(test_file, self.default_file_sec)
+
+    def plan(self, files: List[str], shards: int) -> List[List[str]]:
+        """Assigns files to at most `shards` non-empty shards, heaviest files first."""
+        shards = max(1, min(shards, len(files)))
+        with self._lock:
+            weighted = sorted(files, key=lambda f: (-self.estimate(f), f))
+            heap = [(0.0, i) for i in range(shards)]
+            plan: List[List[str]] = [[] for _ in range(shards)]
+            for test_file in weighted:
+                load, index = heapq.heappop(heap)
+                plan[index].append(test_file)
+                heapq.heappush(heap, (load + self.estimate(test_file), index))
+        return plan
+
+    def learn(self, files: List[str], shard_duration_sec: float) -> None:
+        """Attributes a shard's wall time to its files in proportion to their current estimates."""
+        if not files:
+            return
+        with self._lock:
+            total = sum(self.estimate(f) for f in files) or 1.0
+            for test_file in files:
+                observed = shard_duration_sec * self.estimate(test_file) / total
+                previous = self._estimates.get(test_file)
+                self._estimates[test_file] = observed if previous is None else (
+                    self.EWMA_ALPHA * observed + (1 - self.EWMA_ALPHA) * previous
+                )
+            if self.state_path:
+                tmp_path = f"{self.state_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._estimates, f)
+                os.replace(tmp_path, self.state_path)
+
+
+# Shared across sandboxes in this process: generated projects reuse template test files
+default_shard_balancer = TestShardBalancer()
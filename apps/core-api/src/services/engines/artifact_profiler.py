@@ -0,0 +1,265 @@
+import json
+import logging
+import os
+import socket
+import subprocess
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+class ArtifactProfiler:
+    """
+    Performance profile of a built sandbox image: size, layer count, largest
+    layers, time to first healthy response and peak memory during start-up.
+    Complete profiles are cached by image ID (content digest), so re-validating
+    an unchanged artifact costs one `docker image inspect`; a start-up run that
+    never got healthy is only remembered for FAILURE_TTL_SEC, since it may have
+    been transient. The start-up run is hardened like the sandbox's own runs
+    (read-only rootfs, no egress). Health is polled at the container's IP; where
+    that is not routable from the host (Docker Desktop on macOS/Windows) the
+    check runs inside the container with its own wget/curl instead.
+    """
+
+    # Per-stack budgets; "*" applies to unknown stacks. None disables a check.
+    # Combined stacks ("angular+spring-boot") add up their components' budgets.
+    STACK_BUDGETS = {
+        "spring-boot": {"image_mb": 450, "layers": 30, "ttfhr_sec": 45, "peak_memory_mb": 450},
+        "angular": {"image_mb": 120, "layers": 20, "ttfhr_sec": 10, "peak_memory_mb": 128},
+        "node": {"image_mb": 300, "layers": 25, "ttfhr_sec": 15, "peak_memory_mb": 256},
+        "*": {"image_mb": 500, "layers": 40, "ttfhr_sec": 60, "peak_memory_mb": 512},
+    }
+
+    # Port the generated app listens on inside the container, per stack
+    STACK_PORTS = {"spring-boot": 8080, "angular": 80, "node": 3000}
+
+    HEALTH_PATHS = {"angular": "/"}
+    DEFAULT_HEALTH_PATH = "/api/health"
+
+    TOP_LAYERS = 3
+
+    # How long an incomplete profile (no healthy response) is reused before retrying
+    FAILURE_TTL_SEC = 300
+
+    # Internal network: the host can reach the container, the container cannot reach out
+    PROFILE_NETWORK = "sandbox-profile-internal"
+
+    def __init__(self, cache_path: Optional[str] = None, budgets: Optional[Dict[str, Dict[str, Any]]] = None,
+                 memory_limit: str = "512m", cpu_limit: str = "1.0", startup_timeout_sec: float = 90):
+        self.cache_path = cache_path
+        self.budgets = {**self.STACK_BUDGETS, **(budgets or {})}
+        self.memory_limit = memory_limit
+        self.cpu_limit = cpu_limit
+        self.startup_timeout_sec = startup_timeout_sec
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        if cache_path and os.path.isfile(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                self._cache = json.load(f)
+
+    @staticmethod
+    def _docker(*args: str, timeout_sec: float = 30) -> str:
+        result = subprocess.run(["docker", *args], capture_output=True, text=True, timeout=timeout_sec)
+        if result.returncode != 0:
+            raise RuntimeError(f"docker {args[0]} failed: {result.stderr.strip()}")
+        return result.stdout
+
+    @staticmethod
+    def _parse_size(text: str) -> float:
+        """'123.4MiB' / '1.2GB' / '512kB' -> bytes."""
+        units = {"b": 1, "kb": 1e3, "kib": 1024, "mb": 1e6, "mib": 1024 ** 2, "gb": 1e9, "gib": 1024 ** 3}
+        text = text.strip()
+        number = text.rstrip("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ")
+        unit = text[len(number):].strip().lower() or "b"
+        return float(number) * units.get(unit, 1)
+
+    def _static_profile(self, image: str) -> Dict[str, Any]:
+        info = json.loads(self._docker("image", "inspect", "--format", "{{json .}}", image))
+        layers = []
+        for line in self._docker("history", "--no-trunc", "--human=false", "--format", "{{.Size}}\t{{.CreatedBy}}", image).splitlines():
+            size, _, created_by = line.partition("\t")
+            if size.strip().isdigit() and int(size) > 0:
+                layers.append({"bytes": int(size), "created_by": created_by.strip()[:160]})
+        layers.sort(key=lambda l: -l["bytes"])
+        return {
+            "digest": info["Id"],
+            "image_bytes": int(info.get("Size", 0)),
+            "layer_count": len(info.get("RootFS", {}).get("Layers", [])),
+            "largest_layers": layers[:self.TOP_LAYERS],
+        }
+
+    @staticmethod
+    def _components(stack: str) -> List[str]:
+        return [s for s in stack.split("+") if s in ArtifactProfiler.STACK_PORTS]
+
+    def _endpoint(self, stack: str) -> Tuple[int, str]:
+        """Port and health path to poll; in combined stacks the API component answers health."""
+        components = sorted(self._components(stack), key=lambda c: c in self.HEALTH_PATHS)
+        if not components:
+            return 8080, self.DEFAULT_HEALTH_PATH
+        return self.STACK_PORTS[components[0]], self.HEALTH_PATHS.get(components[0], self.DEFAULT_HEALTH_PATH)
+
+    def budget_for(self, stack: str) -> Dict[str, Any]:
+        """The stack's own budget, else the combination of its components' budgets, else "*"."""
+        if stack in self.budgets:
+            return self.budgets[stack]
+        budgets = [self.budgets[c] for c in self._components(stack) if c in self.budgets]
+        if not budgets:
+            return self.budgets["*"]
+        combined = {}
+        for key in ("image_mb", "layers", "peak_memory_mb"):
+            values = [b.get(key) for b in budgets]
+            combined[key] = None if None in values else sum(values)
+        ttfhr = [b.get("ttfhr_sec") for b in budgets]
+        # Components start in parallel inside one image
+        combined["ttfhr_sec"] = None if None in ttfhr else max(ttfhr)
+        return combined
+
+    def _ensure_network(self) -> None:
+        try:
+            self._docker("network", "inspect", self.PROFILE_NETWORK)
+        except RuntimeError:
+            try:
+                self._docker("network", "create", "--internal", self.PROFILE_NETWORK)
+            except RuntimeError as e:
+                # Lost a creation race with a concurrent profile
+                if "already exists" not in str(e):
+                    raise
+
+    @staticmethod
+    def _reachable(address: str, port: int, timeout_sec: float = 1.0) -> bool:
+        """Whether the container IP is routable from this host; a refused connection means it is."""
+        if not address:
+            return False
+        try:
+            socket.create_connection((address, port), timeout=timeout_sec).close()
+            return True
+        except ConnectionRefusedError:
+            # Routable, the app just is not listening yet
+            return True
+        except OSError:
+            return False
+
+    def _exec_probe(self, container_id: str, port: int, health_path: str) -> List[str]:
+        """Command polling health from inside the container, with whichever HTTP client the image has."""
+        try:
+            tool = self._docker("exec", container_id, "sh", "-c", "command -v wget || command -v curl").strip()
+        except RuntimeError:
+            raise RuntimeError("container IP not reachable from this host and the image has no wget/curl "
+                               "for an in-container health check")
+        url = f"http://127.0.0.1:{port}{health_path}"
+        if tool.endswith("wget"):
+            return ["docker", "exec", container_id, tool, "-q", "-O", "/dev/null", url]
+        return ["docker", "exec", container_id, tool, "-fsS", "-o", "/dev/null", url]
+
+    def _startup_profile(self, image: str, stack: str) -> Dict[str, Any]:
+        """Starts the hardened image on an internal network and polls health while sampling memory."""
+        port, health_path = self._endpoint(stack)
+        self._ensure_network()
+        container_id = self._docker("run", "-d", "--memory", self.memory_limit, "--cpus", self.cpu_limit,
+                                    "--network", self.PROFILE_NETWORK, "--read-only", "--tmpfs", "/tmp",
+                                    "--security-opt", "no-new-privileges:true", image).strip()
+        samples: List[float] = []
+        healthy = threading.Event()
+
+        def sample_memory():
+            while not healthy.is_set():
+                try:
+                    usage = self._docker("stats", "--no-stream", "--format", "{{.MemUsage}}", container_id, timeout_sec=10)
+                    samples.append(self._parse_size(usage.split("/")[0]))
+                except (RuntimeError, subprocess.TimeoutExpired, ValueError):
+                    break
+
+        sampler = threading.Thread(target=sample_memory, daemon=True)
+        start_time = time.time()
+        ttfhr = None
+        try:
+            address = self._docker("inspect", "--format",
+                                   "{{range .NetworkSettings.Networks}}{{.IPAddress}}{{end}}", container_id).strip()
+            url = f"http://{address}:{port}{health_path}"
+            probe_cmd = None
+            if not self._reachable(address, port):
+                logger.warning("Container IP %s is not routable from this host; checking health inside the container.",
+                               address or "(none)")
+                probe_cmd = self._exec_probe(container_id, port, health_path)
+            sampler.start()
+            while time.time() - start_time < self.startup_timeout_sec:
+                try:
+                    if probe_cmd is not None:
+                        ok = subprocess.run(probe_cmd, capture_output=True, timeout=5).returncode == 0
+                    else:
+                        ok = requests.get(url, timeout=2).status_code == 200
+                    if ok:
+                        ttfhr = time.time() - start_time
+                        break
+                except (requests.RequestException, subprocess.TimeoutExpired):
+                    pass
+                time.sleep(0.25)
+        finally:
+            healthy.set()
+            if sampler.is_alive():
+                sampler.join(timeout=10)
+            try:
+                # One last sample: a healthy app has finished its start-up allocations
+                usage = self._docker("stats", "--no-stream", "--format", "{{.MemUsage}}", container_id, timeout_sec=10)
+                samples.append(self._parse_size(usage.split("/")[0]))
+            except (RuntimeError, subprocess.TimeoutExpired, ValueError):
+                pass
+            subprocess.run(["docker", "rm", "-f", container_id], capture_output=True)
+        return {
+            "ttfhr_sec": round(ttfhr, 2) if ttfhr is not None else None,
+            "peak_memory_bytes": int(max(samples)) if samples else None,
+            "health_url_path": health_path,
+            "health_probe": "host" if probe_cmd is None else "exec",
+        }
+
+    def profile(self, image: str, stack: str = "unknown") -> Dict[str, Any]:
+        """Returns the (cached) profile of `image` with its budget check for `stack`."""
+        static = self._static_profile(image)
+        with self._lock:
+            cached = self._cache.get(static["digest"])
+        if cached is not None and cached.get("ttfhr_sec") is None \
+                and time.time() - cached.get("profiled_at", 0) > self.FAILURE_TTL_SEC:
+            cached = None
+        if cached is not None:
+            profile = {**cached, "cached": True}
+        else:
+            logger.info("Profiling artifact %s (%s)...", image, static["digest"][:19])
+            profile = {**static, **self._startup_profile(image, stack), "profiled_at": time.time()}
+            with self._lock:
+                self._cache[static["digest"]] = profile
+                self._save()
+            profile = {**profile, "cached": False}
+        profile["violations"] = self.check_budget(profile, stack)
+        profile["stack"] = stack
+        return profile
+
+    def check_budget(self, profile: Dict[str, Any], stack: str) -> List[str]:
+        budget = self.budget_for(stack)
+        violations = []
+        mb = 1024 ** 2
+        if budget.get("image_mb") is not None and profile["image_bytes"] > budget["image_mb"] * mb:
+            violations.append(f"image size {profile['image_bytes'] / mb:.0f}MB > {budget['image_mb']}MB")
+        if budget.get("layers") is not None and profile["layer_count"] > budget["layers"]:
+            violations.append(f"{profile['layer_count']} layers > {budget['layers']}")
+        if budget.get("ttfhr_sec") is not None:
+            if profile.get("ttfhr_sec") is None:
+                violations.append(f"no healthy response within {self.startup_timeout_sec}s")
+            elif profile["ttfhr_sec"] > budget["ttfhr_sec"]:
+                violations.append(f"time to first healthy response {profile['ttfhr_sec']}s > {budget['ttfhr_sec']}s")
+        if budget.get("peak_memory_mb") is not None and profile.get("peak_memory_bytes") is not None \
+                and profile["peak_memory_bytes"] > budget["peak_memory_mb"] * mb:
+            violations.append(f"peak start-up memory {profile['peak_memory_bytes'] / mb:.0f}MB > {budget['peak_memory_mb']}MB")
+        return violations
+
+    def _save(self) -> None:
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        tmp_path = f"{self.cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._cache, f)
+        os.replace(tmp_path, self.cache_path)
@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple, Callable
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from deployment_gatekeeper import DeploymentGatekeeper
+from latency_stats import summarize
+
+class HostConnectionLimiter:
+    """
+    Caps concurrent requests per host across every gatekeeper of a batch.
+    Waiting for a slot happens before a probe starts its clock, and is bounded
+    by the caller's timeout, so a busy host never inflates measured latency.
+    """
+
+    def __init__(self, per_host_limit: int):
+        self.per_host_limit = per_host_limit
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, host: str, timeout_sec: float) -> bool:
+        with self._lock:
+            slots = self._slots.setdefault(host, threading.BoundedSemaphore(self.per_host_limit))
+        return slots.acquire(timeout=timeout_sec)
+
+    def release(self, host: str) -> None:
+        self._slots[host].release()
+
+
+class BatchDeploymentVerifier:
+    """
+    Re-verifies many deployed apps, e.g. after a template fix roll-out.
+
+    Every (project_id, live_url) pair goes through DeploymentGatekeeper's
+    post-deployment verification. At most `max_concurrency` apps are verified
+    at once. All gatekeepers share one connection pool sized to `per_host_limit`
+    connections per host, and a HostConnectionLimiter admits at most that many
+    concurrent requests per host, so apps behind the same platform host are not
+    hammered and the pool itself never has to block.
+    """
+
+    def __init__(self, max_concurrency: int = 32, per_host_limit: int = 4, max_hosts: int = 256,
+                 report_path: Optional[str] = None,
+                 gatekeeper_factory: Optional[Callable[..., DeploymentGatekeeper]] = None):
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.report_path = report_path
+        self.gatekeeper_factory = gatekeeper_factory or DeploymentGatekeeper
+
+        self.host_limiter = HostConnectionLimiter(per_host_limit)
+        self.session = requests.Session()
+        # Admission happens in the limiter; a blocking pool would add unbounded, unmeasured waits
+        adapter = HTTPAdapter(pool_connections=max_hosts, pool_maxsize=per_host_limit, pool_block=False)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _verify_one(self, project_id: str, live_url: str) -> Dict[str, Any]:
+        start_time = time.time()
+        try:
+            gatekeeper = self.gatekeeper_factory(project_id, session=self.session, host_limiter=self.host_limiter)
+            result = gatekeeper.post_deployment_verification(live_url)
+        except Exception as e:
+            result = {"verified": False, "status": "error", "failure_reason": str(e)}
+        return {
+            "project_id": project_id,
+            "live_url": live_url,
+            "host": urlparse(live_url).netloc,
+            "duration_sec": round(time.time() - start_time, 2),
+            **result,
+        }
+
+    def verify_iter(self, targets: Iterable[Tuple[str, str]]) -> Iterator[Dict[str, Any]]:
+        """Yields one result per (project_id, live_url) as soon as it completes."""
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = [pool.submit(self._verify_one, project_id, live_url) for project_id, live_url in targets]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def verify(self, targets: Iterable[Tuple[str, str]],
+               on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Verifies every target, streaming results to `on_result`, and returns (and writes) the summary report."""
+        start_time = time.time()
+        results = []
+        for result in self.verify_iter(targets):
+            results.append(result)
+            if on_result:
+                on_result(result)
+        report = {"summary": self.summarize(results, time.time() - start_time), "results": results}
+        if self.report_path:
+            tmp_path = f"{self.report_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            os.replace(tmp_path, self.report_path)
+        return report
+
+    @staticmethod
+    def summarize(results: List[Dict[str, Any]], elapsed_sec: float) -> Dict[str, Any]:
+        failed = [r for r in results if not r.get("verified")]
+        failing_hosts: Dict[str, int] = {}
+        for r in failed:
+            failing_hosts[r["host"]] = failing_hosts.get(r["host"], 0) + 1
+        return {
+            "total": len(results),
+            "verified": len(results) - len(failed),
+            "failed": len(failed),
+            "errors": sum(1 for r in failed if r.get("status") == "error"),
+            "elapsed_sec": round(elapsed_sec, 2),
+            "duration_sec": summarize([r["duration_sec"] for r in results]),
+            "failing_hosts": dict(sorted(failing_hosts.items(), key=lambda kv: -kv[1])),
+            "failed_projects": [r["project_id"] for r in failed],
+        }
+
+
+def _read_targets(path: str) -> List[Tuple[str, str]]:
+    """Reads `project_id,live_url` lines (or a JSON list of {project_id, live_url})."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return [(item["project_id"], item["live_url"]) for item in json.loads(text)]
+    targets = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            project_id, live_url = (part.strip() for part in line.split(",", 1))
+            targets.append((project_id, live_url))
+    return targets
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Verify many deployed apps concurrently.")
+    parser.add_argument("targets", help="CSV (project_id,live_url) or JSON list file")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--per-host", type=int, default=4)
+    parser.add_argument("--report", default="verification-report.json")
+    args = parser.parse_args(argv)
+
+    verifier = BatchDeploymentVerifier(max_concurrency=args.concurrency, per_host_limit=args.per_host,
+                                       report_path=args.report)
+    report = verifier.verify(
+        _read_targets(args.targets),
+        on_result=lambda r: print(json.dumps({k: r[k] for k in ("project_id", "live_url", "verified", "status", "duration_sec")})),
+    )
+    print(json.dumps(report["summary"], indent=2))
+    return 0 if report["summary"]["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
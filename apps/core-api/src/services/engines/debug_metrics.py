@@ -0,0 +1,87 @@
+import json
+import os
+import sys
+import threading
+from collections import deque
+from typing import Dict, Any, Callable, List, Sequence
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from latency_stats import summarize
+
+# Attempt outcomes that mean the model answer itself was unusable
+PARSE_FAILURES = ("malformed_json", "invalid_patch", "stream_cancelled")
+
+class MetricsSink:
+    """
+    Destination for PatchDebugEngine per-attempt records. One record per LLM
+    call, with: file_path, attempt, mode, provider, options, error_category,
+    prompt_tokens, completion_tokens, token_source, ttft_ms, latency_ms,
+    validation_ms, outcome, backoff_sec, ts.
+    """
+
+    def emit(self, record: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+
+class CallbackMetricsSink(MetricsSink):
+    """Forwards every record to a callable (e.g. a Supabase insert or a metrics client)."""
+
+    def __init__(self, callback: Callable[[Dict[str, Any]], None]):
+        self.callback = callback
+
+    def emit(self, record: Dict[str, Any]) -> None:
+        self.callback(record)
+
+
+class JsonlMetricsSink(MetricsSink):
+    """Appends records as JSON lines; the file can be tailed or bulk-loaded into a dashboard."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, sort_keys=True)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class InMemoryMetricsSink(MetricsSink):
+    """Keeps the last `max_records` records and aggregates them per provider and error category."""
+
+    def __init__(self, max_records: int = 10000):
+        self._records: "deque[Dict[str, Any]]" = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def emit(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._records.append(record)
+
+    def records(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._records)
+
+    def summary(self, group_by: Sequence[str] = ("provider", "error_category")) -> List[Dict[str, Any]]:
+        """Attempts, outcomes, token totals and latency/TTFT percentiles per group."""
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for record in self.records():
+            groups.setdefault(tuple(record.get(k) for k in group_by), []).append(record)
+        rows = []
+        for key, records in sorted(groups.items(), key=lambda item: -len(item[1])):
+            outcomes: Dict[str, int] = {}
+            for r in records:
+                outcomes[r["outcome"]] = outcomes.get(r["outcome"], 0) + 1
+            rows.append({
+                **dict(zip(group_by, key)),
+                "attempts": len(records),
+                "outcomes": outcomes,
+                "parse_failure_rate": round(sum(outcomes.get(o, 0) for o in PARSE_FAILURES) / len(records), 4),
+                "prompt_tokens": sum(r["prompt_tokens"] for r in records),
+                "completion_tokens": sum(r["completion_tokens"] for r in records),
+                "latency_ms": summarize([r["latency_ms"] for r in records], digits=1),
+                "ttft_ms": summarize([r["ttft_ms"] for r in records if r["ttft_ms"] is not None], digits=1),
+                "validation_ms": summarize([r["validation_ms"] for r in records], digits=1),
+                "backoff_sec": round(sum(r["backoff_sec"] for r in records), 2),
+            })
+        return rows
@@ -0,0 +1,338 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from project_stack import STACK_MARKERS
+from dockerfile_rewriter import rewrite_shell_runs
+
+class DependencyCache:
+    """
+    Host-managed offline mirror for sandbox builds: a Maven local repository
+    plus an npm cache directory. After each warm-up the mirror is published as
+    a local cache image; builds bind-mount that image read-only, so BuildKit
+    snapshots it once per publication instead of syncing the whole directory
+    into every build. Once every manifest of a project is warm and published,
+    the build runs with `--network none` and Maven/npm in offline mode.
+    """
+
+    DEFAULT_ROOT = "/var/cache/sandbox-deps"
+    DEFAULT_MAX_BYTES = 20 * 1024 ** 3 # 20 GiB
+
+    MAVEN_IMAGE = "maven:3.9-eclipse-temurin-17"
+    NODE_IMAGE = "node:20-alpine"
+
+    IMAGE_TAG = "sandbox-depcache:latest"
+    IMAGE_DOCKERFILE = "FROM scratch\nCOPY m2 /m2\nCOPY npm /npm\n"
+    MOUNT_TARGET = "/deps"
+
+    # After eviction the cache is trimmed to this fraction of the cap to avoid thrashing
+    EVICTION_HEADROOM = 0.9
+
+    MAVEN_COMMAND = re.compile(r"(^|[\s;&|(])(\./)?mvnw?\b")
+    NPM_COMMAND = re.compile(r"(^|[\s;&|(])npm\s+(ci|install|i)\b")
+
+    def __init__(self, root: str = DEFAULT_ROOT, max_bytes: int = DEFAULT_MAX_BYTES, warmup_timeout_sec: int = 900,
+                 image_tag: str = IMAGE_TAG):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.warmup_timeout_sec = warmup_timeout_sec
+        self.image_tag = image_tag
+        self.maven_repo = os.path.join(root, "m2", "repository")
+        self.npm_cache = os.path.join(root, "npm")
+        self.markers_dir = os.path.join(root, "warm")
+        self.image_state_path = os.path.join(root, "image.json")
+        layout = (root, os.path.join(root, "m2"), self.maven_repo, self.npm_cache, self.markers_dir)
+        created = [path for path in layout if not os.path.isdir(path)]
+        for path in (self.maven_repo, self.npm_cache, self.markers_dir):
+            os.makedirs(path, exist_ok=True)
+        # Only the service user writes the mirror (warm-ups run as that user); sandbox builds read it
+        # through the published image, where world-readable is enough. Directories that already
+        # existed (e.g. a shared root owned by another user) keep the mode their owner gave them.
+        for path in created:
+            os.chmod(path, 0o755)
+
+    # --- Manifests -------------------------------------------------------
+
+    @staticmethod
+    def manifest_digest(manifest_path: str) -> str:
+        """Digest of a manifest plus its lockfile, i.e. of the exact dependency set."""
+        digest = hashlib.sha256()
+        directory = os.path.dirname(manifest_path)
+        for name in (os.path.basename(manifest_path), "package-lock.json"):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                with open(path, "rb") as f:
+                    digest.update(name.encode("utf-8") + b"\0" + f.read())
+        return digest.hexdigest()
+
+    @staticmethod
+    def find_manifests(project_path: str) -> List[str]:
+        """pom.xml / package.json files at the project root and one level below."""
+        wanted = STACK_MARKERS["spring-boot"][:1] + STACK_MARKERS["node"]
+        manifests = []
+        for directory in [project_path] + sorted(
+            e.path for e in os.scandir(project_path)
+            if e.is_dir() and not e.name.startswith(".") and e.name not in ("node_modules", "target")
+        ):
+            manifests += [os.path.join(directory, m) for m in wanted if os.path.isfile(os.path.join(directory, m))]
+        return manifests
+
+    def _marker_path(self, manifest_path: str) -> str:
+        return os.path.join(self.markers_dir, f"{self.manifest_digest(manifest_path)}.json")
+
+    def is_warm(self, project_path: str) -> bool:
+        """Every manifest was resolved into the mirror before the current cache image was published."""
+        published_at = self.published_at()
+        if published_at is None:
+            return False
+        manifests = self.find_manifests(project_path)
+        if not manifests:
+            return False
+        for manifest in manifests:
+            try:
+                with open(self._marker_path(manifest), "r", encoding="utf-8") as f:
+                    if json.load(f)["warmed_at"] > published_at:
+                        return False
+            except (OSError, ValueError, KeyError):
+                return False
+        return True
+
+    # --- Warm-up ---------------------------------------------------------
+
+    def _warm_command(self, manifest_path: str, workdir: str) -> List[str]:
+        # Run as the service user so the mirror keeps its 0755 ownership instead of filling up with root files
+        user = ["--user", f"{os.getuid()}:{os.getgid()}"] if hasattr(os, "getuid") else []
+        if manifest_path.endswith("pom.xml"):
+            return [
+                "docker", "run", "--rm", *user,
+                "-v", f"{self.maven_repo}:/var/maven/repository",
+                "-v", f"{workdir}:/work:ro", "-w", "/work",
+                "-e", "MAVEN_CONFIG=/var/maven",
+                self.MAVEN_IMAGE,
+                "mvn", "-B", "-q", "-Duser.home=/var/maven", "-Dmaven.repo.local=/var/maven/repository",
+                "dependency:go-offline", "dependency:resolve-plugins",
+            ]
+        install = "ci" if os.path.isfile(os.path.join(workdir, "package-lock.json")) else "install"
+        return [
+            "docker", "run", "--rm", *user,
+            "-v", f"{self.npm_cache}:/var/npm",
+            "-v", f"{workdir}:/work", "-w", "/work",
+            "-e", "npm_config_cache=/var/npm", "-e", "HOME=/tmp",
+            self.NODE_IMAGE,
+            "npm", install, "--ignore-scripts", "--no-audit", "--no-fund",
+        ]
+
+    def warm(self, manifests: List[str]) -> Dict[str, Any]:
+        """
+        Resolves every dependency of the given manifests into the shared cache.
+        npm installs run in a scratch copy so node_modules never lands next to the manifest.
+        """
+        report = {"warmed": [], "already_warm": [], "failed": []}
+        for manifest in manifests:
+            manifest = os.path.abspath(manifest)
+            marker = self._marker_path(manifest)
+            if os.path.isfile(marker):
+                report["already_warm"].append(manifest)
+                continue
+
+            print(f"Warming dependency cache from {manifest}...")
+            start_time = time.time()
+            with tempfile.TemporaryDirectory(prefix="depwarm-") as scratch:
+                workdir = os.path.dirname(manifest)
+                if manifest.endswith("package.json"):
+                    for name in ("package.json", "package-lock.json", ".npmrc"):
+                        if os.path.isfile(os.path.join(workdir, name)):
+                            shutil.copy2(os.path.join(workdir, name), scratch)
+                    workdir = scratch
+                try:
+                    result = subprocess.run(self._warm_command(manifest, workdir), capture_output=True, text=True,
+                                            timeout=self.warmup_timeout_sec)
+                    ok, log = result.returncode == 0, result.stderr[-2000:]
+                except subprocess.TimeoutExpired:
+                    ok, log = False, f"Warm-up timed out after {self.warmup_timeout_sec}s"
+
+            if ok:
+                with open(marker, "w", encoding="utf-8") as f:
+                    json.dump({"manifest": manifest, "warmed_at": time.time(), "duration_sec": round(time.time() - start_time, 2)}, f)
+                report["warmed"].append(manifest)
+            else:
+                report["failed"].append({"manifest": manifest, "log": log})
+                print(f"❌ Dependency warm-up failed for {manifest}.")
+
+        report["eviction"] = self.evict()
+        if report["warmed"] or report["eviction"]["evicted_files"] or self.published_at() is None:
+            report["image"] = self.publish_image()
+        return report
+
+    # --- Cache image -----------------------------------------------------
+
+    def published_at(self) -> Optional[float]:
+        try:
+            with open(self.image_state_path, "r", encoding="utf-8") as f:
+                return json.load(f)["published_at"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def publish_image(self) -> Dict[str, Any]:
+        """
+        Snapshots the mirror into `image_tag` (FROM scratch, m2/ and npm/ only).
+        This is the one place the full mirror is sent to the daemon; builds then
+        bind-mount the image by reference.
+        """
+        start_time = time.time()
+        with tempfile.TemporaryDirectory(prefix="depimage-") as scratch:
+            dockerfile = os.path.join(scratch, "Dockerfile")
+            with open(dockerfile, "w", encoding="utf-8") as f:
+                f.write(self.IMAGE_DOCKERFILE)
+            try:
+                result = subprocess.run(["docker", "build", "-q", "-t", self.image_tag, "-f", dockerfile, self.root],
+                                        capture_output=True, text=True, timeout=self.warmup_timeout_sec)
+                ok, log = result.returncode == 0, result.stderr[-2000:]
+            except subprocess.TimeoutExpired:
+                ok, log = False, f"Cache image build timed out after {self.warmup_timeout_sec}s"
+        if not ok:
+            print(f"❌ Publishing dependency cache image {self.image_tag} failed.")
+            return {"published": False, "log": log}
+        with open(self.image_state_path, "w", encoding="utf-8") as f:
+            json.dump({"image": self.image_tag, "published_at": start_time}, f)
+        return {"published": True, "image": self.image_tag, "duration_sec": round(time.time() - start_time, 2)}
+
+    # --- Size bound ------------------------------------------------------
+
+    def _cache_files(self) -> List[tuple]:
+        files = []
+        for base in (os.path.join(self.root, "m2"), self.npm_cache):
+            for dirpath, _, filenames in os.walk(base):
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((max(st.st_atime, st.st_mtime), st.st_size, path))
+        return files
+
+    def usage_bytes(self) -> int:
+        return sum(size for _, size, _ in self._cache_files())
+
+    def evict(self) -> Dict[str, Any]:
+        """
+        Keeps the cache under `max_bytes` by deleting least-recently-used files.
+        Any eviction invalidates all warm markers: a partial mirror must not
+        be trusted for offline builds until it is warmed again.
+        """
+        files = self._cache_files()
+        usage = sum(size for _, size, _ in files)
+        if usage <= self.max_bytes:
+            return {"usage_bytes": usage, "evicted_files": 0, "evicted_bytes": 0}
+
+        target = int(self.max_bytes * self.EVICTION_HEADROOM)
+        evicted_files = evicted_bytes = 0
+        for _, size, path in sorted(files):
+            if usage <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            usage -= size
+            evicted_files += 1
+            evicted_bytes += size
+
+        for marker in os.listdir(self.markers_dir):
+            os.remove(os.path.join(self.markers_dir, marker))
+        print(f"Dependency cache evicted {evicted_files} files ({evicted_bytes} bytes); warm markers reset.")
+        return {"usage_bytes": usage, "evicted_files": evicted_files, "evicted_bytes": evicted_bytes}
+
+    # --- Build integration -----------------------------------------------
+
+    def rewrite_dockerfile(self, dockerfile: str, offline: bool) -> str:
+        """
+        Adds a read-only bind of the cache image to every shell-form RUN that invokes
+        Maven or npm and points both tools at it (offline mode when the mirror is warm).
+        Maven reads it as a tail repository (3.9+), keeping its own writable local repo.
+        """
+        env = [
+            f"npm_config_cache={self.MOUNT_TARGET}/npm",
+            "npm_config_logs_dir=/tmp/npm-logs",
+            "npm_config_update_notifier=false",
+            f'MAVEN_OPTS="$MAVEN_OPTS -Dmaven.repo.local.tail={self.MOUNT_TARGET}/m2/repository"',
+        ]
+        if offline:
+            env += ["npm_config_offline=true", 'MAVEN_ARGS="$MAVEN_ARGS -o"']
+        mount = f"--mount=type=bind,from={self.image_tag},target={self.MOUNT_TARGET}"
+
+        def add_mount(flags: str, command: str) -> Optional[str]:
+            if not (self.MAVEN_COMMAND.search(command) or self.NPM_COMMAND.search(command)):
+                return None
+            return f"{flags}{mount} export {' '.join(env)} && {command}"
+
+        return rewrite_shell_runs(dockerfile, add_mount)
+
+    def build_options(self, project_path: str, dockerfile: str) -> Dict[str, Any]:
+        """Network mode and rewritten Dockerfile for one sandbox build (no named context is synced)."""
+        offline = self.is_warm(project_path)
+        # Refresh recency so LRU eviction keeps manifests that are still in use
+        for manifest in self.find_manifests(project_path):
+            marker = self._marker_path(manifest)
+            if os.path.isfile(marker):
+                os.utime(marker)
+        published = self.published_at() is not None
+        return {
+            "build_contexts": {},
+            "network": "none" if offline else None,
+            "offline": offline,
+            # Nothing to mount until a first warm-up has published the image
+            "dockerfile": self.rewrite_dockerfile(dockerfile, offline) if published else dockerfile,
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage the shared sandbox dependency cache.")
+    parser.add_argument("--root", default=DependencyCache.DEFAULT_ROOT)
+    parser.add_argument("--max-gb", type=float, default=DependencyCache.DEFAULT_MAX_BYTES / 1024 ** 3)
+    sub = parser.add_subparsers(dest="command", required=True)
+    warm = sub.add_parser("warm", help="Resolve dependencies for a list of manifests")
+    warm.add_argument("manifests", nargs="*", help="pom.xml / package.json paths or project directories")
+    warm.add_argument("--from-file", help="File with one manifest or project path per line")
+    sub.add_parser("evict", help="Enforce the size cap now")
+    sub.add_parser("publish", help="Rebuild the cache image from the mirror")
+    sub.add_parser("status", help="Show cache usage")
+    args = parser.parse_args(argv)
+
+    cache = DependencyCache(root=args.root, max_bytes=int(args.max_gb * 1024 ** 3))
+    if args.command == "warm":
+        targets = list(args.manifests)
+        if args.from_file:
+            with open(args.from_file, "r", encoding="utf-8") as f:
+                targets += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        manifests = []
+        for target in targets:
+            manifests += DependencyCache.find_manifests(target) if os.path.isdir(target) else [target]
+        report = cache.warm(manifests)
+        print(json.dumps(report, indent=2))
+        return 1 if report["failed"] else 0
+    if args.command == "evict":
+        print(json.dumps(cache.evict(), indent=2))
+        return 0
+    if args.command == "publish":
+        report = cache.publish_image()
+        print(json.dumps(report, indent=2))
+        return 0 if report["published"] else 1
+    print(json.dumps({"root": cache.root, "usage_bytes": cache.usage_bytes(), "max_bytes": cache.max_bytes,
+                      "warm_manifests": len(os.listdir(cache.markers_dir)), "image": cache.image_tag,
+                      "published_at": cache.published_at()}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
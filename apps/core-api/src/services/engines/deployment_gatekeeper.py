@@ -1,27 +1,174 @@
 import requests
+import os
+import random
+import socket
+import subprocess
+import sys
 import time
 import json
-from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from latency_stats import summarize, histogram
+from load_smoke import SmokeLoadTester
+from artifact_profiler import ArtifactProfiler
 
 class DeploymentGatekeeper:
     """
     Guarantees deployment reliability by acting as a strict gating mechanism.
     Enforces pre-deployment validation and post-deployment health checks.
     """
-    def __init__(self, project_id: str):
+    def __init__(self, project_id: str, session: Optional[requests.Session] = None,
+                 artifact_profiler: Optional[ArtifactProfiler] = None, host_limiter=None):
         self.project_id = project_id
+        # Optional: profile the sandbox image (size, layers, start-up) against per-stack budgets
+        self.artifact_profiler = artifact_profiler
         # In a real system, these would be fetched securely from Vault/Supabase
         self.expected_health_endpoint = "/api/health"
-        self.max_retries = 5
-        self.retry_delay_sec = 10
+        # A sandbox run shorter than this is treated as a crash on start-up
+        self.min_run_duration_sec = 1.0
+        # Deadline-driven verification: retry with exponential backoff + jitter until the deadline
+        self.verification_deadline_sec = 60
+        self.initial_backoff_sec = 1.0
+        self.max_backoff_sec = 10.0
+        self.max_retries = 10 # hard cap on attempts within the deadline
+        self.probe_timeout_sec = 5
+
+        # Latency gating: extra samples per endpoint after success, and p50/p99 limits in ms.
+        # "flag" reports breaches in the result; "reject" fails verification.
+        self.latency_samples = 0
+        self.latency_slo_ms = {"p50": None, "p99": None}
+        self.latency_slo_action = "flag"
+
+        # Optional smoke-load stage after functional checks pass, e.g.
+        # {"rps": 20, "duration_sec": 10, "max_error_rate": 0.01, "max_p99_ms": 1000}
+        self.smoke_load: Optional[Dict[str, Any]] = None
+
+        # One keep-alive pool shared by every probe, so retries skip TCP/TLS setup
+        # (batch verification passes in a session shared across gatekeepers, plus a
+        # host_limiter with acquire(host, timeout) / release(host) capping requests per host)
+        self.session = session
+        self.host_limiter = host_limiter
+        if self.session is None:
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+
+    @staticmethod
+    def _is_dns_failure(error: Exception) -> bool:
+        """Walks the exception chain looking for a name-resolution failure."""
+        seen = set()
+        while error is not None and id(error) not in seen:
+            seen.add(id(error))
+            if isinstance(error, socket.gaierror) or type(error).__name__ == "NameResolutionError":
+                return True
+            if getattr(error, "args", None) and any(isinstance(a, Exception) for a in error.args):
+                error = next(a for a in error.args if isinstance(a, Exception))
+            else:
+                error = getattr(error, "reason", None) or error.__cause__ or error.__context__
+        return False
+
+    def _probe(self, url: str, timeout_sec: float = None) -> Dict[str, Any]:
+        """
+        Probes a URL once: {"ok", "status", "error", "retryable", "latency_ms", "queued_ms"}.
+        With a host_limiter the wait for a per-host slot is bounded by the probe timeout
+        and reported as `queued_ms`; `latency_ms` only covers the request itself.
+        """
+        timeout_sec = timeout_sec or self.probe_timeout_sec
+        host = urlparse(url).netloc
+        queued_at = time.perf_counter()
+        if self.host_limiter is not None and not self.host_limiter.acquire(host, timeout_sec):
+            return {"ok": False, "status": None, "error": "HostSlotTimeout", "retryable": True, "latency_ms": None,
+                    "queued_ms": round((time.perf_counter() - queued_at) * 1000, 1)}
+        start_time = time.perf_counter()
+        queued_ms = round((start_time - queued_at) * 1000, 1)
+        elapsed_ms = lambda: round((time.perf_counter() - start_time) * 1000, 1)
+        try:
+            response = self.session.get(url, timeout=timeout_sec)
+            return {"ok": response.status_code == 200, "status": response.status_code, "error": None,
+                    "retryable": True, "latency_ms": elapsed_ms(), "queued_ms": queued_ms}
+        except requests.RequestException as e:
+            if self._is_dns_failure(e):
+                return {"ok": False, "status": None, "error": f"DNS resolution failed for {url}",
+                        "retryable": False, "latency_ms": elapsed_ms(), "queued_ms": queued_ms}
+            return {"ok": False, "status": None, "error": type(e).__name__, "retryable": True,
+                    "latency_ms": elapsed_ms(), "queued_ms": queued_ms}
+        finally:
+            if self.host_limiter is not None:
+                self.host_limiter.release(host)
 
     def _probe_endpoint(self, url: str) -> bool:
         """Helper to probe a URL for HTTP 200 OK."""
-        try:
-            response = requests.get(url, timeout=5)
-            return response.status_code == 200
-        except requests.RequestException:
-            return False
+        return self._probe(url)["ok"]
+
+    def _probe_all(self, pool: ThreadPoolExecutor, endpoints: Dict[str, str], timeout_sec: float = None) -> Dict[str, dict]:
+        """Probes every endpoint concurrently; an attempt takes as long as the slowest one."""
+        futures = {name: pool.submit(self._probe, url, timeout_sec) for name, url in endpoints.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+    @staticmethod
+    def _record_latency(probe: Dict[str, Any], latencies: List[float], failed: List[float]) -> None:
+        """Only 2xx answers are latency samples; timeouts, refusals and 5xx are kept apart."""
+        if probe["latency_ms"] is None:
+            return
+        if probe["status"] is not None and 200 <= probe["status"] < 300:
+            latencies.append(probe["latency_ms"])
+        else:
+            failed.append(probe["latency_ms"])
+
+    def _sample_burst(self, pool: ThreadPoolExecutor, endpoints: Dict[str, str],
+                      latencies: Dict[str, List[float]], failed: Dict[str, List[float]]) -> None:
+        """Probes each endpoint `latency_samples` more times (endpoints in parallel, samples in sequence)."""
+        def sample(name: str, url: str) -> None:
+            for _ in range(self.latency_samples):
+                self._record_latency(self._probe(url), latencies[name], failed[name])
+        for future in [pool.submit(sample, name, url) for name, url in endpoints.items()]:
+            future.result()
+
+    def _latency_report(self, latencies: Dict[str, List[float]],
+                        failed: Optional[Dict[str, List[float]]] = None) -> Dict[str, Any]:
+        """
+        Per-endpoint summary + histogram of successful (2xx) probes, and any p50/p99 SLO
+        breaches. Failed probes are summarised separately under `failed_probes` and never
+        count towards the SLO.
+        """
+        failed = failed or {}
+        summary = {name: {**summarize(values, digits=1), "histogram_ms": histogram(values),
+                          "failed_probes": summarize(failed.get(name, []), digits=1)}
+                   for name, values in latencies.items()}
+        violations = []
+        for name, stats in summary.items():
+            for quantile, limit in self.latency_slo_ms.items():
+                if limit is not None and stats[quantile] is not None and stats[quantile] > limit:
+                    violations.append(f"{name} {quantile}={stats[quantile]}ms > {limit}ms")
+        return {"endpoints": summary, "slo_violations": violations}
+
+    def smoke_load_test(self, live_url: str) -> Dict[str, Any]:
+        """Open-loop burst against the health and auth endpoints, gated on error rate and p99."""
+        config = {"rps": 20, "duration_sec": 10, "max_error_rate": 0.01, "max_p99_ms": 1000, **(self.smoke_load or {})}
+        base = live_url.rstrip('/')
+        endpoints = {"System_Health": f"{base}{self.expected_health_endpoint}", "JWT_Auth_Pipeline": f"{base}/api/auth/verify"}
+        print(f"Gatekeeper (Smoke Load): {config['rps']} rps for {config['duration_sec']}s...")
+        report = SmokeLoadTester(timeout_sec=self.probe_timeout_sec).run(endpoints, config["rps"], config["duration_sec"])
+
+        violations = []
+        if report["error_rate"] > config["max_error_rate"]:
+            violations.append(f"error_rate={report['error_rate']} > {config['max_error_rate']}")
+        p99 = report["latency_ms"]["p99"]
+        if config["max_p99_ms"] is not None and p99 is not None and p99 > config["max_p99_ms"]:
+            violations.append(f"p99={p99}ms > {config['max_p99_ms']}ms")
+        report["violations"] = violations
+        report["passed"] = not violations
+        return report
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter in [50%, 100%] of the capped delay."""
+        delay = min(self.max_backoff_sec, self.initial_backoff_sec * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
 
     def pre_deployment_validation(self, sandbox_results: dict) -> Dict[str, Any]:
         """
@@ -37,22 +184,42 @@ class DeploymentGatekeeper:
         telemetry = sandbox_results.get("telemetry", {})
         
         # Verify it didn't just instantly exit
-        if telemetry.get("run_metrics", {}).get("run_duration_sec", 0) < 1.0:
+        if telemetry.get("run_metrics", {}).get("run_duration_sec", 0) < self.min_run_duration_sec:
             rejection_reasons.append("Container exited too quickly (CrashLoopBackOff suspected).")
 
+        # Artifact performance profile (bloated images, slow or memory-hungry start-up)
+        profiles = {}
+        if self.artifact_profiler is not None and not rejection_reasons:
+            build_metrics = telemetry.get("build_metrics", {})
+            images = {name: c for name, c in build_metrics.get("components", {}).items() if c.get("image")}
+            if build_metrics.get("image"):
+                images = {"app": build_metrics}
+            for name, metrics in images.items():
+                try:
+                    profile = self.artifact_profiler.profile(metrics["image"], metrics.get("stack", "unknown"))
+                except (RuntimeError, OSError, subprocess.TimeoutExpired, ValueError, KeyError) as e:
+                    # OSError: e.g. no docker CLI on this host
+                    rejection_reasons.append(f"Artifact profiling failed for {name}: {e}")
+                    continue
+                profiles[name] = profile
+                rejection_reasons += [f"Artifact budget exceeded ({name}): {v}" for v in profile["violations"]]
+
         # In a full system, we might also run a static SAST trace here
         # or verify specific env variables exist.
         
         if rejection_reasons:
             print("❌ Pre-deployment validation failed.")
-            return {
+            result = {
                 "approved": False,
                 "reasons": rejection_reasons,
                 "action": "trigger_rollback"
             }
-            
-        print("✅ Pre-deployment approved.")
-        return {"approved": True, "reasons": []}
+        else:
+            print("✅ Pre-deployment approved.")
+            result = {"approved": True, "reasons": []}
+        if profiles:
+            result["artifact_profile"] = profiles
+        return result
 
     def post_deployment_verification(self, live_url: str) -> Dict[str, Any]:
         """
@@ -65,42 +232,100 @@ class DeploymentGatekeeper:
         db_health_url = f"{live_url.rstrip('/')}/api/health/db"
         auth_verify_url = f"{live_url.rstrip('/')}/api/auth/verify"
         
+        endpoints = {
+            "Live_Base": live_url,
+            "System_Health": health_url,
+            "Database_Migrations": db_health_url,
+            "JWT_Auth_Pipeline": auth_verify_url,
+        }
         success = False
         failures = []
+        passed = set() # endpoints that already answered 200 are not probed again
+        latencies: Dict[str, List[float]] = {name: [] for name in endpoints}
+        failed_latencies: Dict[str, List[float]] = {name: [] for name in endpoints}
+        fatal = None
+        deadline = time.time() + self.verification_deadline_sec
+        attempt = 0
         
-        for attempt in range(self.max_retries):
-            print(f"Verification attempt {attempt + 1}/{self.max_retries}...")
+        with ThreadPoolExecutor(max_workers=len(endpoints)) as pool:
+            while attempt < self.max_retries:
+                print(f"Verification attempt {attempt + 1} ({max(0, deadline - time.time()):.0f}s left)...")
+                pending = {name: url for name, url in endpoints.items() if name not in passed}
+                timeout_sec = max(0.5, min(self.probe_timeout_sec, deadline - time.time()))
+                
+                # 1. Base URL + 2. Functional endpoint checks, all in parallel
+                results = self._probe_all(pool, pending, timeout_sec)
+                attempt += 1
+                passed.update(name for name, res in results.items() if res["ok"])
+                for name, res in results.items():
+                    self._record_latency(res, latencies[name], failed_latencies[name])
+                
+                # Aggregate status
+                if len(passed) == len(endpoints):
+                    success = True
+                    break
+                
+                # 3. Non-retryable signals: unresolvable host or a client error from the auth pipeline
+                fatal = next((f"{name}: {res['error']}" for name, res in results.items() if not res["retryable"]), None)
+                auth = results.get("JWT_Auth_Pipeline")
+                if fatal is None and auth and auth["status"] and 400 <= auth["status"] < 500 and auth["status"] not in (408, 429):
+                    fatal = f"JWT_Auth_Pipeline: HTTP {auth['status']}"
+                if fatal:
+                    print(f"❌ Non-retryable failure ({fatal}). Skipping remaining attempts.")
+                    break
+                
+                # No trailing sleep: stop if the next attempt could not start before the deadline
+                delay = self._backoff(attempt - 1)
+                if time.time() + delay >= deadline:
+                    break
+                time.sleep(delay)
             
-            # 1. Base URL Check
-            base_ok = self._probe_endpoint(live_url)
+            # 4. Optional sampling burst so the percentiles rest on more than one probe
+            if success and self.latency_samples > 0:
+                self._sample_burst(pool, endpoints, latencies, failed_latencies)
             
-            # 2. Functional Endpoint Checks
-            sys_health_ok = self._probe_endpoint(health_url)
-            db_health_ok = self._probe_endpoint(db_health_url)
-            auth_health_ok = self._probe_endpoint(auth_verify_url)
+        latency = self._latency_report(latencies, failed_latencies)
+        if success and latency["slo_violations"]:
+            print(f"⚠️ Latency SLO breached: {latency['slo_violations']}")
+            if self.latency_slo_action == "reject":
+                print("❌ Post-deployment verification rejected on latency. Triggering rollback.")
+                return {
+                    "verified": False,
+                    "status": "failed",
+                    "attempts": attempt,
+                    "latency": latency,
+                    "failure_reason": f"Latency SLO breached: {latency['slo_violations']}. Rollback triggered."
+                }
             
-            # Aggregate status
-            if base_ok and sys_health_ok and db_health_ok and auth_health_ok:
-                success = True
-                break
-                
-            time.sleep(self.retry_delay_sec)
+        smoke = self.smoke_load_test(live_url) if success and self.smoke_load is not None else None
+        if smoke is not None and not smoke["passed"]:
+            print(f"❌ Smoke load failed: {smoke['violations']}. Triggering rollback.")
+            return {
+                "verified": False,
+                "status": "failed",
+                "attempts": attempt,
+                "latency": latency,
+                "smoke_load": smoke,
+                "failure_reason": f"Smoke load thresholds breached: {smoke['violations']}. Rollback triggered."
+            }
             
         if success:
             print("✅ Post-deployment verification passed.")
-            return {"verified": True, "status": "deployed"}
+            result = {"verified": True, "status": "deployed", "attempts": attempt,
+                      "flagged": bool(latency["slo_violations"]), "latency": latency}
+            if smoke is not None:
+                result["smoke_load"] = smoke
+            return result
         else:
-            failures = [ep for ep, is_ok in [
-                ("Live_Base", base_ok), 
-                ("System_Health", sys_health_ok), 
-                ("Database_Migrations", db_health_ok), 
-                ("JWT_Auth_Pipeline", auth_health_ok)
-            ] if not is_ok]
+            failures = [ep for ep in endpoints if ep not in passed]
             
             print(f"❌ Post-deployment verification failed on: {failures}. Triggering rollback.")
             # Trigger rollback logic here
+            reason = f"Non-retryable failure ({fatal})" if fatal else "Functional endpoints timed out"
             return {
                 "verified": False,
                 "status": "failed",
-                "failure_reason": f"Functional endpoints timed out: {failures}. Rollback triggered."
+                "attempts": attempt,
+                "latency": latency,
+                "failure_reason": f"{reason}: {failures}. Rollback triggered."
             }
@@ -0,0 +1,214 @@
+import http.client
+import json
+import socket
+import threading
+import time
+from typing import Dict, Any, Optional, Iterable, Iterator, Callable, List
+from urllib.parse import urlencode, quote
+
+class UnixSocketHTTPConnection(http.client.HTTPConnection):
+    """
+    HTTPConnection that dials the Docker daemon over its Unix socket instead of TCP.
+    """
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class DockerEngineError(Exception):
+    """Raised when the Docker Engine API answers with a non-2xx status."""
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Docker Engine API error {status}: {message}")
+        self.status = status
+
+
+class BuildCancelledError(Exception):
+    """Raised when a build is abandoned on request (e.g. a sibling component failed)."""
+
+
+class DockerEngineClient:
+    """
+    Minimal Docker Engine API client speaking HTTP/1.1 over /var/run/docker.sock.
+    Each thread keeps its own keep-alive connection, reused across calls, so
+    sandbox operations no longer pay a `docker` CLI fork per step and a long
+    /wait in one thread never blocks concurrent containers.
+    """
+
+    API_VERSION = "v1.41"
+
+    def __init__(self, socket_path: str = "/var/run/docker.sock", timeout_sec: float = 60):
+        self.socket_path = socket_path
+        self.timeout_sec = timeout_sec
+        self._local = threading.local()
+
+    def _connection(self, timeout: Optional[float]) -> UnixSocketHTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = UnixSocketHTTPConnection(self.socket_path, timeout=self.timeout_sec)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn
+
+    def _discard_connection(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def close(self) -> None:
+        """Closes the calling thread's connection."""
+        self._discard_connection()
+
+    def _request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                 body: Any = None, headers: Optional[Dict[str, str]] = None,
+                 timeout: Optional[float] = None, consumer: Optional[Callable] = None) -> Any:
+        """
+        Issues one request on the shared connection.
+        If `consumer` is given it receives the open response (for streaming bodies),
+        otherwise the full body is read and JSON-decoded when possible.
+        """
+        url = f"/{self.API_VERSION}{path}"
+        if params:
+            url += "?" + urlencode(params)
+        headers = dict(headers or {})
+        chunked = body is not None and not isinstance(body, (bytes, str))
+        if chunked:
+            headers["Transfer-Encoding"] = "chunked"
+
+        # One reconnect attempt covers a keep-alive socket the daemon already closed
+        for attempt in range(2):
+            conn = self._connection(timeout if timeout is not None else self.timeout_sec)
+            try:
+                conn.request(method, url, body=body, headers=headers, encode_chunked=chunked)
+                response = conn.getresponse()
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self._discard_connection()
+                if attempt == 1 or chunked:
+                    raise
+            except BaseException:
+                # Anything else (e.g. a socket timeout waiting for the answer) leaves the connection
+                # mid-request; the next call must start on a fresh one
+                self._discard_connection()
+                raise
+        try:
+            if response.status >= 400:
+                raise DockerEngineError(response.status, response.read().decode("utf-8", "replace"))
+            if consumer is not None:
+                consumed = consumer(response)
+                # Drain whatever the consumer left so the connection can be reused
+                response.read()
+                return consumed
+            raw = response.read()
+            if response.getheader("Content-Type", "").startswith("application/json") and raw:
+                return json.loads(raw)
+            return raw
+        except BaseException:
+            # A half-read response poisons the keep-alive connection
+            self._discard_connection()
+            raise
+
+    @staticmethod
+    def _iter_json_stream(response, deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Decodes the newline-delimited JSON progress stream returned by /build."""
+        decoder = json.JSONDecoder()
+        buffer = ""
+        while True:
+            if deadline is not None and time.time() > deadline:
+                raise TimeoutError("Docker Engine build stream exceeded its deadline.")
+            line = response.readline()
+            if not line:
+                break
+            buffer += line.decode("utf-8", "replace")
+            buffer = buffer.lstrip()
+            while buffer:
+                try:
+                    event, end = decoder.raw_decode(buffer)
+                except json.JSONDecodeError:
+                    break
+                buffer = buffer[end:].lstrip()
+                yield event
+
+    def build(self, context_chunks: Iterable[bytes], tag: str, timeout_sec: float,
+              on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+              network: Optional[str] = None, cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        POST /build with a tar context streamed as the chunked request body.
+        Every decoded progress event is handed to `on_progress` as it arrives.
+        Setting `cancel_event` drops the connection, which makes the daemon abort the build.
+        """
+        deadline = time.time() + timeout_sec
+        log_lines: List[str] = []
+        error: Optional[str] = None
+
+        def consume(response):
+            nonlocal error
+            for event in self._iter_json_stream(response, deadline):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise BuildCancelledError(f"Build of {tag} cancelled.")
+                if on_progress:
+                    on_progress(event)
+                if "error" in event:
+                    error = event.get("error") or event.get("errorDetail", {}).get("message", "")
+                    log_lines.append(error)
+                elif event.get("stream"):
+                    log_lines.append(event["stream"].rstrip("\n"))
+
+        params = {"t": tag, "rm": 1, "forcerm": 1}
+        if network:
+            params["networkmode"] = network
+        self._request(
+            "POST", "/build",
+            params=params,
+            body=iter(context_chunks),
+            headers={"Content-Type": "application/x-tar"},
+            timeout=timeout_sec,
+            consumer=consume,
+        )
+        return {"error": error, "log": "\n".join(log_lines)}
+
+    def create_container(self, image: str, cmd: List[str], host_config: Dict[str, Any]) -> str:
+        payload = json.dumps({"Image": image, "Cmd": cmd, "HostConfig": host_config})
+        created = self._request("POST", "/containers/create", body=payload, headers={"Content-Type": "application/json"})
+        return created["Id"]
+
+    def start_container(self, container_id: str) -> None:
+        self._request("POST", f"/containers/{quote(container_id)}/start")
+
+    def wait_container(self, container_id: str, timeout_sec: float) -> Dict[str, Any]:
+        return self._request("POST", f"/containers/{quote(container_id)}/wait", timeout=timeout_sec)
+
+    def kill_container(self, container_id: str) -> None:
+        try:
+            self._request("POST", f"/containers/{quote(container_id)}/kill")
+        except (DockerEngineError, OSError):
+            # Already exited (409) or gone
+            pass
+
+    def container_logs(self, container_id: str) -> Dict[str, str]:
+        """Fetches stdout/stderr, demultiplexing Docker's 8-byte frame headers."""
+        raw = self._request("GET", f"/containers/{quote(container_id)}/logs", params={"stdout": 1, "stderr": 1})
+        streams = {1: [], 2: []}
+        offset = 0
+        while offset + 8 <= len(raw):
+            stream_type = raw[offset]
+            size = int.from_bytes(raw[offset + 4:offset + 8], "big")
+            streams.setdefault(stream_type, []).append(raw[offset + 8:offset + 8 + size])
+            offset += 8 + size
+        return {
+            "stdout": b"".join(streams[1]).decode("utf-8", "replace"),
+            "stderr": b"".join(streams[2]).decode("utf-8", "replace"),
+        }
+
+    def remove_container(self, container_id: str) -> None:
+        try:
+            self._request("DELETE", f"/containers/{quote(container_id)}", params={"force": 1})
+        except (DockerEngineError, OSError):
+            pass
@@ -0,0 +1,126 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from fake_backend import FakeDockerBackend
+from docker_sandbox import DockerSandbox
+from deployment_gatekeeper import DeploymentGatekeeper
+from patch_debugger import PatchDebugEngine
+from build_timeline import BuildTimelineAggregator
+
+class ReplayDebugAgent:
+    """Debug agent stand-in that cycles through canned LLM responses."""
+
+    DEFAULT_RESPONSES = [
+        "not json at all",
+        '```json\n{"file_path": "src/app.ts", "patch_type": "replace", "updated_content": "export const ok = true;"}\n```',
+    ]
+
+    def __init__(self, responses: Optional[List[str]] = None):
+        self.responses = responses or self.DEFAULT_RESPONSES
+        self._cursor = 0
+
+    def run(self, *args, **kwargs) -> str:
+        response = self.responses[self._cursor % len(self.responses)]
+        self._cursor += 1
+        return response
+
+
+def _measure(label: str, iterations: int, workers: int, fn) -> Dict[str, Any]:
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(lambda i: fn(i), range(iterations)))
+    elapsed = time.perf_counter() - start_time
+    return {
+        "stage": label,
+        "iterations": iterations,
+        "workers": workers,
+        "elapsed_sec": round(elapsed, 4),
+        "ops_per_sec": round(iterations / elapsed, 1) if elapsed else None,
+        "success_rate": round(sum(1 for ok in outcomes if ok) / iterations, 4) if iterations else None,
+    }
+
+def run_benchmark(project_path: str, iterations: int = 1000, workers: int = 1,
+                  backend: Optional[FakeDockerBackend] = None,
+                  min_run_duration_sec: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Measures orchestration overhead with a fake backend: the sandbox pipeline,
+    the pre-deployment gate and the patch debug loop (backoff disabled).
+    The gate sees the run duration the sandbox really measured; without sleeping that
+    is near zero, so its crash threshold defaults to 0 unless `min_run_duration_sec` is given.
+    """
+    backend = backend or FakeDockerBackend(sleep=False, run_latency_sec=1.5)
+    aggregator = BuildTimelineAggregator()
+    gatekeeper = DeploymentGatekeeper("benchmark")
+    if min_run_duration_sec is not None:
+        gatekeeper.min_run_duration_sec = min_run_duration_sec
+    elif not backend.sleep:
+        gatekeeper.min_run_duration_sec = 0.0
+    results = []
+
+    # Engine prints are part of normal operation but would dominate the measurement
+    with contextlib.redirect_stdout(io.StringIO()):
+        def sandbox_pipeline(_):
+            sandbox = DockerSandbox(project_path, backend=backend, timeline_aggregator=aggregator)
+            return sandbox.full_validation_pipeline()["success"]
+        results.append(_measure("sandbox_pipeline", iterations, workers, sandbox_pipeline))
+
+        sandbox_result = DockerSandbox(project_path, backend=backend, timeline_aggregator=aggregator).full_validation_pipeline()
+        results.append(_measure("pre_deployment_validation", iterations, workers,
+                                lambda _: gatekeeper.pre_deployment_validation(sandbox_result)["approved"]))
+
+        def debug_loop(_):
+            engine = PatchDebugEngine(ReplayDebugAgent())
+            engine.base_backoff_sec = 0
+            return engine.debug_file("src/app.ts", "export const ok =", "export const ok =", "TS1109: Expression expected.") is not None
+        results.append(_measure("debug_loop", iterations, workers, debug_loop))
+
+    return {
+        "stages": results,
+        "backend": dict(backend.counters),
+        "gate": {
+            "min_run_duration_sec": gatekeeper.min_run_duration_sec,
+            "run_duration_sec": sandbox_result["telemetry"].get("run_metrics", {}).get("run_duration_sec"),
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the engine orchestration layer against a fake container backend.")
+    parser.add_argument("--project", help="Project directory (defaults to a minimal generated one)")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--fixtures", help="Recorded build/run outcomes (RecordingBackend JSON)")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--oom-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sleep", action="store_true", help="Really wait for the simulated latency")
+    parser.add_argument("--min-run-duration", type=float, default=None,
+                        help="Gate crash threshold in seconds (default: the gatekeeper's, or 0 without --sleep)")
+    args = parser.parse_args(argv)
+
+    backend = FakeDockerBackend(fixtures=args.fixtures, run_latency_sec=1.5, failure_rate=args.failure_rate,
+                                oom_rate=args.oom_rate, seed=args.seed, sleep=args.sleep)
+    with tempfile.TemporaryDirectory(prefix="engine-bench-") as scratch:
+        project_path = args.project
+        if project_path is None:
+            project_path = scratch
+            with open(os.path.join(scratch, "Dockerfile"), "w", encoding="utf-8") as f:
+                f.write("FROM node:20-alpine\nCOPY . .\nRUN npm ci && npm run build\n")
+            with open(os.path.join(scratch, "package.json"), "w", encoding="utf-8") as f:
+                f.write('{"name": "bench", "scripts": {"build": "tsc", "test": "jest"}}\n')
+        report = run_benchmark(project_path, args.iterations, args.workers, backend, args.min_run_duration)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
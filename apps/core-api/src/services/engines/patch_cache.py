@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable
+
+class PatchCache:
+    """
+    Reuses validated patches across projects generated from the same template.
+
+    Entries are keyed by the ErrorClassifier fingerprint plus digests of the
+    normalized source (line endings, trailing whitespace and trailing blank lines
+    do not matter), the normalized error log and the failing line: fingerprints
+    alone are too coarse (e.g. every ClassNotFoundException shares one), so the
+    log decides which error a patch fixes. A patch is stored unconfirmed and
+    only served once confirm() records that the sandbox rebuild succeeded with
+    it. Before a cached patch is served it must still apply to the caller's
+    source; stale entries are dropped. Bounded LRU, optionally persisted as JSON.
+    """
+
+    # Run-specific noise removed from error logs before they are hashed
+    LOG_NOISE = [
+        re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"),  # timestamps
+        re.compile(r"\b\d+(?:\.\d+)?\s?(?:ms|s|sec|seconds)\b"),  # durations
+        re.compile(r"\b(?:0x)?[0-9a-f]{12,}\b"),  # container ids, digests, addresses
+        re.compile(r"(?:/tmp|/var/folders)/[^\s:'\"]*"),  # sandbox temp paths
+    ]
+
+    def __init__(self, max_entries: int = 5000, state_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "stores": 0, "confirmations": 0, "invalidations": 0}
+        if state_path and os.path.isfile(state_path):
+            with open(state_path, "r", encoding="utf-8") as f:
+                self._entries = OrderedDict(json.load(f))
+
+    @staticmethod
+    def normalize_source(source_code: str) -> str:
+        lines = [line.rstrip() for line in source_code.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+        while lines and not lines[-1]:
+            lines.pop()
+        return "\n".join(lines)
+
+    @classmethod
+    def source_digest(cls, source_code: str) -> str:
+        return hashlib.sha256(cls.normalize_source(source_code).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def normalize_error_log(cls, error_log: str) -> str:
+        for pattern in cls.LOG_NOISE:
+            error_log = pattern.sub("", error_log)
+        return "\n".join(" ".join(line.split()) for line in error_log.splitlines() if line.strip())
+
+    @classmethod
+    def make_key(cls, classification: Dict[str, Any], source_code: str, error_log: str, failing_line: str = "") -> str:
+        parts = [classification["error_hash"], cls.source_digest(source_code),
+                 cls.source_digest(cls.normalize_error_log(error_log)), failing_line.strip()]
+        return hashlib.sha256(":".join(parts).encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str, file_path: str, source_code: str,
+               applies: Callable[[Dict[str, Any], str], bool]) -> Optional[Dict[str, Any]]:
+        """Returns a copy of the confirmed cached patch retargeted at `file_path`, if it still applies."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry.get("confirmed"):
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+        patch = dict(entry["patch"], file_path=file_path)
+        if not applies(patch, source_code):
+            with self._lock:
+                self._entries.pop(key, None)
+                self.stats["stale"] += 1
+                self.stats["misses"] += 1
+            return None
+        with self._lock:
+            entry["hits"] = entry.get("hits", 0) + 1
+            entry["last_hit_at"] = time.time()
+            self.stats["hits"] += 1
+        return patch
+
+    def store(self, key: str, patch: Dict[str, Any], category: str) -> None:
+        """Records a patch that passed local validation; it is not served until confirm()."""
+        with self._lock:
+            self._entries[key] = {"patch": patch, "category": category, "stored_at": time.time(), "hits": 0,
+                                  "confirmed": False}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.stats["stores"] += 1
+            self._save()
+
+    def confirm(self, key: str) -> bool:
+        """Marks an entry as verified by a successful sandbox rebuild; False if there is none."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            if not entry["confirmed"]:
+                entry["confirmed"] = True
+                entry["confirmed_at"] = time.time()
+                self.stats["confirmations"] += 1
+                self._save()
+            return True
+
+    def invalidate(self, key: str) -> None:
+        """Drops an entry whose patch was later rejected (e.g. the sandbox build still failed)."""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.stats["invalidations"] += 1
+                self._save()
+
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return round(self.stats["hits"] / lookups, 4) if lookups else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            confirmed = sum(1 for entry in self._entries.values() if entry.get("confirmed"))
+            return {**self.stats, "entries": len(self._entries), "confirmed_entries": confirmed,
+                    "hit_rate": self.hit_rate()}
+
+    def _save(self) -> None:
+        if not self.state_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.state_path)
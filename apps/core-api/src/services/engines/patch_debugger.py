@@ -1,9 +1,21 @@
+import asyncio
 import json
+import threading
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 import os
 import sys
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from error_classifier import ErrorClassifier
+from patch_cache import PatchCache
+from context_minimizer import ContextMinimizer
+from syntax_precheck import SyntaxPrecheck
+from compile_precheck import IncrementalCompilePrecheck
+from hunk_patch import HunkPatchApplier
+from debug_metrics import MetricsSink
+from streaming_patch_validator import StreamingPatchValidator
+
 # Assume agent.py provides `BaseAgent`
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 try:
@@ -14,66 +26,689 @@ except ImportError:
         def __init__(self, *args, **kwargs): pass
         def run(self, *args, **kwargs): return "{}"
 
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for budgeting before the provider reports usage."""
+    return max(1, len(text) // 4)
+
+
+class TokenBudget:
+    """
+    Token allowance shared by concurrent debug requests of one debug round.
+    A call reserves its prompt plus an estimated completion before it starts,
+    so concurrent calls cannot jointly overrun the budget; once the call has
+    returned, settle() replaces the estimate with the actual usage.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None):
+        self.max_tokens = max_tokens
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def try_reserve(self, tokens: int) -> bool:
+        with self._lock:
+            if self.max_tokens is not None and self.used + tokens > self.max_tokens:
+                return False
+            self.used += tokens
+            return True
+
+    def charge(self, tokens: int) -> None:
+        with self._lock:
+            self.used += tokens
+
+    def settle(self, reserved: int, actual: int) -> None:
+        """Corrects a reservation to the tokens the call actually used."""
+        with self._lock:
+            self.used += actual - reserved
+
+    @property
+    def remaining(self) -> Optional[int]:
+        return None if self.max_tokens is None else max(0, self.max_tokens - self.used)
+
+
 class PatchDebugEngine:
     """
     Patch-Based Debug Engine.
     Ensures the Debug Agent NEVER regenerates an entire project.
     Enforces strict file-level patching with exponential backoff.
+    Agents exposing `stream(payload)` are validated token by token and
+    cancelled as soon as the answer breaks the patch contract.
     """
-    def __init__(self, debug_agent: BaseAgent):
+
+    PATCH_TYPES = ("replace", "insert", "delete", "hunk")
+    INSTRUCTION = "Output STRICTLY JSON payload. DO NOT output full project. ONLY output the fix for the given file."
+    # Hunk patches keep output tokens proportional to the change instead of the file size
+    HUNK_INSTRUCTION = ("Prefer patch_type 'hunk' for small fixes: updated_content is then a unified diff "
+                        "(@@ headers with file line numbers, 2 lines of context) against the file.")
+    # Completion reserved per call on top of the answer's expected size (JSON keys, explanation)
+    COMPLETION_OVERHEAD_TOKENS = 64
+    # Speculative mode: sampling settings of the concurrent candidates
+    SPECULATIVE_TEMPERATURES = (0.0, 0.4, 0.8, 1.0)
+
+    def __init__(self, debug_agent: BaseAgent, patch_cache: Optional[PatchCache] = None,
+                 classifier: Optional[ErrorClassifier] = None, context_minimizer: Optional[ContextMinimizer] = None,
+                 compile_precheck: Optional[IncrementalCompilePrecheck] = None, metrics_sink: Optional[MetricsSink] = None):
         self.debug_agent = debug_agent
         self.max_retries = 3
         self.base_backoff_sec = 2
+        # Optional: serve repeat failures (same error + source) without an LLM call, once a
+        # patch was confirmed by a sandbox rebuild (see confirm_cached_patch)
+        self.patch_cache = patch_cache
+        self.classifier = classifier or ErrorClassifier()
+        # Optional: send the enclosing scope of the failing line instead of the whole file
+        self.context_minimizer = context_minimizer
+        self.syntax_precheck = SyntaxPrecheck()
+        self.hunk_applier = HunkPatchApplier()
+        # Optional: compile the patched file in a warm toolchain worker before the sandbox rebuild
+        self.compile_precheck = compile_precheck
+        # Optional: one structured record per LLM call (tokens, TTFT, latency, outcome, backoff)
+        self.metrics_sink = metrics_sink
+        self.speculation_stats = {"rounds": 0, "candidates": 0, "rejected": 0, "cancelled": 0, "superseded": 0, "wins": {}}
+        # Guards the hand-off of losing speculative candidates' probes between the loop and worker threads
+        self._probe_lock = threading.Lock()
 
     def _validate_patch(self, patch_data: dict) -> bool:
         """Validates that the output matches the strict patch contract."""
         required_keys = {"file_path", "patch_type", "updated_content"}
         if not required_keys.issubset(patch_data.keys()):
             return False
-        if patch_data["patch_type"] not in ["replace", "insert", "delete"]:
+        if patch_data["patch_type"] not in self.PATCH_TYPES:
             return False
         return True
 
+    def _patch_applies(self, patch_data: dict, source_code: str, failing_line: str = "") -> bool:
+        """Cheap check that a (cached) patch still targets this source."""
+        if not self._validate_patch(patch_data):
+            return False
+        if failing_line.strip() and failing_line.strip() not in source_code:
+            return False
+        # A full-content patch identical to the current source would be a no-op
+        if patch_data["patch_type"] == "replace":
+            return PatchCache.normalize_source(patch_data["updated_content"]) != PatchCache.normalize_source(source_code)
+        return True
+
+    def _cache_key(self, source_code: str, error_log: str, failing_line: str = "") -> Optional[tuple]:
+        if self.patch_cache is None:
+            return None
+        classification = self.classifier.classify(error_log)
+        return PatchCache.make_key(classification, source_code, error_log, failing_line), classification["category"]
+
+    def _cache_lookup(self, cache_key: Optional[tuple], file_path: str, failing_line: str, source_code: str) -> Optional[dict]:
+        if cache_key is None:
+            return None
+        patch = self.patch_cache.lookup(cache_key[0], file_path, source_code,
+                                        lambda p, src: self._patch_applies(p, src, failing_line))
+        if patch is not None:
+            print(f"♻️ Reusing cached patch for {file_path} (hit rate {self.patch_cache.hit_rate():.0%}).")
+        return patch
+
+    def _cache_store(self, cache_key: Optional[tuple], patch_data: dict) -> None:
+        if cache_key is not None:
+            self.patch_cache.store(cache_key[0], patch_data, cache_key[1])
+
+    def confirm_cached_patch(self, source_code: str, error_log: str, failing_line: str = "") -> None:
+        """Call once the sandbox rebuild succeeded with a returned patch; only confirmed patches are served again."""
+        cache_key = self._cache_key(source_code, error_log, failing_line)
+        if cache_key is not None:
+            self.patch_cache.confirm(cache_key[0])
+
+    def invalidate_cached_patch(self, source_code: str, error_log: str, failing_line: str = "") -> None:
+        """Call when a returned patch failed the sandbox rebuild, so it is never served again."""
+        cache_key = self._cache_key(source_code, error_log, failing_line)
+        if cache_key is not None:
+            self.patch_cache.invalidate(cache_key[0])
+
+    def _minimize_context(self, file_path: str, failing_line: str, source_code: str, error_log: str) -> Optional[Dict[str, Any]]:
+        if self.context_minimizer is None:
+            return None
+        context = self.context_minimizer.minimize(file_path, failing_line, source_code, error_log)
+        stats = context["stats"]
+        print(f"✂️ Context for {file_path}: {stats['bytes_in']}B -> {stats['bytes_out']}B "
+              f"(saved {stats['bytes_saved']}B per call, window {stats['window']})")
+        return context
+
+    def _build_payload(self, file_path: str, failing_line: str, source_code: str, error_log: str,
+                       context: Optional[Dict[str, Any]] = None) -> str:
+        if context is None or context["window"] is None:
+            return json.dumps({
+                "instruction": f"{self.INSTRUCTION} {self.HUNK_INSTRUCTION}",
+                "file_path": file_path,
+                "failing_line": failing_line,
+                "relevant_code_snippet": source_code if context is None else context["snippet"],
+                "error_log": error_log if context is None else context["error_log"]
+            })
+        start, end = context["window"]
+        return json.dumps({
+            "instruction": (f"{self.INSTRUCTION} {self.HUNK_INSTRUCTION} "
+                            f"relevant_code_snippet is lines {start}-{end} of the file; for every patch_type except "
+                            "'hunk', updated_content must replace exactly those lines. surrounding_context is read-only."),
+            "file_path": file_path,
+            "failing_line": failing_line,
+            "relevant_code_snippet": context["snippet"],
+            "snippet_lines": [start, end],
+            "surrounding_context": context["outline"],
+            "error_log": context["error_log"]
+        })
+
+    def _expand_patch(self, patch_data: dict, source_code: str, context: Optional[Dict[str, Any]]) -> Optional[dict]:
+        """
+        Turns an answer into full-file content: a 'hunk' diff is applied to the
+        source; any other answer for an excerpt is the excerpt's new text
+        (whether the edit replaced, inserted or deleted lines) and is spliced
+        into the file at the window it was cut from.
+        Hunk patches come back as 'replace' patches (diff kept under "hunks") so
+        consumers and the patch cache only ever see full content. None if a hunk conflicts.
+        """
+        if patch_data["patch_type"] == "hunk":
+            result = self.hunk_applier.apply(source_code, patch_data["updated_content"])
+            if not result["applied"]:
+                conflicts = ", ".join(f"hunk {c['hunk']} near line {c.get('expected_line')}: {c['reason']}"
+                                      for c in result["conflicts"])
+                print(f"❌ Hunk patch for {patch_data['file_path']} does not apply ({conflicts}). Retrying.")
+                return None
+            print(f"🧩 Applied {result['hunks']} hunk(s) to {patch_data['file_path']} (offsets {result['offsets']})")
+            return dict(patch_data, patch_type="replace", updated_content=result["content"],
+                        hunks=patch_data["updated_content"])
+        if context is None or context["window"] is None:
+            return patch_data
+        return dict(patch_data, updated_content=ContextMinimizer.splice(source_code, context["window"], patch_data["updated_content"]))
+
+    def _parse_patch(self, output_json_str: str, probe: Optional[Dict[str, Any]] = None) -> Optional[dict]:
+        """Extracts and validates the patch from a raw LLM answer; None if unusable."""
+        # Defensive JSON extraction in case LLM wraps it in markdown blocks
+        if "```json" in output_json_str:
+             output_json_str = output_json_str.split("```json")[1].split("```")[0].strip()
+        elif "```" in output_json_str:
+             output_json_str = output_json_str.split("```")[1].split("```")[0].strip()
+             
+        try:
+            patch_data = json.loads(output_json_str)
+            if isinstance(patch_data, dict) and self._validate_patch(patch_data):
+                return patch_data
+            print("❌ LLM returned invalid patch structure. Retrying.")
+            self._set_outcome(probe, "invalid_patch")
+        except json.JSONDecodeError:
+            print("❌ LLM returned malformed JSON. Retrying.")
+            self._set_outcome(probe, "malformed_json")
+        return None
+
+    def _generate(self, input_payload: str, agent: Optional[BaseAgent] = None, options: Optional[Dict[str, Any]] = None,
+                  cancel_event: Optional[threading.Event] = None, probe: Optional[Dict[str, Any]] = None) -> tuple:
+        """
+        Calls the agent. Streaming agents are fed through a StreamingPatchValidator
+        and the stream is closed (cancelling generation) at the first contract
+        violation, once the patch object is complete, or when `cancel_event` is set.
+        `options` (e.g. temperature) are passed to the agent as keyword arguments.
+        Returns (text, validator or None). Timings go into `probe` when given.
+        """
+        agent = agent or self.debug_agent
+        options = options or {}
+        stream = getattr(agent, "stream", None)
+        if not callable(stream):
+            output = agent.run(input_payload, **options)
+            if probe is not None:
+                probe["llm_done_at"] = time.perf_counter()
+            return output, None
+
+        validator = StreamingPatchValidator(patch_types=set(self.PATCH_TYPES))
+        parts = []
+        chunks = stream(input_payload, **options)
+        try:
+            for chunk in chunks:
+                if probe is not None and "first_token_at" not in probe:
+                    probe["first_token_at"] = time.perf_counter()
+                parts.append(chunk)
+                if validator.feed(chunk) in ("invalid", "complete"):
+                    break
+                if cancel_event is not None and cancel_event.is_set():
+                    return "".join(parts), validator
+        finally:
+            # Closing the generator lets the provider client abort the HTTP stream
+            if hasattr(chunks, "close"):
+                chunks.close()
+            if probe is not None:
+                probe["llm_done_at"] = time.perf_counter()
+        validator.finish()
+        if validator.state == "invalid":
+            print(f"✂️ Generation cancelled early: {validator.reason}")
+        return "".join(parts), validator
+
+    def _patch_from_output(self, output: str, validator: Optional[StreamingPatchValidator],
+                           probe: Optional[Dict[str, Any]] = None) -> Optional[dict]:
+        if validator is None:
+            return self._parse_patch(output, probe)
+        if validator.state != "complete":
+            print("❌ LLM returned malformed JSON. Retrying.")
+            self._set_outcome(probe, "stream_cancelled" if validator.state == "invalid" else "malformed_json")
+            return None
+        patch_data = validator.patch
+        if not self._validate_patch(patch_data):
+            print("❌ LLM returned invalid patch structure. Retrying.")
+            self._set_outcome(probe, "invalid_patch")
+            return None
+        return patch_data
+
+    def _finalize_attempt(self, output: str, validator: Optional[StreamingPatchValidator], probe: Optional[Dict[str, Any]],
+                          source_code: str, failing_line: str, context: Optional[Dict[str, Any]],
+                          cache_key: Optional[tuple], precheck: bool = False) -> Optional[dict]:
+        """
+        Turns one model answer into an accepted full-file patch: parse, expand
+        (hunk / excerpt splice), optional local pre-check, compile pre-check.
+        On success the attempt is recorded and the patch cached; on failure the
+        outcome is set on `probe` and None returned (the caller records the
+        attempt together with its backoff).
+        """
+        patch_data = self._patch_from_output(output, validator, probe)
+        if patch_data is None:
+            return None
+        label = patch_data["file_path"]
+        patch_data = self._expand_patch(patch_data, source_code, context)
+        if patch_data is None:
+            self._set_outcome(probe, "hunk_conflict")
+            return None
+        reason = self._precheck(patch_data, source_code, failing_line) if precheck else None
+        if reason is not None:
+            print(f"❌ Patch for {label} rejected by pre-check: {reason}")
+            self._set_outcome(probe, "precheck_failed")
+            return None
+        reason = self._compile_check(patch_data)
+        if reason is not None:
+            print(f"❌ Patch for {label} rejected by compile pre-check: {reason}")
+            self._set_outcome(probe, "compile_failed")
+            return None
+        self._finish_attempt(probe, output)
+        self._cache_store(cache_key, patch_data)
+        return patch_data
+
+    # --- Per-attempt metrics ---------------------------------------------
+
+    @staticmethod
+    def _set_outcome(probe: Optional[Dict[str, Any]], outcome: str) -> None:
+        if probe is not None:
+            probe["outcome"] = outcome
+
+    @staticmethod
+    def _provider_name(agent: Any) -> str:
+        return getattr(agent, "name", type(agent).__name__)
+
+    def _start_attempt(self, file_path: str, attempt: int, mode: str, input_payload: str, error_category: Optional[str],
+                       agent: Optional[BaseAgent] = None, options: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Probe dict the attempt's helpers fill in; None (no bookkeeping) without a metrics sink."""
+        if self.metrics_sink is None:
+            return None
+        agent = agent or self.debug_agent
+        return {"file_path": file_path, "attempt": attempt, "mode": mode, "agent": agent,
+                "provider": self._provider_name(agent), "options": options or {}, "error_category": error_category,
+                "prompt_tokens": estimate_tokens(input_payload), "started_at": time.perf_counter(), "outcome": "patched"}
+
+    def _finish_attempt(self, probe: Optional[Dict[str, Any]], output: str, backoff_sec: float = 0.0) -> None:
+        if probe is None or probe.get("emitted"):
+            return
+        probe["emitted"] = True
+        now = time.perf_counter()
+        llm_done_at = probe.get("llm_done_at", now)
+        record = {
+            "ts": time.time(),
+            "file_path": probe["file_path"],
+            "attempt": probe["attempt"],
+            "mode": probe["mode"],
+            "provider": probe["provider"],
+            "options": probe["options"],
+            "error_category": probe["error_category"],
+            "prompt_tokens": probe["prompt_tokens"],
+            "completion_tokens": estimate_tokens(output) if output else 0,
+            "token_source": "estimate",
+            "ttft_ms": round((probe["first_token_at"] - probe["started_at"]) * 1000, 1) if "first_token_at" in probe else None,
+            "latency_ms": round((llm_done_at - probe["started_at"]) * 1000, 1),
+            "validation_ms": round((now - llm_done_at) * 1000, 1),
+            "outcome": probe["outcome"],
+            "backoff_sec": backoff_sec,
+        }
+        # Agents that report provider usage (e.g. {"prompt_tokens": .., "completion_tokens": ..}) replace the estimate
+        usage = getattr(probe["agent"], "last_usage", None)
+        if isinstance(usage, dict) and "completion_tokens" in usage:
+            record.update(prompt_tokens=usage.get("prompt_tokens", record["prompt_tokens"]),
+                          completion_tokens=usage["completion_tokens"], token_source="provider")
+        try:
+            self.metrics_sink.emit(record)
+        except Exception as e:
+            # Metrics must never break a debug round
+            print(f"⚠️ Metrics sink failed: {e}")
+
+    def _error_category(self, error_log: str) -> Optional[str]:
+        if self.metrics_sink is None:
+            return None
+        return self.classifier.classify(error_log)["category"]
+
     def debug_file(self, file_path: str, failing_line: str, source_code: str, error_log: str) -> Optional[Dict[str, str]]:
         """
         Sends specific isolated context to the debug agent.
         Requires narrow context to prevent hallucinations.
         """
-        input_payload = json.dumps({
-            "instruction": "Output STRICTLY JSON payload. DO NOT output full project. ONLY output the fix for the given file.",
-            "file_path": file_path,
-            "failing_line": failing_line,
-            "relevant_code_snippet": source_code,
-            "error_log": error_log
-        })
+        cache_key = self._cache_key(source_code, error_log, failing_line)
+        cached = self._cache_lookup(cache_key, file_path, failing_line, source_code)
+        if cached is not None:
+            return cached
+        context = self._minimize_context(file_path, failing_line, source_code, error_log)
+        input_payload = self._build_payload(file_path, failing_line, source_code, error_log, context)
+        error_category = self._error_category(error_log)
         
         for attempt in range(self.max_retries):
             print(f"Debug Attempt {attempt + 1}/{self.max_retries} for {file_path}")
+            probe = self._start_attempt(file_path, attempt + 1, "sequential", input_payload, error_category)
             
-            output_json_str = self.debug_agent.run(input_payload)
+            output_json_str, validator = self._generate(input_payload, probe=probe)
             
-            # Defensive JSON extraction in case LLM wraps it in markdown blocks
-            if "```json" in output_json_str:
-                 output_json_str = output_json_str.split("```json")[1].split("```")[0].strip()
-            elif "```" in output_json_str:
-                 output_json_str = output_json_str.split("```")[1].split("```")[0].strip()
-                 
-            try:
-                patch_data = json.loads(output_json_str)
-                if self._validate_patch(patch_data):
-                    print(f"✅ Valid patch received on attempt {attempt + 1}")
-                    # In a real run, telemetry goes to Supabase here
-                    return patch_data
-                else:
-                    print("❌ LLM returned invalid patch structure. Retrying.")
-            except json.JSONDecodeError:
-                print("❌ LLM returned malformed JSON. Retrying.")
+            patch_data = self._finalize_attempt(output_json_str, validator, probe, source_code, failing_line,
+                                                context, cache_key)
+            if patch_data is not None:
+                print(f"✅ Valid patch received on attempt {attempt + 1}")
+                return patch_data
             
             # Exponential backoff
-            if attempt < self.max_retries - 1:
-                sleep_time = self.base_backoff_sec * (2 ** attempt)
+            sleep_time = self.base_backoff_sec * (2 ** attempt) if attempt < self.max_retries - 1 else 0
+            self._finish_attempt(probe, output_json_str, sleep_time)
+            if sleep_time:
                 print(f"Applying backoff for {sleep_time}s...")
                 time.sleep(sleep_time)
                 
         print("🚨 Max retries exceeded. Debug failed.")
         return None
+
+    async def _run_agent_async(self, input_payload: str, agent: Optional[BaseAgent] = None,
+                               options: Optional[Dict[str, Any]] = None,
+                               cancel_event: Optional[threading.Event] = None,
+                               probe: Optional[Dict[str, Any]] = None) -> tuple:
+        # Agents may expose a native coroutine; blocking/streaming ones run in a worker thread
+        agent = agent or self.debug_agent
+        if hasattr(agent, "arun"):
+            output = await agent.arun(input_payload, **(options or {}))
+            if probe is not None:
+                probe["llm_done_at"] = time.perf_counter()
+            return output, None
+        return await asyncio.to_thread(self._generate, input_payload, agent, options, cancel_event, probe)
+
+    async def _debug_file_async(self, request: Dict[str, str], semaphore: asyncio.Semaphore,
+                                budget: TokenBudget) -> Dict[str, Any]:
+        file_path = request["file_path"]
+        cache_key = self._cache_key(request.get("source_code", ""), request.get("error_log", ""),
+                                    request.get("failing_line", ""))
+        cached = self._cache_lookup(cache_key, file_path, request.get("failing_line", ""), request.get("source_code", ""))
+        if cached is not None:
+            return {"file_path": file_path, "status": "cached", "patch": cached, "attempts": 0, "tokens": 0, "bytes_saved": 0}
+        context = self._minimize_context(file_path, request.get("failing_line", ""),
+                                         request.get("source_code", ""), request.get("error_log", ""))
+        input_payload = self._build_payload(file_path, request.get("failing_line", ""),
+                                            request.get("source_code", ""), request.get("error_log", ""), context)
+        prompt_tokens = estimate_tokens(input_payload)
+        reserved = prompt_tokens + self._completion_allowance(request.get("source_code", ""), context)
+        saved_per_call = context["stats"]["bytes_saved"] if context else 0
+        error_category = self._error_category(request.get("error_log", ""))
+        tokens = 0
+        for attempt in range(self.max_retries):
+            # The completion is reserved up front too, so concurrent calls cannot jointly overrun the budget
+            if not budget.try_reserve(reserved):
+                print(f"🚨 Token budget exhausted before attempt {attempt + 1} for {file_path}.")
+                return {"file_path": file_path, "status": "budget_exhausted", "patch": None,
+                        "attempts": attempt, "tokens": tokens, "bytes_saved": saved_per_call * attempt}
+            # Only the agent call holds a concurrency slot; backoff waits release it
+            output_json_str = ""
+            try:
+                async with semaphore:
+                    print(f"Debug Attempt {attempt + 1}/{self.max_retries} for {file_path}")
+                    # Started inside the slot so latency excludes the wait for a concurrency slot
+                    probe = self._start_attempt(file_path, attempt + 1, "concurrent", input_payload, error_category)
+                    output_json_str, validator = await self._run_agent_async(input_payload, probe=probe)
+            finally:
+                used = prompt_tokens + (estimate_tokens(output_json_str) if output_json_str else 0)
+                budget.settle(reserved, used)
+                tokens += used
+
+            patch_data = await asyncio.to_thread(self._finalize_attempt, output_json_str, validator, probe,
+                                                 request.get("source_code", ""), request.get("failing_line", ""),
+                                                 context, cache_key)
+            if patch_data is not None:
+                print(f"✅ Valid patch received on attempt {attempt + 1} for {file_path}")
+                return {"file_path": file_path, "status": "patched", "patch": patch_data,
+                        "attempts": attempt + 1, "tokens": tokens, "bytes_saved": saved_per_call * (attempt + 1)}
+
+            # Non-blocking exponential backoff: other files keep progressing
+            sleep_time = self.base_backoff_sec * (2 ** attempt) if attempt < self.max_retries - 1 else 0
+            self._finish_attempt(probe, output_json_str, sleep_time)
+            if sleep_time:
+                print(f"Applying backoff for {sleep_time}s ({file_path})...")
+                await asyncio.sleep(sleep_time)
+
+        print(f"🚨 Max retries exceeded for {file_path}.")
+        return {"file_path": file_path, "status": "failed", "patch": None, "attempts": self.max_retries, "tokens": tokens,
+                "bytes_saved": saved_per_call * self.max_retries}
+
+    async def debug_files(self, requests: List[Dict[str, str]], max_concurrency: int = 4,
+                          token_budget: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Debugs several failing files concurrently. Each request carries the
+        debug_file() arguments (file_path, failing_line, source_code, error_log).
+        At most `max_concurrency` agent calls run at once and all files draw
+        from one `token_budget` (estimated tokens; None = unlimited).
+        A file whose debugging raises is reported with status "error".
+        """
+        start_time = time.time()
+        semaphore = asyncio.Semaphore(max_concurrency)
+        budget = TokenBudget(token_budget)
+        outcomes = await asyncio.gather(*(self._debug_file_async(r, semaphore, budget) for r in requests),
+                                        return_exceptions=True)
+        results = []
+        for request, outcome in zip(requests, outcomes):
+            if isinstance(outcome, Exception):
+                # One failing agent call must not drop the other files' results
+                print(f"🚨 Debugging {request['file_path']} raised: {outcome}")
+                outcome = {"file_path": request["file_path"], "status": "error", "error": str(outcome),
+                           "patch": None, "attempts": None, "tokens": None, "bytes_saved": 0}
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            results.append(outcome)
+        patches = {r["file_path"]: r["patch"] for r in results if r["patch"] is not None}
+        return {
+            "success": len(patches) == len(requests),
+            "patches": patches,
+            "failed": [r["file_path"] for r in results if r["patch"] is None],
+            "results": list(results),
+            "tokens_used": budget.used,
+            "bytes_saved": sum(r["bytes_saved"] for r in results),
+            "token_budget": token_budget,
+            "elapsed_sec": round(time.time() - start_time, 2),
+        }
+
+    def _completion_allowance(self, source_code: str, context: Optional[Dict[str, Any]]) -> int:
+        """Completion tokens to reserve for one call: a full rewrite of the excerpt (or file) the model sees."""
+        excerpt = source_code if context is None else context["snippet"]
+        return estimate_tokens(excerpt) + self.COMPLETION_OVERHEAD_TOKENS
+
+    def _compile_check(self, patch_data: dict) -> Optional[str]:
+        """Reason the patched file fails to compile, or None (also when no compile pre-check is configured)."""
+        if self.compile_precheck is None:
+            return None
+        result = self.compile_precheck.check(patch_data["file_path"], patch_data["updated_content"])
+        if result["status"] != "failed":
+            return None
+        return f"{len(result['new_errors'])} new compile error(s) in {result['duration_sec']}s: " + "; ".join(result["new_errors"][:3])
+
+    def _precheck(self, patch_data: dict, source_code: str, failing_line: str) -> Optional[str]:
+        """Local dry-run of a (full-file) patch: contract, still targets this source, syntax."""
+        if not self._patch_applies(patch_data, source_code, failing_line):
+            return "patch does not apply to the current source"
+        return self.syntax_precheck.check(patch_data["file_path"], patch_data["updated_content"])
+
+    def _default_candidates(self, k: int) -> List[Dict[str, Any]]:
+        return [{"agent": self.debug_agent, "options": {"temperature": t}} for t in self.SPECULATIVE_TEMPERATURES[:k]]
+
+    def _candidate_label(self, candidate: Dict[str, Any]) -> str:
+        agent = candidate.get("agent") or self.debug_agent
+        name = getattr(agent, "name", type(agent).__name__)
+        options = ", ".join(f"{k}={v}" for k, v in sorted((candidate.get("options") or {}).items()))
+        return f"{name}({options})"
+
+    def _generate_candidate(self, input_payload: str, agent: BaseAgent, options: Optional[Dict[str, Any]],
+                            cancel_event: threading.Event, probe: Optional[Dict[str, Any]]) -> tuple:
+        """
+        Worker-thread body of a blocking/streaming candidate. A thread cannot be
+        cancelled, so when the round is decided first (the probe is "detached")
+        the thread records the attempt itself with what the call really produced.
+        """
+        output = ""
+        try:
+            output, validator = self._generate(input_payload, agent, options, cancel_event, probe)
+            return output, validator
+        finally:
+            if probe is not None:
+                with self._probe_lock:
+                    probe["returned_output"] = output
+                    detached = probe.get("detached", False)
+                if detached:
+                    self._finish_attempt(probe, output)
+
+    def _detach_candidate(self, probe: Optional[Dict[str, Any]], outcome: str) -> None:
+        """Hands a losing thread candidate's probe to its worker thread (or records it now if it already returned)."""
+        if probe is None:
+            return
+        self._set_outcome(probe, outcome)
+        with self._probe_lock:
+            probe["detached"] = True
+            returned = "returned_output" in probe
+        if returned:
+            self._finish_attempt(probe, probe["returned_output"])
+
+    @staticmethod
+    def _start_candidate_thread(func, *args) -> "asyncio.Future":
+        """
+        Runs a blocking candidate on its own daemon thread rather than the default
+        executor: nothing awaits or joins it once the round is decided, so a slow
+        loser delays neither asyncio.run() nor later to_thread() calls.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def resolve(result, error):
+            if future.done():
+                return
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+        def target():
+            try:
+                result, error = func(*args), None
+            except Exception as e:
+                result, error = None, e
+            try:
+                loop.call_soon_threadsafe(resolve, result, error)
+            except RuntimeError:
+                # The event loop is already closed: the round ended without this candidate
+                pass
+
+        threading.Thread(target=target, name="speculative-candidate", daemon=True).start()
+        return future
+
+    async def _run_candidate(self, index: int, candidate: Dict[str, Any], input_payload: str,
+                             cancel_event: threading.Event, probe: Optional[Dict[str, Any]] = None) -> tuple:
+        agent = candidate.get("agent") or self.debug_agent
+        try:
+            if hasattr(agent, "arun"):
+                output, validator = await self._run_agent_async(input_payload, agent, candidate.get("options"),
+                                                                cancel_event, probe)
+            else:
+                output, validator = await self._start_candidate_thread(self._generate_candidate, input_payload, agent,
+                                                                       candidate.get("options"), cancel_event, probe)
+            return index, output, validator, None, probe
+        except Exception as e:
+            return index, "", None, e, probe
+
+    async def debug_file_speculative(self, file_path: str, failing_line: str, source_code: str, error_log: str,
+                                     k: int = 3, candidates: Optional[List[Dict[str, Any]]] = None) -> Optional[Dict[str, str]]:
+        """
+        Speculative variant of debug_file(): instead of up to `max_retries`
+        sequential calls with backoff, k candidate patches are requested at once
+        and the first one that passes the local pre-validation (contract, applies
+        to the source, syntax, compile) wins. Streaming and native-async
+        generations still running are cancelled; run()-only ones cannot be and
+        are recorded as "superseded" with their real output once they return.
+        `candidates` is a list of {"agent": ..., "options": {...}} (providers
+        and/or sampling settings); by default the debug agent at k temperatures.
+        Costs up to k calls' tokens in exchange for one round-trip of latency.
+        """
+        cache_key = self._cache_key(source_code, error_log, failing_line)
+        cached = self._cache_lookup(cache_key, file_path, failing_line, source_code)
+        if cached is not None:
+            return cached
+        context = self._minimize_context(file_path, failing_line, source_code, error_log)
+        input_payload = self._build_payload(file_path, failing_line, source_code, error_log, context)
+        candidates = candidates or self._default_candidates(k)
+        print(f"🎲 Speculative debug for {file_path}: {len(candidates)} concurrent candidates")
+
+        start_time = time.time()
+        cancel_event = threading.Event()
+        error_category = self._error_category(error_log)
+        probes = [self._start_attempt(file_path, i + 1, "speculative", input_payload, error_category,
+                                      c.get("agent"), c.get("options")) for i, c in enumerate(candidates)]
+        tasks = [asyncio.ensure_future(self._run_candidate(i, c, input_payload, cancel_event, probe))
+                 for i, (c, probe) in enumerate(zip(candidates, probes))]
+        self.speculation_stats["rounds"] += 1
+        self.speculation_stats["candidates"] += len(tasks)
+        winner = None
+        consumed = set()
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, output, validator, error, probe = await next_done
+                consumed.add(index)
+                label = self._candidate_label(candidates[index])
+                if error is not None:
+                    print(f"⚠️ Candidate {label} failed: {error}")
+                    self._set_outcome(probe, "agent_error")
+                    self._finish_attempt(probe, output)
+                    continue
+                patch_data = await asyncio.to_thread(self._finalize_attempt, output, validator, probe, source_code,
+                                                     failing_line, context, cache_key, True)
+                if patch_data is not None:
+                    winner = (label, patch_data)
+                    break
+                print(f"❌ Candidate {label} rejected.")
+                self._finish_attempt(probe, output)
+                self.speculation_stats["rejected"] += 1
+        finally:
+            # Streaming candidates stop at their next chunk and native coroutines are cancelled;
+            # run()-only candidates cannot be stopped, they finish in their thread and only lose
+            cancel_event.set()
+            cancelled = superseded = 0
+            for index, (candidate, task, probe) in enumerate(zip(candidates, tasks, probes)):
+                if index in consumed or task.cancelled():
+                    continue
+                if task.done():
+                    # Finished after the winner: its output was produced in full
+                    superseded += 1
+                    self._set_outcome(probe, "superseded")
+                    self._finish_attempt(probe, task.result()[1])
+                    continue
+                agent = candidate.get("agent") or self.debug_agent
+                if hasattr(agent, "arun"):
+                    task.cancel()
+                    cancelled += 1
+                    self._set_outcome(probe, "cancelled")
+                    self._finish_attempt(probe, "")
+                elif callable(getattr(agent, "stream", None)):
+                    cancelled += 1
+                    self._detach_candidate(probe, "cancelled")
+                else:
+                    superseded += 1
+                    self._detach_candidate(probe, "superseded")
+            self.speculation_stats["cancelled"] += cancelled
+            self.speculation_stats["superseded"] += superseded
+
+        if winner is None:
+            print(f"🚨 No speculative candidate passed pre-validation for {file_path}.")
+            return None
+        label, patch_data = winner
+        wins = self.speculation_stats["wins"]
+        wins[label] = wins.get(label, 0) + 1
+        print(f"✅ Candidate {label} accepted after {time.time() - start_time:.2f}s "
+              f"({cancelled} cancelled, {superseded} superseded)")
+        return patch_data
@@ -0,0 +1,228 @@
+import os
+import shutil
+import sys
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from build_context import BuildContextBuilder
+
+class RamWorkspace:
+    """
+    Stages sandbox build contexts on a RAM-backed filesystem (tmpfs, /dev/shm by
+    default) so `docker build` reads the project from memory instead of disk.
+
+    Only the files that end up in the build context are staged (same ignore rules
+    as BuildContextBuilder). A workspace is kept between rebuilds of the same key
+    and re-synced incrementally (size + mtime_ns), so the debug loop only copies the
+    files a patch touched. Reservations are accounted against `max_bytes`; idle
+    workspaces are evicted least-recently-used first and a project that still
+    does not fit falls back to its on-disk path.
+    """
+
+    DEFAULT_ROOT = "/dev/shm/sandbox-workspaces"
+    DEFAULT_MAX_BYTES = 2 * 1024 ** 3 # 2 GiB
+
+    # Headroom kept free on the tmpfs for everything else living there
+    MIN_FREE_BYTES = 256 * 1024 ** 2
+
+    # Weight of the newest observation in the disk read throughput average
+    EWMA_ALPHA = 0.3
+
+    def __init__(self, root: str = DEFAULT_ROOT, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        # key -> {"path", "bytes", "in_use", "last_used"}
+        self._workspaces: Dict[str, Dict[str, Any]] = {}
+        # Learned read throughput of on-disk contexts, used to estimate the I/O time saved
+        self._disk_bytes_per_sec: Optional[float] = None
+        self.counters = {"staged": 0, "fallbacks": 0, "evictions": 0}
+
+    @staticmethod
+    def _key_dir(key: str) -> str:
+        return "".join(c if c.isalnum() or c in "-_." else "-" for c in key)[:96]
+
+    def reserved_bytes(self) -> int:
+        with self._lock:
+            return sum(w["bytes"] for w in self._workspaces.values())
+
+    def _free_bytes(self) -> int:
+        st = os.statvfs(self.root)
+        return st.f_bavail * st.f_frsize
+
+    def _reserve(self, key: str, size: int) -> Optional[str]:
+        """Accounts `size` bytes for `key`, evicting idle workspaces if needed. Returns a refusal reason or None."""
+        with self._lock:
+            current = self._workspaces.get(key)
+            if current is not None and current["in_use"]:
+                # Another build of the same key is reading this directory; re-syncing it would corrupt that build
+                return "workspace is in use by a concurrent build of the same key"
+            growth = size - (current["bytes"] if current else 0)
+            if size > self.max_bytes:
+                return f"context of {size} bytes exceeds the {self.max_bytes} byte cap"
+            idle = sorted((w["last_used"], k) for k, w in self._workspaces.items() if not w["in_use"] and k != key)
+            while idle and sum(w["bytes"] for w in self._workspaces.values()) + growth > self.max_bytes:
+                _, victim = idle.pop(0)
+                shutil.rmtree(self._workspaces.pop(victim)["path"], ignore_errors=True)
+                self.counters["evictions"] += 1
+            if sum(w["bytes"] for w in self._workspaces.values()) + growth > self.max_bytes:
+                return "RAM workspace cap reached by concurrent builds"
+            if growth > 0 and self._free_bytes() - growth < self.MIN_FREE_BYTES:
+                return "tmpfs is low on free space"
+            self._workspaces[key] = {
+                "path": os.path.join(self.root, self._key_dir(key)),
+                "bytes": size,
+                "in_use": True,
+                "last_used": time.time(),
+            }
+            return None
+
+    def stage(self, key: str, project_path: str, extra_ignores: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Mirrors the project's build context into RAM. Returns {"mode": "ram", "path", ...}
+        or {"mode": "disk", "path": project_path, "reason"} when it does not fit.
+        """
+        # The size pre-pass is part of the staging cost, so the clock starts before it
+        start_time = time.time()
+        builder = BuildContextBuilder(project_path, extra_ignores=extra_ignores)
+        size = builder.estimate()["bytes"]
+        reason = self._reserve(key, size)
+        if reason is not None:
+            self.counters["fallbacks"] += 1
+            print(f"⚠️ RAM workspace unavailable for {key} ({reason}); building from disk.")
+            return {"mode": "disk", "path": project_path, "bytes": size, "reason": reason,
+                    "staging_sec": round(time.time() - start_time, 4)}
+
+        dest = self._workspaces[key]["path"]
+        copied_files = copied_bytes = reused_files = 0
+        disk_read_sec = 0.0
+        wanted = set()
+        try:
+            for rel_path, entry in builder.entries():
+                target = os.path.join(dest, rel_path)
+                wanted.add(rel_path)
+                if entry.is_dir(follow_symlinks=False):
+                    os.makedirs(target, exist_ok=True)
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if entry.is_symlink():
+                    if os.path.lexists(target):
+                        os.remove(target)
+                    os.symlink(os.readlink(entry.path), target)
+                    continue
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                st = entry.stat(follow_symlinks=False)
+                try:
+                    staged = os.stat(target, follow_symlinks=False)
+                    if staged.st_size == st.st_size and staged.st_mtime_ns == st.st_mtime_ns:
+                        reused_files += 1
+                        continue
+                except FileNotFoundError:
+                    pass
+                disk_read_sec += self._copy_file(entry.path, target)
+                copied_files += 1
+                copied_bytes += st.st_size
+            # Files deleted from the project (e.g. by a patch) must disappear from the stage too
+            for dirpath, dirnames, filenames in os.walk(dest, topdown=False):
+                for name in filenames + dirnames:
+                    path = os.path.join(dirpath, name)
+                    if os.path.relpath(path, dest).replace(os.sep, "/") not in wanted:
+                        shutil.rmtree(path) if os.path.isdir(path) and not os.path.islink(path) else os.remove(path)
+        except OSError as e:
+            self.release(key)
+            self.counters["fallbacks"] += 1
+            print(f"⚠️ RAM staging failed for {key} ({e}); building from disk.")
+            return {"mode": "disk", "path": project_path, "bytes": size, "reason": str(e)}
+
+        staging_sec = time.time() - start_time
+        # Only the read side of the copies is a disk throughput sample (tmpfs writes are excluded)
+        if copied_bytes and disk_read_sec > 0:
+            self._observe_disk(copied_bytes, disk_read_sec)
+        self.counters["staged"] += 1
+        return {
+            "mode": "ram",
+            "path": dest,
+            "bytes": size,
+            "staging_sec": round(staging_sec, 4),
+            "copied_files": copied_files,
+            "copied_bytes": copied_bytes,
+            "reused_files": reused_files,
+        }
+
+    @staticmethod
+    def _copy_file(source: str, target: str) -> float:
+        """copy2 equivalent that returns the time spent reading the source."""
+        read_sec = 0.0
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            while True:
+                read_start = time.perf_counter()
+                chunk = src.read(BuildContextBuilder.CHUNK_SIZE)
+                read_sec += time.perf_counter() - read_start
+                if not chunk:
+                    break
+                dst.write(chunk)
+        shutil.copystat(source, target, follow_symlinks=False)
+        return read_sec
+
+    def _observe_disk(self, read_bytes: int, read_sec: float) -> None:
+        if read_bytes <= 0 or read_sec <= 0:
+            return
+        with self._lock:
+            observed = read_bytes / read_sec
+            previous = self._disk_bytes_per_sec
+            self._disk_bytes_per_sec = observed if previous is None else (
+                self.EWMA_ALPHA * observed + (1 - self.EWMA_ALPHA) * previous
+            )
+
+    def finish(self, key: str, staged: Dict[str, Any], context_stats: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Marks the workspace idle (kept for the next rebuild) and returns telemetry.
+        `io_saved_sec` compares the RAM read time plus the whole disk-to-tmpfs
+        staging cost (size pre-pass, copies, pruning) against the learned time to
+        read the same bytes from disk; it is negative when staging cost more.
+        """
+        read_sec = context_stats.get("read_sec", 0.0)
+        read_bytes = context_stats.get("context_bytes", 0)
+        report = {k: v for k, v in staged.items() if k != "path"}
+        report["context_read_sec"] = read_sec
+        if staged["mode"] == "disk":
+            self._observe_disk(read_bytes, read_sec)
+            # The failed staging attempt (size pre-pass) was pure overhead
+            report["io_saved_sec"] = -staged.get("staging_sec", 0.0)
+            return report
+
+        with self._lock:
+            workspace = self._workspaces.get(key)
+            if workspace is not None:
+                workspace["in_use"] = False
+                workspace["last_used"] = time.time()
+            disk_bps = self._disk_bytes_per_sec
+        if disk_bps:
+            disk_estimate = read_bytes / disk_bps
+            report["estimated_disk_read_sec"] = round(disk_estimate, 4)
+            report["io_saved_sec"] = round(disk_estimate - read_sec - staged.get("staging_sec", 0.0), 4)
+        else:
+            report["io_saved_sec"] = None # no disk baseline yet
+        return report
+
+    def release(self, key: str) -> None:
+        """Deletes a staged workspace and frees its reservation."""
+        with self._lock:
+            workspace = self._workspaces.pop(key, None)
+        if workspace is not None:
+            shutil.rmtree(workspace["path"], ignore_errors=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "root": self.root,
+                "max_bytes": self.max_bytes,
+                "reserved_bytes": sum(w["bytes"] for w in self._workspaces.values()),
+                "workspaces": len(self._workspaces),
+                "disk_bytes_per_sec": self._disk_bytes_per_sec,
+                **self.counters,
+            }
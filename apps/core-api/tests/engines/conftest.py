@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Engine modules are flat files that import their siblings by name
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src", "services", "engines"))
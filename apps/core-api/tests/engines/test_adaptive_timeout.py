@@ -0,0 +1,38 @@
+import random
+
+from adaptive_timeout import AdaptiveTimeoutPolicy, P2Quantile
+
+
+def test_p2_estimate_is_close_to_the_true_quantile():
+    rng = random.Random(1)
+    samples = [rng.uniform(0, 100) for _ in range(5000)]
+    estimate = P2Quantile(0.95)
+    for x in samples:
+        estimate.add(x)
+    assert abs(estimate.value() - sorted(samples)[int(0.95 * len(samples))]) < 2
+
+
+def test_deadline_uses_the_default_until_enough_samples():
+    policy = AdaptiveTimeoutPolicy(min_samples=5)
+    for _ in range(4):
+        policy.record("build", "maven", 1024, 100)
+    assert policy.deadline("build", "maven", 1024, default_sec=600) == 600
+    policy.record("build", "maven", 1024, 100)
+    assert policy.deadline("build", "maven", 1024, default_sec=600) == 200
+
+
+def test_deadline_is_clamped_and_falls_back_to_the_stack_estimate():
+    policy = AdaptiveTimeoutPolicy(min_samples=1)
+    policy.record("run", "angular", 1024, 1)
+    # Other size bucket: the stack-wide estimate applies, raised to the phase floor
+    assert policy.deadline("run", "angular", 500 * 1024 ** 2, default_sec=120) == 15
+    policy.record("build", "angular", 1024, 10000)
+    assert policy.deadline("build", "angular", 1024, default_sec=120) == 900
+
+
+def test_state_round_trips(tmp_path):
+    path = str(tmp_path / "timeouts.json")
+    policy = AdaptiveTimeoutPolicy(min_samples=1, state_path=path)
+    for d in (10, 20, 30, 40, 50, 60):
+        policy.record("run", "jest", 1024, d)
+    assert AdaptiveTimeoutPolicy(min_samples=1, state_path=path).snapshot() == policy.snapshot()
@@ -0,0 +1,102 @@
+import artifact_profiler
+from artifact_profiler import ArtifactProfiler
+
+STATIC = {"digest": "sha256:abc", "image_bytes": 100 * 1024 ** 2, "layer_count": 10, "largest_layers": []}
+
+
+def test_combined_stack_budget_and_endpoint_come_from_components():
+    profiler = ArtifactProfiler()
+    budget = profiler.budget_for("angular+spring-boot")
+    assert budget == {"image_mb": 570, "layers": 50, "peak_memory_mb": 578, "ttfhr_sec": 45}
+    assert profiler._endpoint("angular+spring-boot") == (8080, "/api/health")
+    assert profiler._endpoint("angular") == (80, "/")
+    assert profiler.budget_for("unknown") == ArtifactProfiler.STACK_BUDGETS["*"]
+
+
+def test_failed_startup_is_retried_after_the_ttl(monkeypatch):
+    profiler = ArtifactProfiler()
+    outcomes = iter([None, 3.0])
+    monkeypatch.setattr(profiler, "_static_profile", lambda image: dict(STATIC))
+    monkeypatch.setattr(profiler, "_startup_profile",
+                        lambda image, stack: {"ttfhr_sec": next(outcomes), "peak_memory_bytes": 1, "health_url_path": "/"})
+
+    first = profiler.profile("img", "node")
+    assert first["violations"] and not first["cached"]
+    # Within the TTL the failure is reused rather than re-running the container
+    assert profiler.profile("img", "node")["cached"]
+
+    profiler._cache[STATIC["digest"]]["profiled_at"] -= ArtifactProfiler.FAILURE_TTL_SEC + 1
+    retried = profiler.profile("img", "node")
+    assert not retried["cached"] and retried["ttfhr_sec"] == 3.0 and retried["violations"] == []
+    # Complete profiles are kept
+    profiler._cache[STATIC["digest"]]["profiled_at"] -= 10 * ArtifactProfiler.FAILURE_TTL_SEC
+    assert profiler.profile("img", "node")["cached"]
+
+
+def test_startup_run_is_hardened(monkeypatch):
+    profiler = ArtifactProfiler(startup_timeout_sec=1)
+    calls = []
+
+    def docker(*args, timeout_sec=30):
+        calls.append(args)
+        if args[0] == "inspect":
+            return "172.30.0.2\n"
+        if args[0] == "stats":
+            return "10MiB / 512MiB"
+        return "container-id\n"
+
+    class Ok:
+        status_code = 200
+
+    monkeypatch.setattr(profiler, "_docker", docker)
+    monkeypatch.setattr(artifact_profiler.requests, "get", lambda url, timeout: Ok())
+    monkeypatch.setattr(artifact_profiler.subprocess, "run", lambda *a, **kw: None)
+
+    result = profiler._startup_profile("img", "spring-boot")
+    run = next(c for c in calls if c[0] == "run")
+    assert "--read-only" in run and "-p" not in run
+    assert run[run.index("--network") + 1] == ArtifactProfiler.PROFILE_NETWORK
+    assert result["ttfhr_sec"] is not None
+
+
+def test_closed_local_port_counts_as_reachable():
+    import socket
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    assert ArtifactProfiler._reachable("127.0.0.1", port)
+    assert not ArtifactProfiler._reachable("", port)
+
+
+def test_unroutable_container_ip_falls_back_to_an_in_container_check(monkeypatch):
+    profiler = ArtifactProfiler(startup_timeout_sec=1)
+    executed = []
+
+    def docker(*args, timeout_sec=30):
+        if args[0] == "inspect":
+            return "172.30.0.2\n"
+        if args[0] == "stats":
+            return "10MiB / 512MiB"
+        if args[0] == "exec":
+            return "/usr/bin/wget\n"
+        return "container-id\n"
+
+    class Done:
+        returncode = 0
+
+    def run(cmd, **kwargs):
+        executed.append(cmd)
+        return Done()
+
+    def no_host_http(*args, **kwargs):
+        raise AssertionError("container IP must not be polled from the host")
+
+    monkeypatch.setattr(profiler, "_docker", docker)
+    monkeypatch.setattr(profiler, "_reachable", lambda address, port: False)
+    monkeypatch.setattr(artifact_profiler.requests, "get", no_host_http)
+    monkeypatch.setattr(artifact_profiler.subprocess, "run", run)
+
+    result = profiler._startup_profile("img", "spring-boot")
+    assert result["ttfhr_sec"] is not None and result["health_probe"] == "exec"
+    assert executed[0] == ["docker", "exec", "container-id", "/usr/bin/wget", "-q", "-O", "/dev/null",
+                           "http://127.0.0.1:8080/api/health"]
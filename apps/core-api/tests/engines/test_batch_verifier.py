@@ -0,0 +1,28 @@
+import time
+
+from batch_verifier import BatchDeploymentVerifier, HostConnectionLimiter
+from deployment_gatekeeper import DeploymentGatekeeper
+from load_smoke import StubAppServer
+
+
+def test_probe_latency_excludes_waiting_for_a_host_slot():
+    with StubAppServer(latency_ms=100) as stub:
+        verifier = BatchDeploymentVerifier(max_concurrency=8, per_host_limit=2)
+        report = verifier.verify([(f"p{i}", stub.base_url) for i in range(8)])
+
+    assert report["summary"]["verified"] == 8
+    # 8 apps x 4 endpoints through 2 slots: most probes queued, yet each request itself took ~100 ms
+    for result in report["results"]:
+        for stats in result["latency"]["endpoints"].values():
+            assert stats["max"] < 400
+
+
+def test_slot_wait_is_bounded_by_probe_timeout():
+    limiter = HostConnectionLimiter(per_host_limit=1)
+    assert limiter.acquire("example.test", 1)
+    gatekeeper = DeploymentGatekeeper("p", host_limiter=limiter)
+    start = time.perf_counter()
+    probe = gatekeeper._probe("http://example.test/api/health", timeout_sec=0.2)
+    assert time.perf_counter() - start < 1.0
+    assert probe["error"] == "HostSlotTimeout"
+    assert probe["retryable"] and probe["latency_ms"] is None
@@ -0,0 +1,57 @@
+import io
+import tarfile
+
+from build_context import BuildContextBuilder
+
+
+def _touch(root, rel_path, content="x"):
+    path = root / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+def _members(root, **kwargs):
+    data = b"".join(BuildContextBuilder(str(root), **kwargs).stream())
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        return {m.name for m in tar.getmembers() if m.isfile()}
+
+
+def test_source_package_named_target_is_kept(tmp_path):
+    _touch(tmp_path, "pom.xml")
+    _touch(tmp_path, "src/main/java/com/acme/target/Foo.java")
+    _touch(tmp_path, "target/classes/Foo.class")
+    members = _members(tmp_path)
+    assert "src/main/java/com/acme/target/Foo.java" in members
+    assert "target/classes/Foo.class" not in members
+
+
+def test_build_output_next_to_component_manifest_is_dropped(tmp_path):
+    _touch(tmp_path, "backend/pom.xml")
+    _touch(tmp_path, "backend/target/app.jar")
+    _touch(tmp_path, "frontend/package.json")
+    _touch(tmp_path, "frontend/node_modules/left-pad/index.js")
+    _touch(tmp_path, "frontend/src/app/node_modules/readme.md")
+    members = _members(tmp_path)
+    assert "backend/pom.xml" in members
+    assert "backend/target/app.jar" not in members
+    assert "frontend/node_modules/left-pad/index.js" not in members
+    # No package.json next to it: not an install directory
+    assert "frontend/src/app/node_modules/readme.md" in members
+
+
+def test_any_depth_defaults_and_dockerignore(tmp_path):
+    _touch(tmp_path, "Dockerfile")
+    _touch(tmp_path, ".dockerignore", "docs\n!docs/keep.md\n")
+    _touch(tmp_path, "a/b/__pycache__/m.pyc")
+    _touch(tmp_path, "a/b/build.log")
+    _touch(tmp_path, "docs/drop.md")
+    _touch(tmp_path, "docs/keep.md")
+    members = _members(tmp_path)
+    assert members == {"Dockerfile", ".dockerignore", "docs/keep.md"}
+
+
+def test_extra_ignores_are_root_relative(tmp_path):
+    _touch(tmp_path, "fixtures/big.bin")
+    _touch(tmp_path, "src/fixtures/small.txt")
+    members = _members(tmp_path, extra_ignores=["/fixtures"])
+    assert members == {"src/fixtures/small.txt"}
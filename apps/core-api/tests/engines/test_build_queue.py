@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+
+import pytest
+
+from build_queue import PostgresJobQueue, SandboxBuildWorker, SandboxJobQueue, open_job_queue
+from docker_sandbox import DockerSandbox
+from fake_backend import FakeDockerBackend
+
+
+def _project(tmp_path):
+    project = tmp_path / "app"
+    project.mkdir()
+    (project / "Dockerfile").write_text("FROM node:20\n")
+    (project / "package.json").write_text("{}")
+    return str(project)
+
+
+def test_logs_stream_while_the_job_runs(tmp_path):
+    queue = SandboxJobQueue(str(tmp_path / "jobs.db"), lease_sec=30)
+    backend = FakeDockerBackend(build_latency_sec=0.05, run_latency_sec=1.0)
+    worker = SandboxBuildWorker(queue, worker_id="w1", log_flush_sec=0.05,
+                                sandbox_factory=lambda path, **kw: DockerSandbox(path, backend=backend, **kw))
+    job_id = queue.enqueue(_project(tmp_path))
+    job = queue.claim("w1")
+    runner = threading.Thread(target=worker.process, args=(job,))
+    runner.start()
+
+    # The build output must be visible while the (slow) runtime phase is still running
+    deadline = time.time() + 0.8
+    seen = []
+    while time.time() < deadline and not any("fake build of" in line["text"] for line in seen):
+        seen = queue.logs(job_id)
+        time.sleep(0.02)
+    assert any("fake build of" in line["text"] for line in seen)
+    assert queue.get(job_id)["status"] == "running"
+
+    runner.join()
+    texts = [line["text"] for line in queue.logs(job_id)]
+    assert any("fake run of" in text for text in texts)
+    assert queue.get(job_id)["status"] == "succeeded"
+
+
+def test_expired_lease_is_requeued_then_dead(tmp_path):
+    queue = SandboxJobQueue(str(tmp_path / "jobs.db"), lease_sec=0.01)
+    job_id = queue.enqueue("/nowhere", max_attempts=1)
+    assert queue.claim("w1")["id"] == job_id
+    time.sleep(0.05)
+    assert queue.claim("w2") is None
+    assert queue.get(job_id)["status"] == "dead"
+
+
+def test_queue_backend_is_chosen_by_target(tmp_path):
+    assert type(open_job_queue(str(tmp_path / "jobs.db"))) is SandboxJobQueue
+    try:
+        import psycopg  # noqa: F401
+    except ImportError:
+        with pytest.raises(RuntimeError, match="psycopg"):
+            open_job_queue("postgresql://localhost/sandbox")
+
+
+@pytest.mark.skipif(not os.environ.get("SANDBOX_QUEUE_TEST_DSN"), reason="needs a disposable Postgres database")
+def test_postgres_workers_never_claim_the_same_job():
+    queue = PostgresJobQueue(os.environ["SANDBOX_QUEUE_TEST_DSN"], lease_sec=30)
+    job_ids = {queue.enqueue("/nowhere") for _ in range(20)}
+    claimed, lock = [], threading.Lock()
+
+    def drain(worker_id):
+        while True:
+            job = queue.claim(worker_id)
+            if job is None:
+                return
+            with lock:
+                claimed.append(job["id"])
+            assert queue.heartbeat(job["id"], worker_id)
+            assert queue.complete(job["id"], worker_id, {"success": True})
+
+    workers = [threading.Thread(target=drain, args=(f"w{i}",)) for i in range(4)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    mine = [job_id for job_id in claimed if job_id in job_ids]
+    assert sorted(mine) == sorted(job_ids)
@@ -0,0 +1,52 @@
+import base64
+import json
+
+from build_timeline import BuildTimelineAggregator, BuildTimelineParser
+
+
+def rawjson(**event):
+    return json.dumps(event)
+
+
+def test_rawjson_progress_becomes_a_timeline_and_a_readable_log():
+    lines = []
+    parser = BuildTimelineParser(on_line=lines.append)
+    parser.feed_line(rawjson(vertexes=[{"digest": "d1", "name": "[2/3] RUN npm ci",
+                                        "started": "2026-01-01T00:00:00.000000001Z"}]))
+    parser.feed_line(rawjson(logs=[{"vertex": "d1", "data": base64.b64encode(b"added 10 packages\n").decode()}]))
+    parser.feed_line(rawjson(vertexes=[{"digest": "d1", "name": "[2/3] RUN npm ci",
+                                        "started": "2026-01-01T00:00:00Z", "completed": "2026-01-01T00:00:12.5Z"},
+                                       {"digest": "d2", "name": "[1/3] FROM node", "cached": True,
+                                        "started": "2026-01-01T00:00:00Z", "completed": "2026-01-01T00:00:00Z"}]))
+    parser.feed_line("plain text line")
+
+    steps = {s["step"]: s for s in parser.timeline()}
+    assert steps["[2/3] RUN npm ci"]["duration_sec"] == 12.5
+    assert steps["[1/3] FROM node"]["cached"]
+    assert lines == ["=> [2/3] RUN npm ci", "[2/3] RUN npm ci | added 10 packages", "=> [1/3] FROM node",
+                     "plain text line"]
+    assert parser.log_text() == "\n".join(lines)
+
+
+def test_classic_stream_steps_and_errors():
+    parser = BuildTimelineParser()
+    parser.feed({"stream": "Step 1/2 : FROM node\n"})
+    parser.feed({"stream": " ---> Using cache\n"})
+    parser.feed({"stream": "Step 2/2 : RUN npm run build\n"})
+    parser.feed({"error": "The command '/bin/sh -c npm run build' returned a non-zero code: 1"})
+    parser.finish()
+    steps = parser.timeline()
+    assert [s["step"] for s in steps] == ["FROM node", "RUN npm run build"]
+    assert steps[0]["cached"] and steps[1]["error"].endswith("code: 1")
+
+
+def test_aggregator_ranks_steps_across_builds():
+    aggregator = BuildTimelineAggregator()
+    for cached in (False, True):
+        aggregator.record([{"step": "[build 2/5] RUN  npm ci", "duration_sec": 0.5 if cached else 30, "cached": cached},
+                           {"step": "RUN ng build", "duration_sec": 20, "cached": False}])
+    summary = aggregator.summary(top_n=1)
+    assert summary["total_builds"] == 2
+    top = summary["top_steps"][0]
+    assert top["step"] == "RUN ng build" and top["occurrences"] == 2
+    assert BuildTimelineAggregator.normalize_step("[build 2/5] RUN  npm ci") == "RUN npm ci"
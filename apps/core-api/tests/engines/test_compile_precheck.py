@@ -0,0 +1,52 @@
+import os
+import subprocess
+
+from compile_precheck import IncrementalCompilePrecheck
+
+
+class HangingWorker:
+    closed = False
+
+    def compile(self, relative_path, content):
+        raise subprocess.TimeoutExpired("tsc --watch", 1)
+
+    def close(self):
+        self.closed = True
+
+
+def test_timed_out_worker_is_closed_and_replaced(tmp_path, monkeypatch):
+    precheck = IncrementalCompilePrecheck(str(tmp_path))
+    worker = HangingWorker()
+    precheck._workers[str(tmp_path)] = worker
+    monkeypatch.setattr(precheck, "_worker_for", lambda path: (worker, "a.ts"))
+
+    result = precheck.check("a.ts", "const a = 1;")
+
+    assert result["status"] == "skipped" and "unavailable" in result["reason"]
+    assert worker.closed
+    assert precheck._workers == {}
+
+
+def test_sibling_directory_with_a_common_prefix_is_not_the_project(tmp_path):
+    project, sibling = tmp_path / "app", tmp_path / "app2"
+    for root in (project, sibling):
+        os.makedirs(root / "src")
+    (sibling / "tsconfig.json").write_text("{}")
+
+    result = IncrementalCompilePrecheck(str(project)).check("../app2/src/a.ts", "const a = 1;")
+
+    assert result["status"] == "skipped"
+    assert result["reason"] == "no tsconfig.json"
+
+
+def test_files_without_a_toolchain_are_skipped(tmp_path):
+    precheck = IncrementalCompilePrecheck(str(tmp_path))
+    assert precheck.check("README.md", "# hi")["reason"] == "no incremental toolchain for .md"
+    assert precheck.check("lib/App.java", "class App {}")["reason"] == "not under src/main/java"
+    assert precheck.stats == {"checks": 2, "passed": 0, "failed": 0, "skipped": 2}
+
+
+def test_new_errors_ignore_the_baseline():
+    baseline = [("a.ts", "TS2304", "x"), ("b.ts", "TS1005", "y")]
+    patched = [("a.ts", "TS2304", "x"), ("a.ts", "TS2304", "x"), ("b.ts", "TS1005", "y")]
+    assert IncrementalCompilePrecheck._new_errors(baseline, patched) == [("a.ts", "TS2304", "x")]
@@ -0,0 +1,40 @@
+from context_minimizer import ContextMinimizer
+
+METHODS = "".join(f"    public int method{i}(int x) {{\n        List<Integer> y = List.of(x * {i});\n        return y.get(0);\n    }}\n\n"
+                  for i in range(60))
+SOURCE = ("package com.acme;\n\nimport java.util.List;\nimport java.util.Map;\n\npublic class Big {\n"
+          + METHODS + "}\n")
+LOG = ("Big.java:100: error: cannot find symbol\n        List<Integer> y = List.of(x * 19);\n            ^\n"
+       "Big.java:100: error: cannot find symbol\n")
+
+
+def minimize():
+    return ContextMinimizer(max_tokens=300).minimize("src/Big.java", "List.of(x * 19)", SOURCE, LOG)
+
+
+def test_window_is_the_enclosing_method():
+    context = minimize()
+    start, end = context["window"]
+    lines = SOURCE.splitlines()
+    assert lines[start - 1].strip() == "public int method19(int x) {"
+    assert lines[end - 1].strip() == "}"
+    assert context["snippet"] == "\n".join(lines[start - 1:end])
+    assert context["stats"]["bytes_saved"] > 0
+
+
+def test_outline_keeps_declarations_and_only_referenced_imports():
+    outline = minimize()["outline"].splitlines()
+    assert "import java.util.List;" in outline
+    assert "import java.util.Map;" not in outline
+    assert "public class Big {" in outline
+
+
+def test_echoed_source_and_repeated_log_lines_are_dropped():
+    assert minimize()["error_log"] == "Big.java:100: error: cannot find symbol"
+
+
+def test_small_files_are_sent_whole_and_splice_round_trips():
+    context = ContextMinimizer().minimize("a.ts", "x", "const x = 1;\n", "TS2304")
+    assert context["window"] is None and context["snippet"] == "const x = 1;\n"
+    window = minimize()["window"]
+    assert ContextMinimizer.splice(SOURCE, window, "\n".join(SOURCE.splitlines()[window[0] - 1:window[1]])) == SOURCE
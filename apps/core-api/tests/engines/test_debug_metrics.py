@@ -0,0 +1,39 @@
+import json
+
+from debug_metrics import CallbackMetricsSink, InMemoryMetricsSink, JsonlMetricsSink
+
+
+def record(provider, outcome, latency_ms, ttft_ms=None):
+    return {"provider": provider, "error_category": "unknown", "outcome": outcome, "prompt_tokens": 100,
+            "completion_tokens": 20, "latency_ms": latency_ms, "ttft_ms": ttft_ms, "validation_ms": 1.0,
+            "backoff_sec": 2}
+
+
+def test_summary_groups_outcomes_tokens_and_latency():
+    sink = InMemoryMetricsSink()
+    for r in (record("a", "patched", 100, 10), record("a", "malformed_json", 300), record("b", "patched", 50)):
+        sink.emit(r)
+    rows = {row["provider"]: row for row in sink.summary()}
+    assert rows["a"]["attempts"] == 2
+    assert rows["a"]["outcomes"] == {"patched": 1, "malformed_json": 1}
+    assert rows["a"]["parse_failure_rate"] == 0.5
+    assert rows["a"]["prompt_tokens"] == 200
+    assert rows["a"]["latency_ms"]["max"] == 300
+    assert rows["a"]["ttft_ms"]["count"] == 1
+    assert rows["b"]["parse_failure_rate"] == 0.0
+
+
+def test_in_memory_sink_is_bounded():
+    sink = InMemoryMetricsSink(max_records=2)
+    for latency in (1, 2, 3):
+        sink.emit(record("a", "patched", latency))
+    assert [r["latency_ms"] for r in sink.records()] == [2, 3]
+
+
+def test_jsonl_and_callback_sinks(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    JsonlMetricsSink(str(path)).emit(record("a", "patched", 1))
+    assert json.loads(path.read_text().splitlines()[0])["provider"] == "a"
+    seen = []
+    CallbackMetricsSink(seen.append).emit(record("b", "patched", 1))
+    assert seen[0]["provider"] == "b"
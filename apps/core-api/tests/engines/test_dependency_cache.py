@@ -0,0 +1,74 @@
+import json
+import os
+import stat
+import time
+
+from dependency_cache import DependencyCache
+
+DOCKERFILE = "FROM maven:3.9\nCOPY . .\nRUN mvn -B package\nRUN echo done\n"
+
+
+def _project(tmp_path):
+    project = tmp_path / "app"
+    project.mkdir()
+    (project / "pom.xml").write_text("<project/>")
+    return str(project)
+
+
+def _mark_warm(cache, project):
+    for manifest in cache.find_manifests(project):
+        with open(cache._marker_path(manifest), "w", encoding="utf-8") as f:
+            json.dump({"manifest": manifest, "warmed_at": time.time() - 10}, f)
+
+
+def test_cache_directories_are_not_world_writable(tmp_path):
+    cache = DependencyCache(root=str(tmp_path / "deps"))
+    for path in (cache.root, cache.maven_repo, cache.npm_cache):
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o755
+
+
+def test_existing_shared_root_is_left_to_its_owner(tmp_path, monkeypatch):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o2775)
+    chmod = os.chmod
+
+    def owner_only_chmod(path, mode):
+        # As another user would see it: the shared root is not ours to chmod
+        if os.path.realpath(path) == os.path.realpath(str(shared)):
+            raise PermissionError(1, "Operation not permitted", path)
+        chmod(path, mode)
+
+    monkeypatch.setattr(os, "chmod", owner_only_chmod)
+    cache = DependencyCache(root=str(shared))
+    assert stat.S_IMODE(os.stat(cache.root).st_mode) == 0o2775
+    assert stat.S_IMODE(os.stat(cache.maven_repo).st_mode) == 0o755
+
+
+def test_builds_mount_the_cache_image_not_the_directory(tmp_path):
+    cache = DependencyCache(root=str(tmp_path / "deps"), image_tag="depcache:test")
+    project = _project(tmp_path)
+    with open(cache.image_state_path, "w", encoding="utf-8") as f:
+        json.dump({"image": cache.image_tag, "published_at": time.time()}, f)
+
+    options = cache.build_options(project, DOCKERFILE)
+    assert options["build_contexts"] == {}
+    assert "RUN --mount=type=bind,from=depcache:test,target=/deps export" in options["dockerfile"]
+    assert ",rw" not in options["dockerfile"]
+    assert "RUN echo done" in options["dockerfile"]
+
+
+def test_offline_only_once_warm_manifests_are_published(tmp_path):
+    cache = DependencyCache(root=str(tmp_path / "deps"))
+    project = _project(tmp_path)
+    _mark_warm(cache, project)
+    # Warm but never published: nothing to mount, stay online
+    options = cache.build_options(project, DOCKERFILE)
+    assert options["offline"] is False
+    assert options["dockerfile"] == DOCKERFILE
+
+    with open(cache.image_state_path, "w", encoding="utf-8") as f:
+        json.dump({"image": cache.image_tag, "published_at": time.time()}, f)
+    options = cache.build_options(project, DOCKERFILE)
+    assert options["offline"] is True
+    assert options["network"] == "none"
@@ -0,0 +1,79 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from deployment_gatekeeper import DeploymentGatekeeper
+
+
+@pytest.fixture
+def flaky_app():
+    """Answers the first request to each path with a slow 503, then instant 200s."""
+    seen = set()
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            with lock:
+                first = self.path not in seen
+                seen.add(self.path)
+            if first:
+                time.sleep(0.6)
+            code = 503 if first else 200
+            self.send_response(code)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _gatekeeper():
+    gatekeeper = DeploymentGatekeeper("p")
+    gatekeeper.initial_backoff_sec = 0.01
+    gatekeeper.latency_samples = 5
+    gatekeeper.latency_slo_ms = {"p50": 200, "p99": 500}
+    gatekeeper.latency_slo_action = "reject"
+    return gatekeeper
+
+
+def test_failed_probes_do_not_count_towards_the_latency_slo(flaky_app):
+    result = _gatekeeper().post_deployment_verification(flaky_app)
+    assert result["verified"], result.get("failure_reason")
+    assert result["latency"]["slo_violations"] == []
+    health = result["latency"]["endpoints"]["System_Health"]
+    assert health["count"] == 6 and health["max"] < 500
+    # The slow 503 is still reported, separately
+    assert health["failed_probes"]["count"] == 1
+    assert health["failed_probes"]["max"] >= 500
+
+
+def test_slow_successful_probes_still_breach_the_slo():
+    gatekeeper = _gatekeeper()
+    report = gatekeeper._latency_report({"System_Health": [900.0, 950.0]}, {"System_Health": [10.0]})
+    assert report["slo_violations"] == ["System_Health p50=900.0ms > 200ms", "System_Health p99=950.0ms > 500ms"]
+
+
+def test_profiler_os_error_rejects_instead_of_raising():
+    class NoDocker:
+        def profile(self, image, stack):
+            raise FileNotFoundError(2, "No such file or directory", "docker")
+
+    gatekeeper = DeploymentGatekeeper("p", artifact_profiler=NoDocker())
+    result = gatekeeper.pre_deployment_validation({
+        "success": True,
+        "telemetry": {"run_metrics": {"run_duration_sec": 5}, "build_metrics": {"image": "img", "stack": "node"}},
+    })
+    assert not result["approved"]
+    assert any("Artifact profiling failed for app" in r for r in result["reasons"])
@@ -0,0 +1,73 @@
+import json
+import os
+import socketserver
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from docker_backends import EngineApiDockerBackend
+
+
+class FakeDaemon:
+    """Unix-socket Engine API stand-in whose /wait never answers."""
+
+    def __init__(self):
+        self.requests = []
+        self.release = threading.Event()
+        self.socket_path = os.path.join(tempfile.mkdtemp(), "docker.sock")
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def address_string(self):
+                return "fake"
+
+            def _reply(self, code, body=b""):
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                path = self.path.split("?")[0]
+                daemon.requests.append((self.command, path.split("/", 2)[-1]))
+                if path.endswith("/create"):
+                    return self._reply(201, json.dumps({"Id": "c0ffee"}).encode())
+                if path.endswith("/wait"):
+                    daemon.release.wait(10)
+                    return self._reply(200, b'{"StatusCode": 0}')
+                self._reply(204)
+
+            do_POST = do_DELETE = do_GET = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_wait_timeout_kills_and_removes_the_container_on_a_fresh_connection():
+    daemon = FakeDaemon()
+    try:
+        backend = EngineApiDockerBackend(socket_path=daemon.socket_path)
+        limits = {"memory": "256m", "cpus": "1", "network": "none"}
+        with pytest.raises(TimeoutError):
+            backend.run("img", ["true"], limits, timeout_sec=0.3)
+    finally:
+        daemon.close()
+    assert daemon.requests == [("POST", "containers/create"), ("POST", "containers/c0ffee/start"),
+                               ("POST", "containers/c0ffee/wait"), ("POST", "containers/c0ffee/kill"),
+                               ("DELETE", "containers/c0ffee")]
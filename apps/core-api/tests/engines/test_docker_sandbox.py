@@ -0,0 +1,49 @@
+from dependency_cache import DependencyCache
+from docker_sandbox import DockerSandbox
+from fake_backend import FakeDockerBackend
+from incremental_cache import IncrementalBuildCache
+from ram_workspace import RamWorkspace
+
+
+def _project(tmp_path):
+    project = tmp_path / "app"
+    project.mkdir()
+    (project / "Dockerfile").write_text("FROM node:20\nCOPY . .\nRUN npm ci && npm run build\n")
+    (project / "package.json").write_text('{"name": "app"}')
+    return str(project)
+
+
+def test_classic_backend_reports_caches_off(tmp_path, capsys):
+    backend = FakeDockerBackend(sleep=False)
+    backend.supports_named_contexts = False
+    sandbox = DockerSandbox(_project(tmp_path), backend=backend,
+                            dependency_cache=DependencyCache(root=str(tmp_path / "depcache")),
+                            incremental_cache=IncrementalBuildCache(state_path=str(tmp_path / "inc.json")))
+    assert "caches are OFF" in capsys.readouterr().out
+
+    telemetry = sandbox.build_container()["telemetry"]
+    assert telemetry["buildkit"] is False
+    assert telemetry["caches"]["dependency_cache"]["enabled"] is False
+    assert telemetry["caches"]["incremental_cache"]["enabled"] is False
+
+
+def test_buildkit_backend_enables_caches(tmp_path):
+    sandbox = DockerSandbox(_project(tmp_path), backend=FakeDockerBackend(sleep=False),
+                            incremental_cache=IncrementalBuildCache(state_path=str(tmp_path / "inc.json")))
+    telemetry = sandbox.build_container()["telemetry"]
+    assert telemetry["buildkit"] is True
+    assert "cache_id" in telemetry["caches"]["incremental_cache"]
+
+
+def test_staging_errors_are_reported_as_a_failed_build(tmp_path):
+    workspace = RamWorkspace(root=str(tmp_path / "shm"))
+
+    def tmpfs_full(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+
+    workspace.stage = tmpfs_full
+    sandbox = DockerSandbox(_project(tmp_path), backend=FakeDockerBackend(sleep=False), ram_workspace=workspace)
+    result = sandbox.build_container()
+    assert result["success"] is False
+    assert "No space left on device" in result["log"]
+    assert result["telemetry"]["exit_code"] == 1
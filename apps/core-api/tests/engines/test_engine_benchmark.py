@@ -0,0 +1,28 @@
+from engine_benchmark import run_benchmark
+from fake_backend import FakeDockerBackend
+
+
+def _project(tmp_path):
+    (tmp_path / "Dockerfile").write_text("FROM node:20-alpine\nCOPY . .\nRUN npm ci && npm run build\n")
+    (tmp_path / "package.json").write_text('{"name": "bench", "scripts": {"build": "tsc", "test": "jest"}}\n')
+    return str(tmp_path)
+
+
+def _gate_stage(report):
+    return next(s for s in report["stages"] if s["stage"] == "pre_deployment_validation")
+
+
+def test_gate_sees_the_measured_run_duration(tmp_path):
+    backend = FakeDockerBackend(sleep=False, run_latency_sec=1.5)
+    report = run_benchmark(_project(tmp_path), iterations=3, backend=backend)
+    # Not rewritten to the simulated latency
+    assert report["gate"]["run_duration_sec"] < 1.0
+    assert report["gate"]["min_run_duration_sec"] == 0.0
+    assert _gate_stage(report)["success_rate"] == 1.0
+
+
+def test_gate_threshold_is_configurable(tmp_path):
+    backend = FakeDockerBackend(sleep=False, run_latency_sec=1.5)
+    report = run_benchmark(_project(tmp_path), iterations=3, backend=backend, min_run_duration_sec=1.0)
+    assert report["gate"]["min_run_duration_sec"] == 1.0
+    assert _gate_stage(report)["success_rate"] == 0.0
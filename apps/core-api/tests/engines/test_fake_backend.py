@@ -0,0 +1,25 @@
+from build_context import BuildContextBuilder
+from fake_backend import FakeDockerBackend
+
+LIMITS = {"memory": "512m", "cpus": "1.0", "network": "none"}
+
+
+def test_oom_rate_does_not_inflate_build_failures(tmp_path):
+    backend = FakeDockerBackend(failure_rate=0.1, oom_rate=0.5, seed=7, sleep=False)
+    context = BuildContextBuilder(str(tmp_path))
+    failures = sum(backend.build("img", context, 60)["exit_code"] != 0 for _ in range(4000))
+    assert 0.08 < failures / 4000 < 0.12
+
+
+def test_run_rates_are_separate_bands():
+    backend = FakeDockerBackend(failure_rate=0.1, oom_rate=0.2, seed=7, sleep=False)
+    results = [backend.run("img", ["true"], LIMITS, 60)["exit_code"] for _ in range(4000)]
+    assert 0.17 < results.count(137) / 4000 < 0.23
+    assert 0.08 < results.count(1) / 4000 < 0.12
+
+
+def test_same_seed_same_sequence():
+    def sequence():
+        backend = FakeDockerBackend(failure_rate=0.3, oom_rate=0.2, seed=3, sleep=False)
+        return [backend.run("img", ["t"], LIMITS, 60)["exit_code"] for _ in range(50)]
+    assert sequence() == sequence()
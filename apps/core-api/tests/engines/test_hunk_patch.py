@@ -0,0 +1,51 @@
+from hunk_patch import HunkPatchApplier
+
+SOURCE = "".join(f"line {i}\n" for i in range(1, 21))
+
+
+def test_hunk_with_a_wrong_line_hint_is_placed_by_context():
+    diff = "@@ -3,3 +3,3 @@\n line 10\n-line 11\n+LINE 11\n line 12\n"
+    result = HunkPatchApplier().apply(SOURCE, diff)
+    assert result["applied"]
+    assert "LINE 11\n" in result["content"] and "line 11\n" not in result["content"]
+    assert result["offsets"] == [7]
+
+
+def test_whitespace_drift_is_matched_and_reindented():
+    source = "class A {\n    void f() {\n        int a = 1\n    }\n}\n"
+    # The model dropped two spaces of indentation everywhere
+    diff = "@@ @@\n   void f() {\n-      int a = 1\n+      int a = 1;\n   }\n"
+    result = HunkPatchApplier().apply(source, diff)
+    assert result["applied"]
+    assert "        int a = 1;\n" in result["content"]
+
+
+def test_any_conflict_applies_nothing():
+    diff = ("@@ -1,2 +1,2 @@\n line 1\n-line 2\n+LINE 2\n"
+            "@@ -15,2 +15,2 @@\n not in file\n-line 16\n+LINE 16\n")
+    result = HunkPatchApplier(fuzz=0).apply(SOURCE, diff)
+    assert not result["applied"] and result["content"] is None
+    assert [c["hunk"] for c in result["conflicts"]] == [2]
+
+
+def test_crlf_and_missing_final_newline_are_preserved():
+    source = "a\r\nb\r\nc"
+    result = HunkPatchApplier().apply(source, "@@ -2 +2 @@\n a\n-b\n+B\n c\n")
+    assert result["content"] == "a\r\nB\r\nc"
+
+
+def test_diff_without_hunks_is_rejected():
+    assert HunkPatchApplier().apply(SOURCE, "just prose")["conflicts"][0]["reason"] == "diff contains no hunks"
+
+
+def test_context_that_matches_nothing_is_a_conflict_even_after_fuzz():
+    diff = "@@ -3,4 +3,5 @@\n totally/unrelated\n context/lines\n+INSERTED\n more/unrelated\n context/here\n"
+    result = HunkPatchApplier().apply(SOURCE, diff)
+    assert not result["applied"] and result["content"] is None
+    assert result["conflicts"][0]["reason"] == "context not found"
+
+
+def test_insertion_without_context_uses_the_line_hint():
+    result = HunkPatchApplier().apply(SOURCE, "@@ -2,0 +3 @@\n+INSERTED\n")
+    assert result["applied"]
+    assert result["content"].splitlines()[2] == "INSERTED"
@@ -0,0 +1,51 @@
+import subprocess
+
+from incremental_cache import IncrementalBuildCache
+
+DOCKERFILE = "FROM maven:3.9\nCOPY . .\nRUN mvn -q package\nRUN echo done\n"
+
+
+def test_cache_is_reused_only_after_a_successful_build(tmp_path):
+    project = tmp_path / "app"
+    project.mkdir()
+    (project / "pom.xml").write_text("<project/>")
+    cache = IncrementalBuildCache(state_path=str(tmp_path / "index.json"))
+
+    first = cache.prepare("p1", str(project), DOCKERFILE)
+    assert not first["reused"] and not first["invalidated"]
+    cache.record_build("p1", success=True)
+    assert cache.prepare("p1", str(project), DOCKERFILE)["reused"]
+
+    (project / "pom.xml").write_text("<project><dependencies/></project>")
+    changed = cache.prepare("p1", str(project), DOCKERFILE)
+    assert changed["invalidated"] and not changed["reused"]
+    assert changed["cache_id"] != first["cache_id"]
+
+
+def test_base_image_change_changes_the_digest(tmp_path):
+    (tmp_path / "package.json").write_text("{}")
+    digest = IncrementalBuildCache.manifest_digest(str(tmp_path), DOCKERFILE)
+    assert digest == IncrementalBuildCache.manifest_digest(str(tmp_path), DOCKERFILE)
+    assert digest != IncrementalBuildCache.manifest_digest(str(tmp_path), DOCKERFILE.replace("3.9", "3.8"))
+
+
+def test_only_build_steps_get_the_cache_mount(tmp_path):
+    cache = IncrementalBuildCache(state_path=str(tmp_path / "index.json"))
+    rewritten = cache.rewrite_dockerfile(DOCKERFILE, "sandbox-inc-p1-abc").splitlines()
+    assert rewritten[2].startswith("RUN --mount=type=cache,id=sandbox-inc-p1-abc,target=/inc-cache")
+    assert "{ mvn -q package; }" in rewritten[2]
+    assert rewritten[3] == "RUN echo done"
+
+
+def test_state_is_saved_from_the_workdir_even_if_the_build_changes_directory(tmp_path):
+    workdir, mount = tmp_path / "work", tmp_path / "inc"
+    (workdir / "target" / "classes").mkdir(parents=True)
+    (workdir / "target" / "classes" / "App.class").write_text("x")
+    (workdir / "sub").mkdir()
+    mount.mkdir()
+    cache = IncrementalBuildCache(state_path=str(tmp_path / "index.json"))
+    run_line = cache.rewrite_dockerfile("FROM maven:3.9\nRUN cd sub && echo mvn package\n", "c").splitlines()[1]
+    script = run_line.split(" ", 2)[2].replace(IncrementalBuildCache.MOUNT_TARGET, str(mount))
+
+    subprocess.run(["sh", "-c", script], cwd=str(workdir), check=True, capture_output=True)
+    assert (mount / "target" / "classes" / "App.class").is_file()
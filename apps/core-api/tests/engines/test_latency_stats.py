@@ -0,0 +1,19 @@
+from latency_stats import histogram, percentile, summarize
+
+
+def test_nearest_rank_percentiles():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 0) == 1
+    assert percentile([], 50) is None
+
+
+def test_summary_of_an_empty_sample_has_no_values():
+    assert summarize([])["p50"] is None
+    assert summarize([1.234, 2.0], digits=1) == {"count": 2, "min": 1.2, "p50": 1.2, "p90": 2.0, "p99": 2.0,
+                                                 "max": 2.0, "mean": 1.6}
+
+
+def test_histogram_is_non_cumulative():
+    assert histogram([10, 50, 51, 9999], bounds=[50, 100]) == {"<=50": 2, "<=100": 1, "+Inf": 1}
@@ -0,0 +1,22 @@
+from load_smoke import SmokeLoadTester, StubAppServer
+
+
+def test_burst_reports_rate_errors_and_latency_per_endpoint():
+    with StubAppServer(latency_ms=5, error_rate=0.5, seed=3) as stub:
+        endpoints = {"health": f"{stub.base_url}/api/health", "root": f"{stub.base_url}/"}
+        report = SmokeLoadTester(max_in_flight=8).run(endpoints, rps=40, duration_sec=1)
+
+    assert report["requests"] == 40
+    assert set(report["endpoints"]) == {"health", "root"}
+    assert report["endpoints"]["health"]["requests"] == 20
+    assert 0.2 < report["error_rate"] < 0.8
+    assert report["errors_by_status"] == {"503": round(report["error_rate"] * 40)}
+    assert report["latency_ms"]["min"] >= 5
+
+
+def test_saturated_app_shows_up_as_latency_not_a_lower_rate():
+    with StubAppServer(latency_ms=50, max_concurrency=1) as stub:
+        report = SmokeLoadTester(max_in_flight=16).run({"health": f"{stub.base_url}/api/health"}, rps=40, duration_sec=0.5)
+    # 20 requests through one 50 ms slot: the last ones wait for everything scheduled before them
+    assert report["requests"] == 20
+    assert report["latency_ms"]["max"] > 500
@@ -0,0 +1,78 @@
+import json
+
+from error_classifier import ErrorClassifier
+from patch_cache import PatchCache
+from patch_debugger import PatchDebugEngine
+
+SOURCE = "package com.acme;\nclass App { Loader l; }\n"
+
+
+def key(error_log, source=SOURCE, failing_line=""):
+    return PatchCache.make_key(ErrorClassifier().classify(error_log), source, error_log, failing_line)
+
+
+def test_same_category_different_errors_get_different_keys():
+    a = key("java.lang.ClassNotFoundException: com.acme.A")
+    b = key("java.lang.ClassNotFoundException: com.acme.B")
+    assert a != b
+    assert key("x", failing_line="int a;") != key("x", failing_line="int b;")
+
+
+def test_key_ignores_run_specific_log_noise():
+    first = key("2026-01-02T10:00:00Z ERROR /tmp/sbx-1a2b/src/App.java: cannot find symbol (took 12.5s)")
+    second = key("2026-03-04 11:22:33 ERROR /tmp/sbx-9f8e/src/App.java:  cannot find symbol (took 3s)")
+    assert first == second
+    assert key("cannot find symbol\n", source=SOURCE + "\n\n") == key("cannot find symbol", source=SOURCE.replace("\n", "\r\n"))
+
+
+def test_patches_are_served_only_after_confirmation():
+    cache = PatchCache()
+    patch = {"file_path": "a.java", "patch_type": "replace", "updated_content": "fixed"}
+    cache.store("k", patch, "unknown")
+    always = lambda p, src: True
+    assert cache.lookup("k", "b.java", SOURCE, always) is None
+    assert cache.confirm("k")
+    assert cache.lookup("k", "b.java", SOURCE, always)["file_path"] == "b.java"
+    assert not cache.confirm("missing")
+    assert cache.snapshot()["confirmed_entries"] == 1
+
+
+def test_stale_entries_are_dropped():
+    cache = PatchCache()
+    cache.store("k", {"patch_type": "replace"}, "unknown")
+    cache.confirm("k")
+    assert cache.lookup("k", "a", SOURCE, lambda p, src: False) is None
+    assert cache.snapshot()["entries"] == 0 and cache.stats["stale"] == 1
+
+
+def test_state_survives_reload(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = PatchCache(state_path=path)
+    cache.store("k", {"patch_type": "replace"}, "unknown")
+    cache.confirm("k")
+    assert PatchCache(state_path=path).lookup("k", "a", SOURCE, lambda p, src: True) is not None
+
+
+class OneAnswerAgent:
+    def __init__(self):
+        self.calls = 0
+
+    def run(self, payload, **options):
+        self.calls += 1
+        return json.dumps({"file_path": "App.java", "patch_type": "replace", "updated_content": SOURCE + "// fixed\n"})
+
+
+def test_engine_reuses_a_patch_only_after_the_rebuild_confirmed_it():
+    agent = OneAnswerAgent()
+    engine = PatchDebugEngine(agent, patch_cache=PatchCache())
+    error = "java.lang.ClassNotFoundException: com.acme.A"
+    engine.debug_file("App.java", "Loader l;", SOURCE, error)
+    engine.debug_file("App.java", "Loader l;", SOURCE, error)
+    assert agent.calls == 2
+
+    engine.confirm_cached_patch(SOURCE, error, "Loader l;")
+    engine.debug_file("App.java", "Loader l;", SOURCE, error)
+    assert agent.calls == 2
+    # Another class of the same category is not served A's patch
+    engine.debug_file("App.java", "Loader l;", SOURCE, "java.lang.ClassNotFoundException: com.acme.B")
+    assert agent.calls == 3
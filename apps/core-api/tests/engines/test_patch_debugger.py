@@ -0,0 +1,190 @@
+import asyncio
+import json
+import time
+
+from debug_metrics import InMemoryMetricsSink
+from patch_debugger import PatchDebugEngine, TokenBudget, estimate_tokens
+
+SOURCE = "const a = 1;\nconst b = a +;\nexport { a, b };\n"
+FIXED = "const a = 1;\nconst b = a + 1;\nexport { a, b };\n"
+HUNK = "@@ -1,3 +1,3 @@\n const a = 1;\n-const b = a +;\n+const b = a + 1;\n export { a, b };\n"
+
+
+class ScriptedAgent:
+    """run()-only agent returning fixed answers (the last one repeats)."""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = 0
+
+    def run(self, payload, **options):
+        answer = self.answers[min(self.calls, len(self.answers) - 1)]
+        self.calls += 1
+        return answer
+
+
+def answer(patch_type, content, file_path="src/app.ts"):
+    return json.dumps({"file_path": file_path, "patch_type": patch_type, "updated_content": content})
+
+
+def make_engine(agent):
+    engine = PatchDebugEngine(agent)
+    engine.base_backoff_sec = 0
+    return engine
+
+
+def test_every_mode_expands_hunk_answers_the_same_way():
+    args = ("src/app.ts", "const b = a +;", SOURCE, "TS1109: Expression expected.")
+    sequential = make_engine(ScriptedAgent(answer("hunk", HUNK))).debug_file(*args)
+    speculative = asyncio.run(make_engine(ScriptedAgent(answer("hunk", HUNK))).debug_file_speculative(*args, k=2))
+    concurrent = asyncio.run(make_engine(ScriptedAgent(answer("hunk", HUNK))).debug_files(
+        [dict(zip(("file_path", "failing_line", "source_code", "error_log"), args))]))["patches"]["src/app.ts"]
+
+    for patch in (sequential, speculative, concurrent):
+        assert patch["patch_type"] == "replace"
+        assert patch["updated_content"] == FIXED
+        assert patch["hunks"] == HUNK
+
+
+def test_malformed_answer_is_retried():
+    agent = ScriptedAgent("not json", answer("replace", FIXED))
+    patch = make_engine(agent).debug_file("src/app.ts", "const b = a +;", SOURCE, "TS1109")
+    assert agent.calls == 2
+    assert patch["updated_content"] == FIXED
+
+
+def test_budget_reserves_completion_so_concurrent_files_cannot_overrun():
+    engine = make_engine(ScriptedAgent(answer("replace", FIXED)))
+    requests = [{"file_path": f"src/f{i}.ts", "failing_line": "const b = a +;", "source_code": SOURCE,
+                 "error_log": "TS1109"} for i in range(2)]
+    prompt = estimate_tokens(engine._build_payload("src/f0.ts", "const b = a +;", SOURCE, "TS1109"))
+    one_call = prompt + engine._completion_allowance(SOURCE, None)
+
+    result = asyncio.run(engine.debug_files(requests, max_concurrency=2, token_budget=one_call + 1))
+
+    statuses = sorted(r["status"] for r in result["results"])
+    assert statuses == ["budget_exhausted", "patched"]
+    assert result["tokens_used"] <= one_call + 1
+    # The reservation is settled to the actual usage once the call returns
+    assert result["tokens_used"] == prompt + estimate_tokens(answer("replace", FIXED))
+
+
+def test_token_budget_settle_releases_unused_reservation():
+    budget = TokenBudget(100)
+    assert budget.try_reserve(80)
+    assert not budget.try_reserve(30)
+    budget.settle(80, 50)
+    assert budget.remaining == 50
+    assert budget.try_reserve(30)
+
+
+def test_excerpt_answers_of_every_type_are_spliced_at_the_window():
+    source = "".join(f"line {i}\n" for i in range(1, 11))
+    context = {"window": (4, 6)}
+    engine = make_engine(ScriptedAgent())
+    expected = {
+        "replace": ("line 4\nLINE 5\nline 6\n", "LINE 5"),
+        "insert": ("line 4\nline 5\nnew\nline 6\n", "new"),
+        "delete": ("line 4\nline 6\n", None),
+    }
+    for patch_type, (excerpt, marker) in expected.items():
+        patch = engine._expand_patch({"file_path": "a.txt", "patch_type": patch_type, "updated_content": excerpt},
+                                     source, context)
+        lines = patch["updated_content"].splitlines()
+        assert lines[:3] == ["line 1", "line 2", "line 3"]
+        assert lines[-4:] == ["line 7", "line 8", "line 9", "line 10"]
+        assert (marker in lines) if marker else ("line 5" not in lines)
+
+
+class SlowAgent(ScriptedAgent):
+    def __init__(self, delay, *answers):
+        super().__init__(*answers)
+        self.delay = delay
+
+    def run(self, payload, **options):
+        time.sleep(self.delay)
+        return super().run(payload, **options)
+
+
+class StreamingAgent:
+    def __init__(self, text, delay):
+        self.text, self.delay = text, delay
+
+    def stream(self, payload, **options):
+        for ch in self.text:
+            time.sleep(self.delay)
+            yield ch
+
+
+def test_speculation_counts_only_stoppable_candidates_as_cancelled():
+    sink = InMemoryMetricsSink()
+    engine = PatchDebugEngine(ScriptedAgent(), metrics_sink=sink)
+    slow_answer = answer("replace", FIXED + "// slow\n")
+    candidates = [{"agent": ScriptedAgent(answer("replace", FIXED))},
+                  {"agent": SlowAgent(0.3, slow_answer)},
+                  {"agent": StreamingAgent(slow_answer, 0.01)}]
+
+    patch = asyncio.run(engine.debug_file_speculative("src/app.ts", "const b = a +;", SOURCE, "TS1109",
+                                                      candidates=candidates))
+
+    assert patch["updated_content"] == FIXED
+    assert engine.speculation_stats["cancelled"] == 1
+    assert engine.speculation_stats["superseded"] == 1
+    # The losers' threads are not joined; they record their attempts when they return
+    deadline = time.time() + 5
+    while len(sink.records()) < 3 and time.time() < deadline:
+        time.sleep(0.05)
+    records = {r["attempt"]: r for r in sink.records()}
+    assert records[1]["outcome"] == "patched"
+    # The run()-only loser is recorded with the tokens it really produced once its thread returned
+    assert records[2]["outcome"] == "superseded"
+    assert records[2]["completion_tokens"] == estimate_tokens(slow_answer)
+    assert records[3]["outcome"] == "cancelled"
+    assert 0 < records[3]["completion_tokens"] < estimate_tokens(slow_answer)
+
+
+class RejectingCompiler:
+    def __init__(self):
+        self.checked = []
+
+    def check(self, file_path, content):
+        self.checked.append(content)
+        return {"status": "failed", "new_errors": ["TS2304: Cannot find name 'c'."], "duration_sec": 0.1}
+
+
+def test_compile_precheck_covers_insert_and_delete_answers():
+    compiler = RejectingCompiler()
+    engine = make_engine(ScriptedAgent(answer("insert", FIXED + "export const c2 = c;\n")))
+    engine.compile_precheck = compiler
+    assert engine.debug_file("src/app.ts", "const b = a +;", SOURCE, "TS1109") is None
+    assert len(compiler.checked) == engine.max_retries
+
+
+def test_slow_run_only_loser_does_not_delay_the_winner():
+    engine = make_engine(ScriptedAgent())
+    candidates = [{"agent": SlowAgent(0.1, answer("replace", FIXED))},
+                  {"agent": SlowAgent(3.0, answer("replace", FIXED + "// slow\n"))}]
+    start = time.perf_counter()
+    patch = asyncio.run(engine.debug_file_speculative("src/app.ts", "const b = a +;", SOURCE, "TS1109",
+                                                      candidates=candidates))
+    assert patch["updated_content"] == FIXED
+    assert time.perf_counter() - start < 1.0
+
+
+class PickyAgent(ScriptedAgent):
+    def run(self, payload, **options):
+        if "src/broken.ts" in payload:
+            raise ConnectionError("provider unavailable")
+        return super().run(payload, **options)
+
+
+def test_one_file_raising_keeps_the_other_results():
+    engine = make_engine(PickyAgent(answer("replace", FIXED)))
+    requests = [{"file_path": path, "failing_line": "const b = a +;", "source_code": SOURCE, "error_log": "TS1109"}
+                for path in ("src/a.ts", "src/broken.ts", "src/c.ts")]
+    result = asyncio.run(engine.debug_files(requests))
+    statuses = {r["file_path"]: r["status"] for r in result["results"]}
+    assert statuses == {"src/a.ts": "patched", "src/broken.ts": "error", "src/c.ts": "patched"}
+    assert set(result["patches"]) == {"src/a.ts", "src/c.ts"}
+    assert result["failed"] == ["src/broken.ts"]
+    assert not result["success"]
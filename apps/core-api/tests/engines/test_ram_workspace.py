@@ -0,0 +1,60 @@
+import os
+
+from ram_workspace import RamWorkspace
+
+
+def _project(tmp_path):
+    project = tmp_path / "app"
+    (project / "src").mkdir(parents=True)
+    (project / "Dockerfile").write_text("FROM scratch\n")
+    (project / "src" / "Main.java").write_text("class Main {}\n")
+    return project
+
+
+def test_resync_detects_sub_second_edits_of_same_size(tmp_path):
+    project = _project(tmp_path)
+    workspace = RamWorkspace(root=str(tmp_path / "shm"))
+    source = project / "src" / "Main.java"
+    os.utime(source, ns=(1_700_000_000_100_000_000, 1_700_000_000_100_000_000))
+    staged = workspace.stage("p", str(project))
+    workspace.finish("p", staged, {})
+
+    # Same size, same whole second, different content
+    source.write_text("class Mian {}\n")
+    os.utime(source, ns=(1_700_000_000_600_000_000, 1_700_000_000_600_000_000))
+    staged = workspace.stage("p", str(project))
+    assert staged["copied_files"] == 1
+    assert (tmp_path / "shm" / "p" / "src" / "Main.java").read_text() == "class Mian {}\n"
+
+
+def test_in_use_workspace_is_not_reused_by_same_key(tmp_path):
+    project = _project(tmp_path)
+    workspace = RamWorkspace(root=str(tmp_path / "shm"))
+    first = workspace.stage("p", str(project))
+    second = workspace.stage("p", str(project))
+    assert first["mode"] == "ram"
+    assert second["mode"] == "disk"
+    assert "in use" in second["reason"]
+    workspace.finish("p", first, {})
+    assert workspace.stage("p", str(project))["mode"] == "ram"
+
+
+def test_io_saved_counts_staging_cost(tmp_path):
+    project = _project(tmp_path)
+    workspace = RamWorkspace(root=str(tmp_path / "shm"))
+    staged = workspace.stage("p", str(project))
+    # Disk is "free": staging can only have cost time
+    workspace._disk_bytes_per_sec = 1e15
+    report = workspace.finish("p", staged, {"read_sec": 0.0, "context_bytes": 100})
+    assert report["io_saved_sec"] == round(report["estimated_disk_read_sec"] - staged["staging_sec"], 4)
+    assert report["io_saved_sec"] <= 0
+
+
+def test_deleted_files_leave_the_stage(tmp_path):
+    project = _project(tmp_path)
+    workspace = RamWorkspace(root=str(tmp_path / "shm"))
+    workspace.finish("p", workspace.stage("p", str(project)), {})
+    (project / "src" / "Main.java").unlink()
+    staged = workspace.stage("p", str(project))
+    assert not (tmp_path / "shm" / "p" / "src" / "Main.java").exists()
+    assert staged["mode"] == "ram"
@@ -0,0 +1,47 @@
+import json
+
+from streaming_patch_validator import StreamingPatchValidator
+
+PATCH = {"file_path": "src/app.ts", "patch_type": "replace", "updated_content": "const a = {b: 1};\n"}
+
+
+def feed_in_chunks(validator, text, size=7):
+    for i in range(0, len(text), size):
+        if validator.feed(text[i:i + size]) in ("invalid", "complete"):
+            break
+    return validator.finish()
+
+
+def test_prose_and_fence_before_the_object_are_skipped():
+    validator = StreamingPatchValidator()
+    text = "Here is the fix:\n```json" + json.dumps(PATCH) + "```"
+    assert feed_in_chunks(validator, text) == "complete"
+    assert validator.patch == PATCH
+
+
+def test_answer_without_json_is_cancelled_after_the_preamble_limit():
+    validator = StreamingPatchValidator()
+    validator.MAX_PREAMBLE_CHARS = 50
+    assert validator.feed("I could not find the problem. " * 5) == "invalid"
+    assert validator.chars_seen == 51
+
+
+def test_contract_violation_stops_before_the_end():
+    validator = StreamingPatchValidator()
+    text = '{"file_path": "a.ts", "patch_type": "rewrite_everything", "updated_content": "' + "x" * 500 + '"}'
+    assert feed_in_chunks(validator, text) == "invalid"
+    assert "patch_type" in validator.reason
+    assert validator.chars_seen < 80
+
+
+def test_non_string_content_and_missing_keys_are_invalid():
+    assert feed_in_chunks(StreamingPatchValidator(), '{"file_path": 3}') == "invalid"
+    validator = StreamingPatchValidator()
+    assert feed_in_chunks(validator, '{"file_path": "a", "patch_type": "replace"}') == "invalid"
+    assert "updated_content" in validator.reason
+
+
+def test_truncated_stream_is_invalid_on_finish():
+    validator = StreamingPatchValidator()
+    assert validator.feed(json.dumps(PATCH)[:-5]) == "in_progress"
+    assert validator.finish() == "invalid"
@@ -0,0 +1,18 @@
+from syntax_precheck import SyntaxPrecheck
+
+
+def test_brace_languages_ignore_brackets_in_strings_and_comments():
+    content = 'const s = "}" + `${a}\n)`; // {\n/* ( */ function f() { return [1]; }\n'
+    assert SyntaxPrecheck().check("a.ts", content) is None
+
+
+def test_truncated_files_are_reported_with_the_line():
+    assert SyntaxPrecheck().check("A.java", "class A {\n  void f() {\n") == "unclosed '{' from line 2"
+    assert SyntaxPrecheck().check("a.js", "f(]);") == "unbalanced ']' at line 1"
+    assert SyntaxPrecheck().check("a.ts", 'const s = "abc\n";') == "unterminated string literal at line 1"
+
+
+def test_json_and_python_are_parsed_for_real():
+    assert SyntaxPrecheck().check("package.json", '{"a": 1,}').startswith("invalid JSON")
+    assert SyntaxPrecheck().check("app.py", "def f(:\n").startswith("Python syntax error at line 1")
+    assert SyntaxPrecheck().check("README.md", "{{{") is None
@@ -0,0 +1,73 @@
+import pytest
+
+from docker_sandbox import DockerSandbox
+from fake_backend import FakeDockerBackend
+import test_sharding as sharding
+from test_sharding import build_shard_commands, discover_test_files
+
+
+def _touch(root, rel_path, content="x"):
+    path = root / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+@pytest.fixture
+def fullstack(tmp_path):
+    _touch(tmp_path, "backend/pom.xml")
+    _touch(tmp_path, "backend/src/test/java/com/acme/UserServiceTest.java")
+    _touch(tmp_path, "frontend/package.json")
+    _touch(tmp_path, "frontend/angular.json")
+    _touch(tmp_path, "frontend/src/app/app.component.spec.ts")
+    _touch(tmp_path, "frontend/src/app/user.service.spec.ts")
+    return tmp_path
+
+
+def test_mixed_shard_gets_one_command_per_component(fullstack):
+    files = discover_test_files(str(fullstack))
+    commands = build_shard_commands(str(fullstack), files)
+    by_stack = {c["stack"]: c for c in commands}
+    assert set(by_stack) == {"maven", "angular"}
+    assert sorted(f for c in commands for f in c["files"]) == files
+
+    maven = by_stack["maven"]["command"]
+    assert maven[:2] == ["sh", "-c"] and maven[2].startswith("cd backend && exec mvn")
+    assert "-Dtest=UserServiceTest" in maven[2]
+
+    angular = by_stack["angular"]["command"][2]
+    assert angular.startswith("cd frontend && exec npm run test")
+    # Paths are rebased onto the component's working directory
+    assert "--include=src/app/app.component.spec.ts" in angular
+    assert "frontend/src" not in angular
+
+
+def test_root_level_jest_project_runs_in_place(tmp_path):
+    _touch(tmp_path, "package.json")
+    _touch(tmp_path, "src/a.test.ts")
+    [command] = build_shard_commands(str(tmp_path), ["src/a.test.ts"])
+    assert command["command"] == ["npm", "run", "test", "--", "src/a.test.ts"]
+
+
+def test_uncovered_files_fail_loudly(tmp_path):
+    _touch(tmp_path, "package.json")
+    _touch(tmp_path, "legacy/src/test/java/OldTest.java")
+    with pytest.raises(ValueError, match="legacy/src/test/java/OldTest.java"):
+        build_shard_commands(str(tmp_path), ["legacy/src/test/java/OldTest.java"])
+
+
+def test_sharded_validation_runs_every_component(fullstack):
+    backend = FakeDockerBackend(sleep=False)
+    sandbox = DockerSandbox(str(fullstack), backend=backend, test_shards=2, parallel_components=False,
+                            shard_balancer=sharding.TestShardBalancer())
+    result = sandbox.validate_runtime()
+    assert result["success"]
+    # Three files over two shards, spanning two components: at least one shard runs two commands
+    assert backend.counters["runs"] >= 3
+    assert sorted(f for s in result["telemetry"]["shards"] for f in s["files"]) == discover_test_files(str(fullstack))
+
+
+def test_balancer_converges_on_observed_durations():
+    balancer = sharding.TestShardBalancer(default_file_sec=1.0)
+    balancer.learn(["slow.spec.ts"], 10.0)
+    plan = balancer.plan(["a.spec.ts", "b.spec.ts", "slow.spec.ts"], 2)
+    assert ["slow.spec.ts"] in plan